@@ -1,42 +1,69 @@
 # app.py
 from fastapi import FastAPI, Query, Header
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 import time
+from concurrent.futures import TimeoutError as FuturesTimeout
 
 import services
 import worker
+from jobs import job_queue, PRIORITY_INTERACTIVE, PRIORITY_MAINTENANCE, QueueFull
+from view_counter import view_counter
+from http_cache import http_cache
+from popular import popular_ranking
+from search_index import search_index
+from ratings_index import ratings_index
+from featured import featured_cache, prefetch_missing_featured, FEATURED_PREFETCH
 from shows import (
     fetch_and_store_show,
-    process_missing_refresh,
     process_show_refresh,
     process_metadata_refresh,
-    _enrichment_in_progress
+    stream_show
 )
-from shows.show_refresh import _missing_refresh_in_progress
-from shows.show_helpers import get_show_data
-from utils import sanitize_imdb_id, safe_json
+from shows.show_events import stream_show_events
+from shows.show_helpers import get_show_data, _increment_view_count, show_payload_cache
+from shows.show_ingest import ingest_flight
+from utils import sanitize_imdb_id
 
 from database import (
     init_db,
     ensure_columns,
     ensure_indices,
     session,
-    Show
+    engine,
+    Show,
+    is_show_metadata_stale
 )
 
 load_dotenv()
 
+REFRESH_WAIT_SECONDS = 60  # how long /refresh/missing waits for its queued job
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
     ensure_columns()
     ensure_indices()
+    services.http_clients.open()
+    if http_cache.enabled:
+        http_cache.prune()
+    job_queue.start()
+    view_counter.start()
+    featured_cache.warm()
+    featured_cache.start()
+    search_index.build()
+    if FEATURED_PREFETCH:
+        prefetch_missing_featured()
+    session.remove()
     worker.start_background_maintenance()
     yield
+    featured_cache.stop()
+    job_queue.stop()
+    view_counter.stop()
+    services.http_clients.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -64,13 +91,27 @@ def search_titles(q: str = Query('', alias='q'), page: str = Query('1', alias='p
     if not query:
         return []
     
-    ql = query.lower()
-    cached = services._search_cache.get(ql)
-    if cached:
-        return cached
-        
+    # Page 1 comes from the local title index when a stored title matches by prefix
+    if page == '1':
+        search_index.sync_if_due()
+        local = search_index.search(query, limit=10, fuzzy=False)
+        if local:
+            return local
+
+    cache_key = (query.lower(), page)
+    results = services.revalidator.get(services._search_cache, cache_key, lambda: _search_omdb(query, cache_key, page))
+    if page == '1' and len(results) < 10:
+        # Typo-tolerant local matches fill the page after OMDb's answer
+        seen = {r['imdbID'] for r in results}
+        fuzzy = [r for r in search_index.search(query, limit=10) if r['imdbID'] not in seen]
+        results = results + fuzzy[:10 - len(results)]
+    return results
+
+
+def _search_omdb(query, cache_key, page):
+    """Query OMDb search; fills the search cache on success."""
     api_key = os.getenv('OMDB_API_KEY')
-    url = f'http://www.omdbapi.com/?apikey={api_key}&s={query}&type=series&page={page}'
+    url = f'{services.OMDB_BASE_URL}?apikey={api_key}&s={query}&type=series&page={page}'
     try:
         resp = services.throttled_omdb_get(url, timeout=8)
     except Exception:
@@ -90,7 +131,7 @@ def search_titles(q: str = Query('', alias='q'), page: str = Query('1', alias='p
         'type': item.get('Type')
     } for item in data.get('Search', [])[:10]]
     
-    services._search_cache.set(ql, results)
+    services._search_cache.set(cache_key, results)
     return results
 
 @app.get("/getShowByTitle")
@@ -98,14 +139,12 @@ def get_show_by_title(title: str = Query(None, alias='title')):
     if not title:
         return JSONResponse({'error': 'Title not provided'}, status_code=400)
 
-    apiKey = os.getenv('OMDB_API_KEY')
-    url = f'http://www.omdbapi.com/?apikey={apiKey}&t={title}'
-    response = services.throttled_omdb_get(url)
+    # Full OMDb record (not stored in the DB): served from the OMDb title cache
+    status, data = services.fetch_omdb_title(title=title)
     
-    if response.status_code != 200:
+    if status != 200:
         return JSONResponse({'error': 'Failed to fetch show data'}, status_code=500)
 
-    data = safe_json(response)
     if data is None:
         return JSONResponse({'error': 'Upstream JSON parse failure'}, status_code=502)
         
@@ -125,35 +164,71 @@ def get_show(
         return error
     track_view = trackView == '1'
         
-    show = session.query(Show).filter_by(imdb_id=imdb_id).first()
+    show = session.query(Show.id).filter_by(imdb_id=imdb_id).first()
     if show:
         # Increment view count for popularity tracking
         if track_view:
-            show.view_count = (show.view_count or 0) + 1
-            session.commit()
-        return get_show_data(imdb_id, if_none_match, enrichment_set=_enrichment_in_progress, missing_refresh_set=_missing_refresh_in_progress)
+            _increment_view_count(show.id)
+        return get_show_data(imdb_id, if_none_match)
     else:
         return fetch_and_store_show(imdb_id, track_view=track_view)
 
+@app.get("/getShowStream")
+def get_show_stream(
+    imdbID: str = Query(None, alias='imdbID'),
+    trackView: str = Query('1', alias='trackView')
+):
+    """NDJSON variant of /getShow: metadata first, each season as soon as it is fetched, then 'done' once stored."""
+    imdb_id, error = _require_imdb_id(imdbID, error_message='IMDB ID not provided')
+    if error:
+        return error
+    track_view = trackView == '1'
+
+    show = session.query(Show).filter_by(imdb_id=imdb_id).first()
+    if show and track_view:
+        _increment_view_count(show.id)
+    return StreamingResponse(
+        stream_show(
+            imdb_id,
+            track_view=track_view and not show
+        ),
+        media_type='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache'}
+    )
+
 @app.get('/getShowMeta')
 def get_show_meta(imdbID: str = Query(None, alias='imdbID')):
     imdb_id, error = _require_imdb_id(imdbID, error_message='IMDB ID not provided')
     if error:
         return error
 
-    apiKey = os.getenv('OMDB_API_KEY')
-    url = f'http://www.omdbapi.com/?apikey={apiKey}&i={imdb_id}'
+    # Known shows are answered from their row; OMDb (via the title cache) only for unknown or stale ones
+    row = session.query(
+        Show.title, Show.year, Show.poster, Show.plot, Show.total_seasons, Show.last_full_refresh
+    ).filter_by(imdb_id=imdb_id).first()
+    if row and row.plot is not None and not is_show_metadata_stale(row):
+        subset = {
+            'Title': row.title, 'Year': row.year, 'Poster': row.poster, 'Plot': row.plot, 'imdbID': imdb_id,
+            'totalSeasons': str(row.total_seasons) if row.total_seasons is not None else None
+        }
+        return JSONResponse(content=subset, headers={'Cache-Control': 'public, max-age=30'})
+
     try:
-        resp = services.throttled_omdb_get(url, timeout=10)
+        status, data = services.fetch_omdb_title(imdb_id=imdb_id, timeout=10)
     except Exception:
         return JSONResponse({'error': 'Upstream failure'}, status_code=502)
     
-    if resp.status_code != 200:
+    if status != 200:
         return JSONResponse({'error': 'Upstream status'}, status_code=502)
         
-    data = safe_json(resp)
     if not data or data.get('Response') != 'True':
         return JSONResponse({'error': 'Not found'}, status_code=404)
+
+    if row and row.plot is None:
+        # Rows stored before the plot column: fill it so the next view stays local
+        session.query(Show).filter_by(imdb_id=imdb_id).update(
+            {'plot': data.get('Plot') or 'N/A', 'last_updated': Show.last_updated}, synchronize_session=False)
+        session.commit()
         
     subset = {
         'Title': data.get('Title'), 'Year': data.get('Year'), 'Poster': data.get('Poster'),
@@ -161,12 +236,34 @@ def get_show_meta(imdbID: str = Query(None, alias='imdbID')):
     }
     return JSONResponse(content=subset, headers={'Cache-Control': 'public, max-age=30'})
 
+@app.get('/events/show')
+def show_events_stream(imdbID: str = Query(None, alias='imdbID')):
+    """Server-Sent Events: per-season deltas and completion for background enrichment/refresh."""
+    imdb_id, error = _require_imdb_id(imdbID, error_message='IMDB ID required')
+    if error:
+        return error
+    return StreamingResponse(
+        stream_show_events(imdb_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.post('/refresh/missing')
 def refresh_missing(imdbID: str = Query(None, alias='imdbID')):
     imdb_id, error = _require_imdb_id(imdbID, error_message='IMDB ID required')
     if error:
         return error
-    return process_missing_refresh(imdb_id)
+    # Checked here so the job itself always returns a JSON-serializable result
+    if not session.query(Show.id).filter_by(imdb_id=imdb_id).first():
+        return JSONResponse({'error': 'Show not found in DB'}, status_code=404)
+    try:
+        future = job_queue.submit('missing_refresh', imdb_id, {'imdb_id': imdb_id}, priority=PRIORITY_INTERACTIVE)
+    except QueueFull:
+        return JSONResponse({'error': 'Busy, try again later'}, status_code=503)
+    try:
+        return future.result(timeout=REFRESH_WAIT_SECONDS)
+    except FuturesTimeout:
+        return JSONResponse({'queued': True}, status_code=202)
 
 @app.post('/refresh/show')
 def refresh_show(imdbID: str = Query(None, alias='imdbID')):
@@ -184,11 +281,10 @@ def refresh_metadata_only(imdbID: str = Query(None, alias='imdbID')):
 
 # --- Discovery Endpoints ---
 
-from featured_shows import FEATURED_SHOW_IDS
 
-# Cache for featured show metadata
-_featured_cache = {'data': None, 'timestamp': 0}
-FEATURED_CACHE_TTL = 86400  # 24 hours
+# Rendered /popular list, tied to the ranking version
+_popular_cache = {'version': None, 'data': None, 'timestamp': 0}
+POPULAR_CACHE_TTL = 60  # also bounded by ranking changes and poster backfills
 
 @app.get('/trending')
 def get_trending():
@@ -198,91 +294,81 @@ def get_trending():
 
 @app.get('/popular')
 def get_popular():
-    """Returns most viewed shows on this app."""
-    shows = session.query(Show).filter(Show.view_count > 0).order_by(Show.view_count.desc()).limit(12).all()
-    api_key = os.getenv('OMDB_API_KEY')
+    """Returns most viewed shows on this app (no upstream calls; missing posters are backfilled in the background)."""
+    if popular_ranking.needs_reload():
+        with engine.connect() as conn:
+            popular_ranking.reload_from_db(conn, view_counter.pending())
+
+    now = time.time()
+    version = popular_ranking.version
+    if _popular_cache['version'] == version and (now - _popular_cache['timestamp']) < POPULAR_CACHE_TTL:
+        return _popular_cache['data']
+
+    ids = [show_id for show_id, _ in popular_ranking.top()]
+    by_id = {s.id: s for s in session.query(Show).filter(Show.id.in_(ids)).all()} if ids else {}
     result = []
-    
-    for s in shows:
-        poster = s.poster
-        
-        # If poster is missing, try to fetch from OMDb and save it
-        if not poster:
+    for show_id in ids:
+        s = by_id.get(show_id)
+        if s is None:
+            popular_ranking.forget(show_id)
+            continue
+        if not s.poster:
             try:
-                url = f'http://www.omdbapi.com/?apikey={api_key}&i={s.imdb_id}'
-                resp = services.throttled_omdb_get(url, timeout=5)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    if data.get('Response') == 'True':
-                        poster = data.get('Poster')
-                        if poster and poster != 'N/A':
-                            # Save poster to DB for future requests
-                            s.poster = poster
-                            session.commit()
-            except Exception as e:
-                print(f"[popular] fetch error for {s.imdb_id}: {e}")
-        
+                job_queue.submit('poster_backfill', s.imdb_id, {'imdb_id': s.imdb_id}, priority=PRIORITY_MAINTENANCE)
+            except QueueFull:
+                pass  # retried on a later request
         result.append({
             'imdbID': s.imdb_id,
             'title': s.title,
             'year': s.year,
             'imdbRating': s.imdb_rating,
             'genres': s.genres,
-            'poster': poster
+            'poster': s.poster
         })
-    
+
+    _popular_cache.update(version=version, data=result, timestamp=now)
     return result
 
 @app.get('/featured')
 def get_featured():
-    """Returns curated list of iconic TV shows - instant response, no blocking API calls."""
-    import random
-    
-    now = time.time()
-    
-    # Return cached data if still valid
-    if _featured_cache['data'] and (now - _featured_cache['timestamp']) < FEATURED_CACHE_TTL:
-        return _featured_cache['data']
-    
-    enriched_shows = []
-    
-    # Collect all shows instantly - use DB data if available, otherwise basic info
-    for show_info in FEATURED_SHOW_IDS:
-        imdb_id = show_info['imdbID']
-        
-        # Check if we have data in the database (instant lookup, no API call)
-        db_show = session.query(Show).filter_by(imdb_id=imdb_id).first()
-        if db_show and db_show.poster:
-            enriched_shows.append({
-                'imdbID': imdb_id,
-                'title': db_show.title or show_info['title'],
-                'year': db_show.year or show_info['year'],
-                'poster': db_show.poster,
-                'imdbRating': db_show.imdb_rating
-            })
-        else:
-            # Basic info without poster - still usable by frontend
-            enriched_shows.append({
-                'imdbID': imdb_id,
-                'title': show_info['title'],
-                'year': show_info['year'],
-                'poster': None,
-                'imdbRating': None
-            })
-    
-    # Shuffle to add variety, then prioritize shows with posters
-    random.shuffle(enriched_shows)
-    enriched_shows.sort(key=lambda x: (x['poster'] is None, x['imdbRating'] is None))
-    
-    # Cache the results
-    _featured_cache['data'] = enriched_shows
-    _featured_cache['timestamp'] = now
-    
-    return enriched_shows
+    """Returns curated list of iconic TV shows - instant response, built at startup and refreshed in the background."""
+    return featured_cache.get()
 
 
 # --- Debug Endpoints ---
 
+@app.get('/debug/jobs')
+def debug_jobs():
+    return job_queue.metrics(include_jobs=True)
+
+@app.get('/debug/singleflight')
+def debug_singleflight():
+    return {'ingest': ingest_flight.stats(), 'imdbSeason': services.season_flight.stats()}
+
+@app.get('/debug/viewCounter')
+def debug_view_counter():
+    return view_counter.stats()
+
+@app.get('/debug/payloadCache')
+def debug_payload_cache():
+    return show_payload_cache.stats()
+
+@app.get('/debug/caches')
+def debug_caches():
+    return {
+        'imdbSeason': services._imdb_season_cache.stats(),
+        'search': services._search_cache.stats(),
+        'trending': services._trending_cache.stats(),
+        'rating': services._rating_cache.stats(),
+        'omdbTitle': services._omdb_title_cache.stats(),
+        'revalidator': services.revalidator.stats(),
+        'ratingsIndex': ratings_index.stats(),
+    }
+
+@app.get('/debug/httpCache')
+def debug_http_cache():
+    return http_cache.stats()
+
 @app.get('/debug/scrapeRating')
 def debug_scrape_rating(imdbID: str = Query(None, alias='imdbID')):
     imdb_id, error = _require_imdb_id(imdbID, error_message='imdbID required')
@@ -0,0 +1,107 @@
+"""
+Benchmark: writing a 30-season, 700-episode show.
+
+Compares the old write pattern (one ORM `add` per episode with a flush and a
+commit per season) with `EpisodeWriter` (one upsert executemany and one
+commit for the show), then re-runs the writer over the stored rows to time the
+update path. Runs on a scratch SQLite file, and also on Postgres when
+`--postgres-url` points at a disposable database (its tables are dropped).
+
+    python benchmarks/bench_bulk_episodes.py [--rounds 5] [--postgres-url postgresql://...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base, Episode, Show  # noqa: E402
+from shows.show_writer import EpisodeWriter  # noqa: E402
+
+SEASONS = 30
+EPISODES = 700
+
+
+def make_episodes(show_id, bump=0.0):
+    per_season, extra = divmod(EPISODES, SEASONS)
+    eps = []
+    for season in range(1, SEASONS + 1):
+        for n in range(1, per_season + (1 if season <= extra else 0) + 1):
+            eps.append(Episode(show_id=show_id, season=season, episode=n, title=f'S{season}E{n}',
+                               rating=round(6 + (season * n) % 40 / 10 + bump, 1), votes=1000 + n,
+                               imdb_id=f'tt9{season:03d}{n:03d}', missing=False))
+    return eps
+
+
+def per_row(db, show_id):
+    season = None
+    for ep in make_episodes(show_id):
+        if season is not None and ep.season != season:
+            db.flush()
+            db.commit()
+        season = ep.season
+        db.add(ep)
+    db.commit()
+
+
+def bulk(db, show_id, bump=0.0):
+    writer = EpisodeWriter(show_id)
+    for ep in make_episodes(show_id, bump):
+        writer.add(ep)
+    writer.write(db)
+    db.commit()
+
+
+def run(label, url, rounds):
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        for name, fn in (('per-row', per_row), ('bulk insert', bulk), ('bulk update', None)):
+            times = []
+            for r in range(rounds):
+                db.query(Episode).delete()
+                db.query(Show).delete()
+                show = Show(imdb_id=f'tt{r:07d}', title='Bench', total_seasons=SEASONS)
+                db.add(show)
+                db.commit()
+                if fn is None:
+                    bulk(db, show.id)
+                t0 = time.perf_counter()
+                if fn is None:
+                    bulk(db, show.id, bump=0.1)
+                else:
+                    fn(db, show.id)
+                times.append(time.perf_counter() - t0)
+                assert db.query(Episode).count() == EPISODES
+            best = min(times)
+            print(f"{label:8s} {name:12s} {best * 1000:8.1f} ms  ({EPISODES / best:,.0f} episodes/s)")
+    finally:
+        db.close()
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--postgres-url', default=os.getenv('BENCH_POSTGRES_URL', ''))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run('sqlite', f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.rounds)
+    if args.postgres_url:
+        run('postgres', args.postgres_url, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: latency of a `/getShow` revalidation that ends in 304.
+
+"before" replays the old path: load the Show and every Episode, build the
+payload, then compare ETags. "after" is `get_show_data` with If-None-Match,
+which only reads the ETag columns of the show row.
+
+    python benchmarks/bench_etag_304.py [--seasons 10] [--episodes 25] [--iterations 500]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+_DB_DIR = tempfile.mkdtemp(prefix='bench-etag-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ.setdefault('OMDB_API_KEY', 'bench')
+
+import database  # noqa: E402
+from database import session, Show, Episode, touch_show_data  # noqa: E402
+from shows.show_helpers import get_show_data, _build_show_payload, _now_utc_naive  # noqa: E402
+
+IMDB_ID = 'tt0990001'
+
+
+def seed(seasons, episodes):
+    database.init_db()
+    database.ensure_columns()
+    database.ensure_indices()
+    now = _now_utc_naive()
+    show = Show(imdb_id=IMDB_ID, title='Bench', total_seasons=seasons, last_full_refresh=now)
+    session.add(show)
+    session.flush()
+    session.add_all([
+        Episode(show_id=show.id, season=s, episode=e, title=f'S{s}E{e}', rating=7.5, votes=100,
+                last_checked=now, missing=False, absent=False, provisional=False)
+        for s in range(1, seasons + 1) for e in range(1, episodes + 1)
+    ])
+    touch_show_data(session, show)
+    session.commit()
+
+
+def legacy_304(if_none_match):
+    """The pre-counter path: ETag needed len(episodes) and absent_count."""
+    show = session.query(Show).filter_by(imdb_id=IMDB_ID).first()
+    session.refresh(show)
+    episodes = session.query(Episode).filter_by(show_id=show.id).order_by(Episode.season, Episode.episode).all()
+    _, etag_val = _build_show_payload(show, episodes)
+    assert etag_val == if_none_match
+    return 304
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        session.expire_all()  # no identity-map shortcuts between requests
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seasons', type=int, default=10)
+    parser.add_argument('--episodes', type=int, default=25, help='episodes per season')
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    seed(args.seasons, args.episodes)
+    etag = get_show_data(IMDB_ID).headers['etag']
+    assert get_show_data(IMDB_ID, if_none_match=etag).status_code == 304
+
+    before = timed(lambda: legacy_304(etag), args.iterations)
+    after = timed(lambda: get_show_data(IMDB_ID, if_none_match=etag), args.iterations)
+    print(f"304 latency, {args.seasons * args.episodes} episodes, {args.iterations} iterations")
+    print(f"{'':8}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for name, (p50, p95) in (('before', before), ('after', after)):
+        print(f"{name:8}{p50 * 1000:10.2f}{p95 * 1000:10.2f}")
+    print(f"speedup (p50): {before[0] / after[0]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
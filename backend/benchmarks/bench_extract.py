@@ -0,0 +1,69 @@
+"""
+Benchmark: per-page parse time of saved IMDb pages, full DOM vs raw script slicing.
+
+For each fixture page under tests/fixtures this times the old path
+(`BeautifulSoup(html, 'html.parser')` and then reading the `__NEXT_DATA__` /
+`ld+json` script) against `extract_next_data` / `extract_ld_json`, which
+slice the payload out of the raw HTML and hand it straight to `json.loads`.
+
+    python benchmarks/bench_extract.py [--repeat 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from imdb_helpers import extract_ld_json, extract_next_data  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
+PAGES = [
+    ('imdb_season.html', 'next_data'),
+    ('imdb_chart.html', 'next_data'),
+    ('imdb_title.html', 'ld_json'),
+]
+
+
+def via_soup(html, kind):
+    soup = BeautifulSoup(html, 'html.parser')
+    if kind == 'next_data':
+        return json.loads(soup.find('script', id='__NEXT_DATA__').string)
+    return [json.loads(tag.string) for tag in soup.find_all('script', type='application/ld+json')]
+
+
+def via_raw(html, kind):
+    return extract_next_data(html) if kind == 'next_data' else extract_ld_json(html)
+
+
+def timed(fn, html, kind, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(html, kind)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for name, kind in PAGES:
+        with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+            html = f.read()
+        assert via_soup(html, kind) == via_raw(html, kind)
+        soup_ms = timed(via_soup, html, kind, args.repeat)
+        raw_ms = timed(via_raw, html, kind, args.repeat)
+        print(f"{name:18s} {len(html) / 1024:6.0f} KB  soup {soup_ms:8.2f} ms  raw {raw_ms:6.2f} ms  "
+              f"({soup_ms / raw_ms:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: show ingest latency vs. season count, sequential vs. pooled.
+
+Runs `fetch_and_store_show` against a local stub OMDb server with a fixed
+per-request latency and reports wall time for each season count with a
+single season worker (the old sequential behaviour) and with the pool.
+
+    python benchmarks/bench_ingest_seasons.py [--latency 0.15] [--rate 20] [--workers 4]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+_DB_DIR = tempfile.mkdtemp(prefix='bench-ingest-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ.setdefault('OMDB_API_KEY', 'bench')
+os.environ.pop('FAST_INGEST', None)
+
+import database  # noqa: E402
+import services  # noqa: E402
+from shows import fetch_and_store_show  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+EPISODES_PER_SEASON = 20
+
+
+def omdb_handler(path, query, headers):
+    if 'season' not in query:
+        seasons = int(query['i'][2:]) % 1000
+        body = {'Response': 'True', 'Title': 'Bench Show', 'totalSeasons': str(seasons),
+                'imdbRating': '8.0', 'imdbVotes': '1,000', 'Poster': 'N/A'}
+    else:
+        season = int(query['season'])
+        body = {'Response': 'True', 'Season': str(season), 'Episodes': [
+            {'Title': f'Episode {e}', 'Episode': str(e), 'imdbRating': '7.7',
+             'imdbID': f'tt8{season:03d}{e:04d}', 'imdbVotes': '500'}
+            for e in range(1, EPISODES_PER_SEASON + 1)
+        ]}
+    return 200, json.dumps(body), {'Content-Type': 'application/json'}
+
+
+def run(season_counts, workers, run_id):
+    services.OMDB_SEASON_WORKERS = workers
+    timings = []
+    for n in season_counts:
+        imdb_id = f'tt{run_id:04d}{n:03d}'
+        start = time.perf_counter()
+        resp = fetch_and_store_show(imdb_id)
+        elapsed = time.perf_counter() - start
+        assert resp.status_code == 200, resp.body
+        timings.append(elapsed)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latency', type=float, default=0.15, help='stub OMDb latency per request (s)')
+    parser.add_argument('--rate', type=float, default=20.0, help='OMDb bucket refill rate (req/s)')
+    parser.add_argument('--burst', type=int, default=8, help='OMDb bucket burst size')
+    parser.add_argument('--workers', type=int, default=services.OMDB_SEASON_WORKERS, help='pooled season workers')
+    parser.add_argument('--seasons', default='1,5,10,30', help='comma-separated season counts')
+    args = parser.parse_args()
+
+    season_counts = [int(x) for x in args.seasons.split(',')]
+    database.init_db()
+    database.ensure_columns()
+    database.ensure_indices()
+
+    with StubServer(omdb_handler, delay=args.latency) as srv:
+        services.OMDB_BASE_URL = f'{srv.url}/'
+        results = {}
+        for label, workers, run_id in (('sequential', 1, 1), (f'pooled x{args.workers}', args.workers, 2)):
+            services.rate_limiter.configure('omdb', args.rate, args.burst)
+            time.sleep(args.burst / args.rate)  # let the bucket refill between runs
+            results[label] = run(season_counts, workers, run_id)
+
+    labels = list(results)
+    print(f"latency={args.latency * 1000:.0f}ms rate={args.rate}/s burst={args.burst} "
+          f"episodes/season={EPISODES_PER_SEASON}")
+    print(f"{'seasons':>8} " + ' '.join(f'{l:>14}' for l in labels) + f" {'speedup':>8}")
+    for i, n in enumerate(season_counts):
+        row = [results[l][i] for l in labels]
+        print(f"{n:>8} " + ' '.join(f'{t * 1000:>12.0f}ms' for t in row) + f" {row[0] / row[1]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: DOM-fallback throughput per HTML parser backend (pages/second).
+
+Runs what the scrapers do when the JSON path fails -- build a tree with
+`make_soup` and run the season DOM + heuristic parsers, the trending DOM
+parser or the meta/span rating lookups -- over the saved pages in
+tests/fixtures, once per backend in `available_parsers()` (lxml is only
+listed when installed).
+
+    python benchmarks/bench_parsers.py [--repeat 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('OMDB_API_KEY', 'bench')
+
+import services  # noqa: E402
+from imdb_helpers import (  # noqa: E402
+    available_parsers,
+    make_soup,
+    parse_imdb_season_dom,
+    parse_imdb_season_heuristic,
+)
+
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
+
+
+def parse_season(html, parser):
+    soup = make_soup(html, parser)
+    items = []
+    parse_imdb_season_dom(soup, 2, items)
+    parse_imdb_season_heuristic(soup, 2, [])
+    return items
+
+
+def parse_chart(html, parser):
+    return services._parse_trending_from_dom(make_soup(html, parser))
+
+
+def parse_title(html, parser):
+    soup = make_soup(html, parser)
+    return services._extract_rating_from_meta(soup, 'tt0') or services._extract_rating_from_span(soup, 'tt0')
+
+
+PAGES = [('imdb_season.html', parse_season), ('imdb_chart.html', parse_chart), ('imdb_title.html', parse_title)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    pages = []
+    for name, fn in PAGES:
+        with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+            pages.append((name, fn, f.read()))
+
+    backends = available_parsers()
+    if len(backends) == 1:
+        print("lxml is not installed; only html.parser is measured")
+    baseline = {}
+    for backend in backends:
+        total_pages, total_s = 0, 0.0
+        for name, fn, html in pages:
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                fn(html, backend)
+            elapsed = time.perf_counter() - t0
+            total_pages += args.repeat
+            total_s += elapsed
+            rate = args.repeat / elapsed
+            speedup = f"  ({rate / baseline[name]:.1f}x)" if name in baseline else ''
+            baseline.setdefault(name, rate)
+            print(f"{backend:12s} {name:18s} {rate:8.1f} pages/s{speedup}")
+        print(f"{backend:12s} {'all pages':18s} {total_pages / total_s:8.1f} pages/s")
+
+
+if __name__ == '__main__':
+    main()
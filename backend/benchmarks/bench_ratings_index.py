@@ -0,0 +1,61 @@
+"""
+Benchmark: ratings lookups from the memory-mapped index.
+
+Builds an index the size of the full `title.ratings.tsv` dump from synthetic
+rows and times random lookups (hits and misses). Before the index a missing
+episode rating cost a throttled IMDb title-page scrape (hundreds of
+milliseconds, up to three attempts).
+
+    python benchmarks/bench_ratings_index.py [--titles 1500000] [--lookups 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from ratings_index import RatingsIndex, build_index  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--titles', type=int, default=1500000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    ids = sorted(rng.sample(range(1, 30000000), args.titles))
+    with tempfile.TemporaryDirectory() as tmp:
+        tsv = os.path.join(tmp, 'title.ratings.tsv')
+        with open(tsv, 'w') as f:
+            f.write('tconst\taverageRating\tnumVotes\n')
+            for i in ids:
+                f.write(f'tt{i:07d}\t{rng.randint(10, 100) / 10}\t{rng.randint(5, 2000000)}\n')
+        path = os.path.join(tmp, 'ratings.idx')
+        t0 = time.perf_counter()
+        build_index(tsv, path)
+        print(f"built {args.titles} titles in {time.perf_counter() - t0:.2f}s, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        t0 = time.perf_counter()
+        index = RatingsIndex(path)
+        print(f"opened in {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+        hits = [f'tt{rng.choice(ids):07d}' for _ in range(args.lookups)]
+        misses = [f'tt{rng.randrange(30000000, 40000000):08d}' for _ in range(args.lookups)]
+        for name, queries in (('hit', hits), ('miss', misses)):
+            t0 = time.perf_counter()
+            for q in queries:
+                index.get(q)
+            elapsed = time.perf_counter() - t0
+            print(f"{name:5s} {elapsed / len(queries) * 1e6:.2f} us/lookup  ({len(queries) / elapsed:,.0f}/s)")
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
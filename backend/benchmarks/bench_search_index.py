@@ -0,0 +1,82 @@
+"""
+Benchmark: `/search` autocomplete latency from the local title index.
+
+Builds an index of synthetic titles (plus the featured list) and times
+keystroke-style prefix queries of known titles, multi-word queries and
+misspellings (trigram fallback). Before this index every keystroke was an
+OMDb round trip behind the global throttle (hundreds of milliseconds).
+
+    python benchmarks/bench_search_index.py [--titles 20000] [--queries 5000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('OMDB_API_KEY', 'bench')
+
+from featured_shows import FEATURED_SHOW_IDS  # noqa: E402
+from search_index import TitleIndex  # noqa: E402
+
+COMMON = ['the', 'of', 'and', 'a', 'in', 'to']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'dor', 'va', 'shi', 'an', 'tru', 'bel', 'os', 'ne', 'gar', 'wi', 'pen']
+
+
+def synthetic_titles(n, rng):
+    # Zipf-like vocabulary: a few stop words everywhere, a long tail of rarer words
+    vocab = sorted({''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(8000)})
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    titles = []
+    for _ in range(n):
+        words = rng.choices(vocab, weights, k=rng.randint(1, 3))
+        if rng.random() < 0.3:
+            words.insert(0, rng.choice(COMMON))
+        titles.append(' '.join(w.title() for w in words))
+    return titles
+
+
+def timed(index, queries):
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.search(q)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--titles', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    titles = synthetic_titles(args.titles, rng) + [info['title'] for info in FEATURED_SHOW_IDS]
+    index = TitleIndex()
+    t0 = time.perf_counter()
+    for i, title in enumerate(titles):
+        index.add(f'tt{i:07d}', title, views=rng.randint(0, 1000))
+    print(f"indexed {len(index)} titles in {time.perf_counter() - t0:.2f}s")
+
+    known = [info['title'] for info in FEATURED_SHOW_IDS]
+    prefixes = [t[:rng.randint(2, len(t))] for t in (rng.choice(known) for _ in range(args.queries))]
+    multi = [' '.join(w[:rng.randint(min(2, len(w)), len(w))] for w in rng.choice(titles).split()[:2]) for _ in range(args.queries)]
+    typos = []
+    for t in (rng.choice(known) for _ in range(args.queries)):
+        i = rng.randrange(len(t) - 1)
+        typos.append(t[:i] + t[i + 1] + t[i] + t[i + 2:])
+
+    for name, queries in (('prefix of known title', prefixes), ('two-word prefix', multi), ('misspelt title', typos)):
+        p50, p99 = timed(index, queries)
+        print(f"{name:24s} p50 {p50:.3f} ms  p99 {p99:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: get/set throughput of `utils.TTLCache`.
+
+"before" is the old unbounded dict cache (no lock, no eviction); "after" is
+the bounded LRU cache, once with an entry limit only and once with byte
+accounting enabled. Keys follow a long-tail distribution larger than the
+cache, so the bounded variants evict continuously.
+
+    python benchmarks/bench_ttl_cache.py [--ops 200000] [--keys 20000] [--max-entries 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from utils import TTLCache  # noqa: E402
+
+
+class LegacyTTLCache:
+    """The previous implementation: a plain dict, expired entries never removed."""
+
+    def __init__(self, default_ttl):
+        self._cache = {}
+        self._default_ttl = default_ttl
+
+    def get(self, key, require_value=True):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        timestamp, value, ttl = entry
+        if (time.time() - timestamp) >= ttl:
+            return None
+        if require_value and not value:
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        self._cache[key] = (time.time(), value, ttl if ttl is not None else self._default_ttl)
+
+
+def run(cache, keys, value):
+    start = time.perf_counter()
+    for key in keys:
+        if cache.get(key) is None:
+            cache.set(key, value)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ops', type=int, default=200000)
+    parser.add_argument('--keys', type=int, default=20000)
+    parser.add_argument('--max-entries', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    # 70% of lookups hit a small hot set, the rest spread over the long tail
+    hot = max(1, args.keys // 20)
+    keys = [('tt%07d' % (rng.randrange(hot) if rng.random() < 0.7 else rng.randrange(args.keys)), 1)
+            for _ in range(args.ops)]
+    value = [{'episode': i, 'rating': 7.5, 'votes': 100, 'title': f'Episode {i}'} for i in range(20)]
+
+    variants = [
+        ('before (unbounded dict)', LegacyTTLCache(300)),
+        ('after (max_entries)', TTLCache(300, max_entries=args.max_entries)),
+        ('after (max_entries + max_bytes)', TTLCache(300, max_entries=args.max_entries, max_bytes=64 * 1024 * 1024)),
+    ]
+    print(f"{args.ops} get-or-set ops over {args.keys} keys")
+    for name, cache in variants:
+        elapsed = run(cache, keys, value)
+        size = len(cache._cache)
+        extra = ''
+        if isinstance(cache, TTLCache):
+            stats = cache.stats()
+            extra = f", hit rate {stats['hits'] / args.ops:.1%}, evictions {stats['evictions']}"
+        print(f"{name:34s} {args.ops / elapsed / 1e3:8.0f}k ops/s  entries {size}{extra}")
+
+
+if __name__ == '__main__':
+    main()
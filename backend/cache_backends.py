@@ -0,0 +1,324 @@
+"""
+Shared (L2) cache backends behind the in-process `TTLCache`.
+
+Each uvicorn worker keeps its own `TTLCache`, so without a shared tier the
+hit rate drops with the worker count and the same IMDb page is scraped once
+per process. A `CacheBackend` stores JSON-encoded values with an absolute
+expiry and is shared by every process that points at it:
+
+- `SqliteCacheBackend`: a WAL-mode SQLite file, shared by workers on one host.
+- `RedisCacheBackend`: any client with Redis' `get`/`set(px=)`/`delete`/
+  `scan_iter` methods (redis-py, or a stand-in in tests).
+
+`TieredCache` puts a `TTLCache` (L1) in front of a backend (L2) behind the
+same `get`/`set`/`clear` API. Selected with `CACHE_BACKEND`
+(`memory` (default), `sqlite`, `redis`).
+"""
+from __future__ import annotations
+
+import importlib.util
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Hashable
+
+from utils import TTLCache
+
+
+CACHE_BACKEND: str = os.getenv('CACHE_BACKEND', 'memory').lower()
+CACHE_SQLITE_PATH: str = os.getenv(
+    'CACHE_SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared_cache.db'))
+CACHE_SQLITE_MAX_ROWS: int = int(os.getenv('CACHE_SQLITE_MAX_ROWS', 100000))   # per namespace
+REDIS_URL: str = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_key(key: Hashable) -> str:
+    # Tuple keys such as (imdb_id, season) become JSON arrays
+    return json.dumps(key, separators=(',', ':'))
+
+
+def _decode_key(raw: str) -> Hashable:
+    key = json.loads(raw)
+    return tuple(key) if isinstance(key, list) else key
+
+
+# ============================================================================
+# Backends
+# ============================================================================
+class CacheBackend:
+    """Interface for a shared key/value store with per-entry expiry."""
+
+    name = 'base'
+
+    def get(self, key: Hashable) -> tuple[Any, float] | None:
+        """(value, seconds left) for a live entry, or None."""
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def keys(self) -> list[Hashable]:
+        """Live keys (for debugging; may scan the whole namespace)."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class SqliteCacheBackend(CacheBackend):
+    """
+    Cache rows in a SQLite file in WAL mode, so readers in other processes
+    never block on a writer. One connection per thread; expired rows are
+    purged (and the namespace trimmed to `max_rows`) every `purge_interval`
+    seconds by whichever process writes next.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH, namespace: str = 'default',
+                 max_rows: int = CACHE_SQLITE_MAX_ROWS, purge_interval: float = 300.0) -> None:
+        self._path = path
+        self._namespace = namespace
+        self._max_rows = max_rows
+        self._purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+        self._local = threading.local()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, value TEXT NOT NULL,"
+                " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_expiry ON cache_entries (namespace, expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: Hashable) -> tuple[Any, float] | None:
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self._namespace, _encode_key(key), now)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1] - now
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+            (self._namespace, _encode_key(key), now + ttl, json.dumps(value, separators=(',', ':')))
+        )
+        if now >= self._next_purge:
+            self._next_purge = now + self._purge_interval
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete expired rows and trim the namespace to `max_rows` (soonest to expire go first)."""
+        conn = self._conn()
+        with conn:
+            removed = conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (self._namespace, time.time())
+            ).rowcount
+            removed += conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache_entries WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self._namespace, self._namespace, self._max_rows)
+            ).rowcount
+        return removed
+
+    def delete(self, key: Hashable) -> None:
+        self._conn().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self._namespace, _encode_key(key)))
+
+    def keys(self) -> list[Hashable]:
+        rows = self._conn().execute(
+            "SELECT key FROM cache_entries WHERE namespace = ? AND expires_at > ?", (self._namespace, time.time())
+        ).fetchall()
+        return [_decode_key(row[0]) for row in rows]
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM cache_entries WHERE namespace = ?", (self._namespace,))
+
+
+class RedisCacheBackend(CacheBackend):
+    """Entries as `<prefix>:<namespace>:<key>` strings; Redis expires them itself."""
+
+    name = 'redis'
+
+    def __init__(self, client: Any, namespace: str = 'default', prefix: str = 'imdbheatmap') -> None:
+        self._client = client
+        self._prefix = f"{prefix}:{namespace}:"
+
+    def get(self, key: Hashable) -> tuple[Any, float] | None:
+        raw = self._client.get(self._prefix + _encode_key(key))
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        remaining = entry['e'] - time.time()
+        if remaining <= 0:
+            return None
+        return entry['v'], remaining
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        # Absolute expiry travels with the value so readers can size their L1 TTL
+        payload = json.dumps({'v': value, 'e': time.time() + ttl}, separators=(',', ':'))
+        self._client.set(self._prefix + _encode_key(key), payload, px=max(1, int(ttl * 1000)))
+
+    def delete(self, key: Hashable) -> None:
+        self._client.delete(self._prefix + _encode_key(key))
+
+    def keys(self) -> list[Hashable]:
+        keys = []
+        for name in self._client.scan_iter(match=self._prefix + '*'):
+            if isinstance(name, bytes):
+                name = name.decode()
+            keys.append(_decode_key(name[len(self._prefix):]))
+        return keys
+
+    def clear(self) -> None:
+        names = list(self._client.scan_iter(match=self._prefix + '*'))
+        if names:
+            self._client.delete(*names)
+
+
+_redis_client: Any = None
+
+
+def make_backend(namespace: str, kind: str = CACHE_BACKEND) -> CacheBackend | None:
+    """Backend configured by `CACHE_BACKEND`, or None for process-local caching only."""
+    global _redis_client
+    if kind == 'sqlite':
+        return SqliteCacheBackend(namespace=namespace)
+    if kind == 'redis':
+        if importlib.util.find_spec('redis') is None:
+            logger.warning("CACHE_BACKEND=redis but the 'redis' package is not installed; using per-process caches")
+            return None
+        if _redis_client is None:
+            import redis
+            _redis_client = redis.Redis.from_url(REDIS_URL)
+        return RedisCacheBackend(_redis_client, namespace=namespace)
+    if kind != 'memory':
+        logger.warning("Unknown CACHE_BACKEND=%r; using per-process caches", kind)
+    return None
+
+
+# ============================================================================
+# Tiered Cache
+# ============================================================================
+class TieredCache:
+    """
+    `TTLCache` API over an in-process L1 and an optional shared L2.
+
+    Reads try L1, then L2 (copying hits into L1 for the entry's remaining
+    lifetime); writes go to both. Backend errors are logged and treated as
+    misses, so an unavailable L2 degrades to per-process caching.
+    """
+
+    def __init__(self, l1: TTLCache, l2: CacheBackend | None = None) -> None:
+        self._l1 = l1
+        self._l2 = l2
+        self._lock = threading.Lock()
+        self._stats = {'l2Hits': 0, 'l2Misses': 0, 'l2Errors': 0}
+
+    def get(self, key: Hashable, require_value: bool = True) -> Any | None:
+        """Retrieve a fresh value from L1, else from the shared backend."""
+        entry = self.get_entry(key)
+        if entry is None or entry[1]:
+            return None
+        value = entry[0]
+        if require_value and not value:
+            return None
+        return value
+
+    def get_entry(self, key: Hashable) -> tuple[Any, bool] | None:
+        """(value, is_stale) from L1, else from the shared backend (see `TTLCache.get_entry`)."""
+        entry = self._l1.get_entry(key)
+        if entry is not None and not entry[1]:
+            return entry
+        if self._l2 is None:
+            return entry
+        try:
+            shared = self._l2.get(key)
+        except Exception as e:
+            self._count('l2Errors')
+            logger.warning("Shared cache read failed: %s", e)
+            return entry
+        if shared is None:
+            self._count('l2Misses')
+            return entry
+        self._count('l2Hits')
+        value, remaining = shared
+        # The shared copy lives max_stale past its TTL; what is left of the TTL may be negative (stale)
+        fresh_for = remaining - self._l1.max_stale
+        self._l1.set(key, value, ttl=fresh_for)
+        return value, fresh_for <= 0
+
+    def set(self, key: Hashable, value: Any, ttl: int | None = None) -> None:
+        """Store a value in both tiers with optional custom TTL."""
+        self._l1.set(key, value, ttl=ttl)
+        if self._l2 is not None:
+            try:
+                effective_ttl = ttl if ttl is not None else self._l1.default_ttl
+                self._l2.set(key, value, effective_ttl + self._l1.max_stale)
+            except Exception as e:
+                self._count('l2Errors')
+                logger.warning("Shared cache write failed: %s", e)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove `key` from both tiers; returns the L1 value, if any."""
+        value = self._l1.pop(key, default)
+        if self._l2 is not None:
+            try:
+                self._l2.delete(key)
+            except Exception as e:
+                self._count('l2Errors')
+                logger.warning("Shared cache delete failed: %s", e)
+        return value
+
+    def keys(self) -> list[Hashable]:
+        """Keys held in either tier."""
+        keys = dict.fromkeys(self._l1.keys())
+        if self._l2 is not None:
+            try:
+                keys.update(dict.fromkeys(self._l2.keys()))
+            except Exception as e:
+                logger.warning("Shared cache scan failed: %s", e)
+        return list(keys)
+
+    def clear(self) -> None:
+        """Clear all cached entries in both tiers."""
+        self._l1.clear()
+        if self._l2 is not None:
+            try:
+                self._l2.clear()
+            except Exception as e:
+                logger.warning("Shared cache clear failed: %s", e)
+
+    def stats(self) -> dict[str, Any]:
+        """L1 counters plus shared-tier hits/misses/errors."""
+        with self._lock:
+            l2 = dict(self._stats)
+        return {**self._l1.stats(), **l2, 'backend': self._l2.name if self._l2 is not None else None}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
@@ -1,11 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, func, text
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, Index, func, text, case, and_
 from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session
 from datetime import datetime, timedelta, UTC
 from dotenv import load_dotenv
+import logging
 import os
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Database setup
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///shows.db')
 IS_POSTGRES = DATABASE_URL.startswith('postgresql')
@@ -42,8 +45,13 @@ class Show(Base):
     imdb_votes = Column(Integer)
     view_count = Column(Integer, default=0)
     poster = Column(String)
+    plot = Column(String)
     last_full_refresh = Column(DateTime)
     last_updated = Column(DateTime, default=func.now(), onupdate=func.now())
+    # ETag ingredients, maintained by touch_show_data so a 304 needs only this row
+    episode_count = Column(Integer, nullable=False, default=0)
+    absent_count = Column(Integer, nullable=False, default=0)
+    data_version = Column(Integer, nullable=False, default=0)
 
 class Episode(Base):
     __tablename__ = 'episodes'
@@ -61,6 +69,9 @@ class Episode(Base):
     air_date = Column(DateTime)
     provisional = Column(Boolean)
 
+    # One row per slot: bulk writes upsert on it (see shows.show_writer)
+    __table_args__ = (Index('uq_episode_show_season_ep', 'show_id', 'season', 'episode', unique=True),)
+
 class SeasonHash(Base):
     __tablename__ = 'season_hashes'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -69,6 +80,25 @@ class SeasonHash(Base):
     signature = Column(String)
     last_computed = Column(DateTime, default=func.now(), onupdate=func.now())
 
+class JobRecord(Base):
+    """Durable background job (see jobs.DbJobStore); one active row per (kind, key)."""
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    payload = Column(Text)
+    priority = Column(Integer, nullable=False, default=10)
+    status = Column(String, nullable=False, default='pending')  # pending | running | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False)
+    lease_owner = Column(String)
+    lease_expires_at = Column(DateTime)
+    last_error = Column(Text)
+    result = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
 
 # =============================================================================
 # Database initialization & migrations
@@ -101,6 +131,10 @@ def ensure_columns():
             ('last_full_refresh', 'DATETIME', 'TIMESTAMP'),
             ('view_count', 'INTEGER', 'INTEGER'),
             ('poster', 'TEXT', 'TEXT'),
+            ('plot', 'TEXT', 'TEXT'),
+            ('episode_count', 'INTEGER NOT NULL DEFAULT 0', 'INTEGER NOT NULL DEFAULT 0'),
+            ('absent_count', 'INTEGER NOT NULL DEFAULT 0', 'INTEGER NOT NULL DEFAULT 0'),
+            ('data_version', 'INTEGER NOT NULL DEFAULT 0', 'INTEGER NOT NULL DEFAULT 0'),
         ]
         episode_columns = [
             ('votes', 'INTEGER', 'INTEGER'),
@@ -111,24 +145,76 @@ def ensure_columns():
             ('provisional', 'BOOLEAN', 'BOOLEAN'),
         ]
 
+        added_show_columns = set()
         for col, sqlite_type, pg_type in show_columns:
             if not column_exists('shows', col):
                 col_type = pg_type if IS_POSTGRES else sqlite_type
                 conn.execute(text(f"ALTER TABLE shows ADD COLUMN {col} {col_type}"))
+                added_show_columns.add(col)
 
         for col, sqlite_type, pg_type in episode_columns:
             if not column_exists('episodes', col):
                 col_type = pg_type if IS_POSTGRES else sqlite_type
                 conn.execute(text(f"ALTER TABLE episodes ADD COLUMN {col} {col_type}"))
 
+        if {'episode_count', 'absent_count'} & added_show_columns:
+            # Backfill the ETag counters for rows that predate them
+            conn.execute(text(
+                "UPDATE shows SET "
+                "episode_count = (SELECT COUNT(*) FROM episodes WHERE episodes.show_id = shows.id), "
+                "absent_count = (SELECT COUNT(*) FROM episodes WHERE episodes.show_id = shows.id "
+                "AND episodes.absent = :yes AND episodes.rating IS NULL)"
+            ), {'yes': True})
+
         conn.commit()
 
+def _index_exists(conn, name):
+    if IS_POSTGRES:
+        query = "SELECT 1 FROM pg_indexes WHERE indexname = :name"
+    else:
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"
+    return conn.execute(text(query), {'name': name}).first() is not None
+
 def ensure_indices():
     """Create indices if they don't exist."""
     with engine.connect() as conn:
+        if not _index_exists(conn, 'uq_episode_show_season_ep'):
+            # Older databases may hold duplicate slots (racing writers). Keep the best row of each:
+            # rated over unrated (placeholders), then the most recently checked, then the newest
+            removed = conn.execute(text(
+                "DELETE FROM episodes WHERE id IN ("
+                "SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+                "PARTITION BY show_id, season, episode ORDER BY "
+                "CASE WHEN rating IS NULL THEN 1 ELSE 0 END, "
+                "CASE WHEN last_checked IS NULL THEN 1 ELSE 0 END, last_checked DESC, id DESC"
+                ") AS rn FROM episodes "
+                "WHERE show_id IS NOT NULL AND season IS NOT NULL AND episode IS NOT NULL) ranked "
+                "WHERE rn > 1)"
+            )).rowcount
+            if removed:
+                logger.warning("Removed %d duplicate episode rows before creating uq_episode_show_season_ep", removed)
+                conn.execute(text(
+                    "UPDATE shows SET "
+                    "episode_count = (SELECT COUNT(*) FROM episodes WHERE episodes.show_id = shows.id), "
+                    "absent_count = (SELECT COUNT(*) FROM episodes WHERE episodes.show_id = shows.id "
+                    "AND episodes.absent = :yes AND episodes.rating IS NULL)"
+                ), {'yes': True})
+            conn.execute(text(
+                "CREATE UNIQUE INDEX uq_episode_show_season_ep ON episodes (show_id, season, episode)"
+            ))
+        # Superseded by the unique index above
+        conn.execute(text("DROP INDEX IF EXISTS idx_episode_show_season_ep"))
+        # At most one pending/running job per (kind, key): enqueue dedup relies on it
         conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS idx_episode_show_season_ep "
-            "ON episodes (show_id, season, episode)"
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_active_kind_key "
+            "ON jobs (kind, key) WHERE status IN ('pending', 'running')"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_claim "
+            "ON jobs (status, priority, run_after, id)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (key, status)"
         ))
         conn.commit()
 
@@ -154,6 +240,23 @@ def get_or_create_season_hash(show_id, season):
         session.commit()
     return rec
 
+def touch_show_data(db_session, show):
+    """
+    Record a change to a show's payload (metadata or episodes): recount the
+    ETag counters from the episodes table and bump data_version. Call before
+    committing any such write.
+    """
+    db_session.flush()
+    total, absent = db_session.query(
+        func.count(Episode.id),
+        func.sum(case((and_(Episode.absent == True, Episode.rating.is_(None)), 1), else_=0)),  # noqa: E712
+    ).filter(Episode.show_id == show.id).one()
+    show.episode_count = total or 0
+    show.absent_count = int(absent or 0)
+    # SQL-side increment so concurrent writers never hand out the same version
+    show.data_version = Show.data_version + 1
+    show.last_updated = _utc_now()
+
 def is_show_metadata_stale(show: Show) -> bool:
     if not show.last_full_refresh:
         return True
@@ -0,0 +1,81 @@
+"""
+In-process publish/subscribe channel for per-show progress events.
+
+Background jobs (IMDb enrichment, missing-rating refresh) publish deltas
+keyed by imdb_id; the `/events/show` SSE endpoint subscribes and forwards
+them to the browser, so clients no longer poll `/getShow` while work runs.
+The bus does not cross processes; for jobs run by another server process the
+SSE stream falls back to polling the DB (see `shows.show_events`).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+from typing import Any
+
+
+SUBSCRIBER_QUEUE_SIZE: int = 256
+
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Event Bus
+# ============================================================================
+class ShowEventBus:
+    """Fan-out of events to any number of subscribers per imdb_id."""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE) -> None:
+        self._subscribers: dict[str, set[queue.Queue]] = {}
+        self._lock = threading.Lock()
+        self._queue_size = queue_size
+
+    def subscribe(self, imdb_id: str) -> queue.Queue:
+        """Register a new subscriber queue for a show."""
+        q: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.setdefault(imdb_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, imdb_id: str, q: queue.Queue) -> None:
+        """Remove a subscriber queue; safe to call more than once."""
+        with self._lock:
+            subs = self._subscribers.get(imdb_id)
+            if subs is None:
+                return
+            subs.discard(q)
+            if not subs:
+                del self._subscribers[imdb_id]
+
+    def has_subscribers(self, imdb_id: str) -> bool:
+        """Cheap check so publishers can skip building events nobody reads."""
+        return bool(self._subscribers.get(imdb_id))
+
+    def publish(self, imdb_id: str, event: dict[str, Any]) -> int:
+        """Deliver an event to every subscriber; returns how many received it."""
+        with self._lock:
+            subs = list(self._subscribers.get(imdb_id, ()))
+        delivered = 0
+        for q in subs:
+            try:
+                q.put_nowait(event)
+                delivered += 1
+            except queue.Full:
+                # A stalled client must not block the publishing job
+                logger.warning("Dropping event for slow subscriber: imdb_id=%s, type=%s", imdb_id, event.get('type'))
+        return delivered
+
+
+show_events = ShowEventBus()
+
+
+# ============================================================================
+# SSE Formatting
+# ============================================================================
+def format_sse(event: dict[str, Any]) -> str:
+    """Encode an event dict as a named Server-Sent Event."""
+    data = json.dumps(event, separators=(',', ':'))
+    return f"event: {event.get('type', 'message')}\ndata: {data}\n\n"
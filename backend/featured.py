@@ -0,0 +1,178 @@
+"""
+Precomputed `/featured` list.
+
+The list is assembled from one `IN` query over `FEATURED_SHOW_IDS`, built
+during app startup and rebuilt by a background thread ahead of expiry (or
+soon after a featured show is ingested), so requests only ever read the
+cached list. Featured shows missing from the DB are queued for ingest.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any
+
+from database import session, Show
+from featured_shows import FEATURED_SHOW_IDS
+from jobs import job_queue, PRIORITY_MAINTENANCE, QueueFull
+
+
+FEATURED_CACHE_TTL: int = 86400          # 24 hours
+FEATURED_REFRESH_MARGIN: int = 3600      # rebuild this long before expiry
+FEATURED_DIRTY_DELAY: float = 30.0       # coalesce rebuilds after ingests finish
+FEATURED_PREFETCH: bool = os.getenv('FEATURED_PREFETCH', '1') == '1'
+
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Assembly
+# ============================================================================
+def build_featured(db_session=session) -> list[dict[str, Any]]:
+    """Assemble the featured list with a single query; shows not in the DB use the curated info."""
+    ids = [info['imdbID'] for info in FEATURED_SHOW_IDS]
+    rows = db_session.query(
+        Show.imdb_id, Show.title, Show.year, Show.poster, Show.imdb_rating
+    ).filter(Show.imdb_id.in_(ids)).all()
+    by_id = {row.imdb_id: row for row in rows}
+
+    shows = []
+    for info in FEATURED_SHOW_IDS:
+        row = by_id.get(info['imdbID'])
+        if row and row.poster:
+            shows.append({
+                'imdbID': info['imdbID'],
+                'title': row.title or info['title'],
+                'year': row.year or info['year'],
+                'poster': row.poster,
+                'imdbRating': row.imdb_rating
+            })
+        else:
+            # Basic info without poster - still usable by frontend
+            shows.append({
+                'imdbID': info['imdbID'],
+                'title': info['title'],
+                'year': info['year'],
+                'poster': None,
+                'imdbRating': None
+            })
+
+    # Shuffle to add variety, then prioritize shows with posters
+    random.shuffle(shows)
+    shows.sort(key=lambda x: (x['poster'] is None, x['imdbRating'] is None))
+    return shows
+
+
+def prefetch_missing_featured(db_session=session) -> int:
+    """Queue ingest for featured shows not yet stored (or without a poster); returns how many were queued."""
+    ids = [info['imdbID'] for info in FEATURED_SHOW_IDS]
+    have = {
+        row.imdb_id: row.poster
+        for row in db_session.query(Show.imdb_id, Show.poster).filter(Show.imdb_id.in_(ids)).all()
+    }
+    queued = 0
+    for imdb_id in ids:
+        if imdb_id not in have:
+            kind = 'ingest_show'
+        elif not have[imdb_id]:
+            kind = 'poster_backfill'
+        else:
+            continue
+        try:
+            job_queue.submit(kind, imdb_id, {'imdb_id': imdb_id}, priority=PRIORITY_MAINTENANCE)
+            queued += 1
+        except QueueFull:
+            logger.warning("Job queue full, featured prefetch stopped after %d shows", queued)
+            break
+    return queued
+
+
+# ============================================================================
+# Cache
+# ============================================================================
+class FeaturedCache:
+    """Holds the built list; a background thread rebuilds it before it expires."""
+
+    def __init__(self, ttl: float = FEATURED_CACHE_TTL, refresh_margin: float = FEATURED_REFRESH_MARGIN,
+                 dirty_delay: float = FEATURED_DIRTY_DELAY) -> None:
+        self._ttl = ttl
+        self._refresh_margin = min(refresh_margin, ttl / 2)
+        self._dirty_delay = dirty_delay
+        self._lock = threading.Lock()
+        self._data: list[dict[str, Any]] | None = None
+        self._built_at = 0.0
+        self._dirty_at: float | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.builds = 0
+
+    def get(self) -> list[dict[str, Any]]:
+        """Current list; builds inline only if nothing was ever built (startup warm-up skipped)."""
+        data = self._data
+        if data is None:
+            return self.warm()
+        if time.time() - self._built_at >= self._ttl:
+            # Refresher is behind (e.g. stopped); serve what we have and let it catch up
+            self._wake.set()
+        return data
+
+    def warm(self) -> list[dict[str, Any]]:
+        """Build the list now."""
+        data = build_featured()
+        with self._lock:
+            self._data = data
+            self._built_at = time.time()
+            self._dirty_at = None
+            self.builds += 1
+        return data
+
+    def mark_dirty(self) -> None:
+        """Ask for a rebuild shortly (a featured show was just ingested or got a poster)."""
+        with self._lock:
+            if self._dirty_at is None:
+                self._dirty_at = time.time() + self._dirty_delay
+        self._wake.set()
+
+    def _next_build_at(self) -> float:
+        due = self._built_at + self._ttl - self._refresh_margin
+        if self._dirty_at is not None:
+            due = min(due, self._dirty_at)
+        return due
+
+    def start(self) -> None:
+        """Start the background refresher (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='featured-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            delay = self._next_build_at() - time.time()
+            if delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            try:
+                self.warm()
+            except Exception as e:
+                logger.warning("Featured rebuild failed: %s", e)
+                self._stop.wait(60)
+            finally:
+                session.remove()
+
+
+featured_cache = FeaturedCache()
@@ -0,0 +1,243 @@
+"""
+Persistent on-disk cache for upstream HTTP responses.
+
+Sits under `throttled_omdb_get` / `throttled_imdb_get`: a fresh entry is
+answered from disk without taking a rate-limit token, a stale one is
+revalidated with `If-None-Match` / `If-Modified-Since` when the upstream sent
+validators (a 304 only refreshes the entry), and everything else goes
+upstream and is stored. Entries survive restarts and deploys, so a new
+process starts warm.
+
+Each response is one file: a JSON header line (status, a few headers, when it
+was stored) followed by the zlib-compressed body. Writes go through a
+temporary file and `os.replace`, so concurrent workers never see partial
+entries. Freshness is configured per endpoint class (`ENDPOINT_TTLS`).
+Enabled with `ENABLE_HTTP_CACHE=1`.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+
+HTTP_CACHE_ENABLED: bool = os.getenv('ENABLE_HTTP_CACHE') == '1'
+HTTP_CACHE_DIR: str = os.getenv(
+    'HTTP_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache'))
+HTTP_CACHE_MAX_BYTES: int = int(float(os.getenv('HTTP_CACHE_MAX_MB', 256)) * 1024 * 1024)
+
+# Seconds an entry is served without asking upstream, per endpoint class
+ENDPOINT_TTLS: dict[str, int] = {
+    'omdb_title': int(os.getenv('HTTP_CACHE_TTL_OMDB_TITLE', 3600)),
+    'omdb_season': int(os.getenv('HTTP_CACHE_TTL_OMDB_SEASON', 3600)),
+    'imdb_season': int(os.getenv('HTTP_CACHE_TTL_IMDB_SEASON', 300)),
+    'imdb_title': int(os.getenv('HTTP_CACHE_TTL_IMDB_TITLE', 86400)),
+    'chart': int(os.getenv('HTTP_CACHE_TTL_CHART', 86400)),
+}
+
+# Only these response headers are stored (bodies are already decoded by httpx)
+_KEPT_HEADERS = ('content-type', 'etag', 'last-modified')
+_SECRET_PARAMS = {'apikey'}
+_PRUNE_EVERY = 500   # writes between size checks
+
+
+logger = logging.getLogger(__name__)
+
+
+def endpoint_class(source: str, url: str) -> str | None:
+    """Classify an upstream URL; None means "do not cache" (e.g. OMDb search)."""
+    parts = urlsplit(url)
+    if source == 'omdb':
+        params = dict(parse_qsl(parts.query))
+        if 'season' in params:
+            return 'omdb_season'
+        if 'i' in params or 't' in params:
+            return 'omdb_title'
+        return None
+    if source == 'imdb':
+        if parts.path.startswith('/chart/'):
+            return 'chart'
+        if re.match(r'^/title/tt\d+/episodes', parts.path):
+            return 'imdb_season'
+        if re.match(r'^/title/tt\d+/?$', parts.path):
+            return 'imdb_title'
+    return None
+
+
+def _cache_url(url: str) -> str:
+    """URL with secrets (the OMDb API key) removed, used as the cache key."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in _SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(sorted(query))))
+
+
+def _is_cacheable(cls: str, resp: httpx.Response) -> bool:
+    if resp.status_code != 200:
+        return False
+    if cls.startswith('omdb'):
+        # OMDb reports errors (including "Request limit reached!") with status 200
+        try:
+            return resp.json().get('Response') != 'False'
+        except Exception:
+            return False
+    return True
+
+
+# ============================================================================
+# Cache
+# ============================================================================
+class HttpResponseCache:
+    """Disk-backed response cache shared by every process using `directory`."""
+
+    def __init__(self, directory: str = HTTP_CACHE_DIR, ttls: dict[str, int] | None = None,
+                 max_bytes: int = HTTP_CACHE_MAX_BYTES, enabled: bool = HTTP_CACHE_ENABLED) -> None:
+        self.directory = directory
+        self.enabled = enabled
+        self._ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stores': 0, 'errors': 0}
+
+    def get(self, source: str, url: str, fetch: Callable[[dict[str, str]], httpx.Response]) -> httpx.Response:
+        """
+        Answer `url` from disk if fresh; otherwise call `fetch(extra_headers)`
+        (conditional headers when revalidating) and store a cacheable result.
+        """
+        cls = endpoint_class(source, url) if self.enabled else None
+        ttl = self._ttls.get(cls) if cls else None
+        if not ttl:
+            return fetch({})
+
+        path = self._path(_cache_url(url))
+        entry = self._load(path)
+        if entry is not None:
+            meta, body = entry
+            if time.time() - meta['stored_at'] < ttl:
+                self._count('hits')
+                return self._response(url, meta, body)
+
+        conditional = {}
+        if entry is not None:
+            if entry[0]['headers'].get('etag'):
+                conditional['If-None-Match'] = entry[0]['headers']['etag']
+            if entry[0]['headers'].get('last-modified'):
+                conditional['If-Modified-Since'] = entry[0]['headers']['last-modified']
+
+        resp = fetch(conditional)
+        if resp.status_code == 304 and entry is not None:
+            meta, body = entry
+            meta['stored_at'] = time.time()
+            self._store(path, meta, body)
+            self._count('revalidated')
+            return self._response(url, meta, body)
+
+        self._count('misses')
+        if _is_cacheable(cls, resp):
+            meta = {
+                'url': _cache_url(url),
+                'class': cls,
+                'status': resp.status_code,
+                'headers': {k: resp.headers[k] for k in _KEPT_HEADERS if k in resp.headers},
+                'stored_at': time.time(),
+            }
+            self._store(path, meta, resp.content)
+        return resp
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _path(self, key_url: str) -> str:
+        digest = hashlib.sha256(key_url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + '.bin')
+
+    def _load(self, path: str) -> tuple[dict[str, Any], bytes] | None:
+        try:
+            with open(path, 'rb') as f:
+                header = f.readline()
+                compressed = f.read()
+            return json.loads(header), zlib.decompress(compressed)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self._count('errors')
+            logger.warning("Discarding unreadable HTTP cache entry %s: %s", path, e)
+            return None
+
+    def _store(self, path: str, meta: dict[str, Any], body: bytes) -> None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json.dumps(meta, separators=(',', ':')).encode('utf-8') + b'\n')
+                f.write(zlib.compress(body, 6))
+            os.replace(tmp, path)
+        except OSError as e:
+            self._count('errors')
+            logger.warning("HTTP cache write failed for %s: %s", meta.get('url'), e)
+            return
+        with self._lock:
+            self._stats['stores'] += 1
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    @staticmethod
+    def _response(url: str, meta: dict[str, Any], body: bytes) -> httpx.Response:
+        return httpx.Response(meta['status'], headers=meta['headers'], content=body,
+                              request=httpx.Request('GET', url))
+
+    def prune(self) -> int:
+        """Delete the least recently stored entries until the cache fits in `max_bytes`."""
+        files = []
+        for root, _dirs, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _mtime, size, path in sorted(files):
+            if total <= self._max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        for root, _dirs, names in os.walk(self.directory):
+            for name in names:
+                try:
+                    os.remove(os.path.join(root, name))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'enabled': self.enabled, 'directory': self.directory}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+
+http_cache = HttpResponseCache()
@@ -1,35 +1,93 @@
 import os
 import re
-import time
 import json
-from datetime import datetime
+import importlib.util
 import threading
+from datetime import datetime
 import httpx
+from bs4 import BeautifulSoup
 
 from utils import parse_float
 
-# --- Throttle ---
-_last_call = 0.0
-_call_lock = threading.Lock()
-
 IMDB_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0 Safari/537.36',
     'Accept-Language': 'en-US,en;q=0.9'
 }
 
 
-def throttled_get(url, min_interval, timeout=10, headers=None):
-    global _last_call
-    with _call_lock:
-        now = time.time()
-        delta = now - _last_call
-        if delta < min_interval:
-            time.sleep(min_interval - delta)
+# --- Throttle ---
+
+def throttled_get(url, bucket, timeout=10, headers=None, client=None):
+    """GET after taking a token from `bucket`; no lock is held during the request."""
+    bucket.acquire()
+    return (client or httpx).get(url, timeout=timeout, headers=headers)
+
+
+# --- Parser backend ---
+# The DOM fallbacks only use BeautifulSoup's API, so the tree builder is
+# swappable. lxml (C) builds the tree several times faster than the
+# pure-Python html.parser; HTML_PARSER=auto picks it when installed.
+
+def available_parsers():
+    parsers = ['html.parser']
+    if importlib.util.find_spec('lxml') is not None:
+        parsers.append('lxml')
+    return parsers
+
+
+def resolve_parser(name):
+    name = (name or 'auto').lower()
+    if name == 'auto':
+        return available_parsers()[-1]
+    if name in available_parsers():
+        return name
+    print(f"[parser] HTML_PARSER={name} is not available; using html.parser")
+    return 'html.parser'
+
+
+HTML_PARSER = resolve_parser(os.getenv('HTML_PARSER', 'auto'))
+
+
+def make_soup(html, parser=None):
+    """BeautifulSoup tree of `html` built with `parser` (default: HTML_PARSER)."""
+    return BeautifulSoup(html, parser or HTML_PARSER)
+
+
+# --- Raw script extraction ---
+# IMDb pages carry their data as JSON in <script> tags; slicing those out of
+# the HTML text is far cheaper than building a DOM of the whole page.
+
+_NEXT_DATA_OPEN = re.compile(r'<script\b[^>]*\bid\s*=\s*["\']?__NEXT_DATA__["\']?[^>]*>', re.I)
+_LD_JSON_OPEN = re.compile(r'<script\b[^>]*\btype\s*=\s*["\']?application/ld\+json["\']?[^>]*>', re.I)
+_SCRIPT_CLOSE = re.compile(r'</script\s*>', re.I)
+
+
+def _script_payloads(html, opening):
+    for m in opening.finditer(html):
+        end = _SCRIPT_CLOSE.search(html, m.end())
+        if end:
+            yield html[m.end():end.start()]
+
+
+def extract_next_data(html):
+    """Parsed `__NEXT_DATA__` JSON of a page, or None if absent or malformed."""
+    for payload in _script_payloads(html or '', _NEXT_DATA_OPEN):
         try:
-            resp = httpx.get(url, timeout=timeout, headers=headers)
-        finally:
-            _last_call = time.time()
-    return resp
+            return json.loads(payload)
+        except ValueError:
+            return None
+    return None
+
+
+def extract_ld_json(html):
+    """Every parseable `application/ld+json` block of a page, in document order."""
+    blocks = []
+    for payload in _script_payloads(html or '', _LD_JSON_OPEN):
+        try:
+            blocks.append(json.loads(payload))
+        except ValueError:
+            continue
+    return blocks
 
 
 # --- Parsing helpers ---
@@ -72,7 +130,114 @@ def parse_rating_votes(rating_container):
     return rating, votes
 
 
-def parse_imdb_season_json(soup, imdb_id, season, items):
+# --- __NEXT_DATA__ episode list lookup ---
+# Known locations of the episode list are tried first; otherwise one
+# iterative pass over the tree scores every list of dicts by how many
+# entries belong to the season. The path that worked is remembered per
+# page layout (Next.js `page` + `buildId`) and tried first next time.
+
+SEASON_JSON_PATHS = [
+    ('props','pageProps','contentData','episodes','items'),
+    ('props','pageProps','contentData','section','items'),
+    ('props','pageProps','contentData','items'),
+]
+MAX_SCAN_DEPTH = 8
+MAX_SCAN_NODES = 200000     # containers visited per scan, bounds pathological pages
+MAX_LEARNED_LAYOUTS = 64
+
+_learned_paths = {}
+_learned_lock = threading.Lock()
+_EPISODE_KEYS = ('episodeNumber', 'episode', 'titleText')
+
+
+def _page_layout(data):
+    return (data.get('page'), data.get('buildId'))
+
+
+def _learn_path(layout, path):
+    if path is None:
+        return
+    with _learned_lock:
+        _learned_paths.pop(layout, None)
+        _learned_paths[layout] = tuple(path)
+        while len(_learned_paths) > MAX_LEARNED_LAYOUTS:
+            del _learned_paths[next(iter(_learned_paths))]
+
+
+def _resolve_path(data, path):
+    cur = data
+    for p in path:
+        if isinstance(cur, dict) and p in cur:
+            cur = cur[p]
+        elif isinstance(cur, list) and isinstance(p, int) and 0 <= p < len(cur):
+            cur = cur[p]
+        else:
+            return None
+    return cur
+
+
+def _season_of(entry):
+    s_val = entry.get('seasonNumber') or entry.get('season')
+    return int(s_val) if s_val is not None else None
+
+
+def _season_matches(entries, season):
+    matches = 0
+    for e in entries:
+        if isinstance(e, dict):
+            try:
+                if _season_of(e) == int(season):
+                    matches += 1
+            except (TypeError, ValueError):
+                continue
+    return matches
+
+
+def _scan_episode_lists(data, season):
+    """
+    Best episode-looking list in `data` as (list, path, season matches, lists seen).
+
+    Depth-first and iterative; each list of dicts is scored in the same pass
+    that checks whether it looks like episodes, and the first list with the
+    most entries of `season` wins.
+    """
+    season = int(season)
+    best = None; best_path = None; best_match = 0; n_lists = 0; visited = 0
+    stack = [(data, ())]
+    while stack and visited < MAX_SCAN_NODES:
+        obj, path = stack.pop()
+        visited += 1
+        if isinstance(obj, dict):
+            if len(path) < MAX_SCAN_DEPTH:
+                for k in reversed(list(obj)):
+                    v = obj[k]
+                    if isinstance(v, (dict, list)):
+                        stack.append((v, path + (k,)))
+            continue
+        if obj and all(isinstance(x, dict) for x in obj):
+            key_hits = 0; matches = 0
+            for x in obj:
+                if any(k in x for k in _EPISODE_KEYS):
+                    key_hits += 1
+                try:
+                    if _season_of(x) == season:
+                        matches += 1
+                except (TypeError, ValueError):
+                    pass
+            if key_hits >= max(1, len(obj)//4):
+                n_lists += 1
+                if matches > best_match:
+                    best, best_path, best_match = obj, path, matches
+        if len(path) < MAX_SCAN_DEPTH:
+            for i in range(len(obj) - 1, -1, -1):
+                v = obj[i]
+                if isinstance(v, (dict, list)):
+                    stack.append((v, path + (i,)))
+    return best, best_path, best_match, n_lists
+
+
+def parse_imdb_season_json(next_data, imdb_id, season, items):
+    """Fill `items` from a season page's parsed `__NEXT_DATA__`; False if it has no usable episodes."""
     def _emit_entry(entry):
         try:
             if isinstance(entry, dict) and 'content' in entry and isinstance(entry['content'], dict):
@@ -116,59 +281,28 @@ def parse_imdb_season_json(soup, imdb_id, season, items):
             return False
 
     try:
-        next_data_script = soup.find('script', id='__NEXT_DATA__')
-        if next_data_script and next_data_script.string:
-            data = json.loads(next_data_script.string.strip())
-            path_variants = [
-                ['props','pageProps','contentData','episodes','items'],
-                ['props','pageProps','contentData','section','items'],
-                ['props','pageProps','contentData','items'],
-            ]
+        if isinstance(next_data, dict):
+            data = next_data
+            layout = _page_layout(data)
             extracted = None
-            for path in path_variants:
-                cur = data
-                for p in path:
-                    if isinstance(cur, dict) and p in cur:
-                        cur = cur[p]
-                    else:
-                        cur = None
-                        break
-                if isinstance(cur, list):
+            found_path = _learned_paths.get(layout)
+            if found_path is not None:
+                cur = _resolve_path(data, found_path)
+                if isinstance(cur, list) and _season_matches(cur, season):
                     extracted = cur
-                    break
+                else:
+                    found_path = None
+            if extracted is None:
+                for path in SEASON_JSON_PATHS:
+                    cur = _resolve_path(data, path)
+                    if isinstance(cur, list):
+                        extracted = cur
+                        found_path = path
+                        break
             if extracted is None:
-                def find_lists(obj, depth=0):
-                    if depth > 8:
-                        return []
-                    found = []
-                    if isinstance(obj, list):
-                        if obj and all(isinstance(x, dict) for x in obj):
-                            key_hits = sum(1 for x in obj if any(k in x for k in ('episodeNumber','episode','titleText')))
-                            if key_hits >= max(1, len(obj)//4):
-                                found.append(obj)
-                        for v in obj:
-                            found.extend(find_lists(v, depth+1))
-                    elif isinstance(obj, dict):
-                        for v in obj.values():
-                            found.extend(find_lists(v, depth+1))
-                    return found
-                cands = find_lists(data)
-                best = None; best_match = 0
-                for cand in cands:
-                    matches = 0
-                    for e in cand:
-                        try:
-                            s_val = e.get('seasonNumber') or e.get('season')
-                            if s_val is not None and int(s_val)==int(season):
-                                matches += 1
-                        except Exception:
-                            continue
-                    if matches > best_match:
-                        best_match = matches
-                        best = cand
-                extracted = best
+                extracted, found_path, best_match, n_lists = _scan_episode_lists(data, season)
                 if os.getenv('IMDB_PARSE_DEBUG')=='1':
-                    print(f"[parse_imdb_season] heur_lists={len(cands)} best_match={best_match}")
+                    print(f"[parse_imdb_season] heur_lists={n_lists} best_match={best_match} path={found_path}")
             if isinstance(extracted, list):
                 for e in extracted:
                     _emit_entry(e)
@@ -181,6 +315,7 @@ def parse_imdb_season_json(soup, imdb_id, season, items):
                     if rated > 0 or with_votes > 0 or unknown_titles < len(items):
                         if os.getenv('IMDB_PARSE_DEBUG')=='1':
                             print(f"[parse_imdb_season] JSON path accepted imdb_id={imdb_id} season={season}")
+                        _learn_path(layout, found_path)
                         return True
                     else:
                         if os.getenv('IMDB_PARSE_DEBUG')=='1':
@@ -0,0 +1,679 @@
+"""
+Bounded, prioritized background job queue with pluggable storage.
+
+A fixed pool of worker threads runs registered job kinds. Jobs are
+deduplicated by (kind, key) while pending or running, user-triggered work
+runs ahead of maintenance, failures are retried with exponential backoff,
+and queue depth / wait time are visible at `/debug/jobs`.
+
+Storage is either in-memory (`MemoryJobStore`, for tests and one-off
+queues) or the `jobs` table (`DbJobStore`), which survives restarts and is
+shared by every uvicorn worker process: jobs are claimed under a time-limited
+lease (SKIP LOCKED on Postgres, a single atomic UPDATE on SQLite), so each
+job runs once cluster-wide and a crashed worker's jobs are picked up again
+when its lease expires.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from datetime import timedelta
+from typing import Any, Callable
+
+from sqlalchemy import DateTime, bindparam, insert, text
+from sqlalchemy.exc import IntegrityError
+
+from database import engine, IS_POSTGRES, JobRecord, _utc_now
+
+
+PRIORITY_INTERACTIVE: int = 0     # user-triggered (first view, refresh button)
+PRIORITY_MAINTENANCE: int = 10    # periodic refresh, backfills
+JOB_WORKERS: int = int(os.getenv('JOB_WORKERS', 2))
+JOB_QUEUE_MAX: int = int(os.getenv('JOB_QUEUE_MAX', 1000))
+# Slots only interactive jobs may fill, so background work cannot crowd out users (default: a fifth)
+JOB_QUEUE_RESERVED: int | None = int(os.environ['JOB_QUEUE_RESERVED']) if os.getenv('JOB_QUEUE_RESERVED') else None
+JOB_MAX_ATTEMPTS: int = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_BASE: float = float(os.getenv('JOB_RETRY_BASE', 5))        # seconds; doubles per attempt
+JOB_LEASE_SECONDS: float = float(os.getenv('JOB_LEASE_SECONDS', 300))
+JOB_POLL_INTERVAL: float = float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+JOB_DONE_RETENTION: int = 86400       # keep finished rows a day for visibility
+JOB_FAILED_RETENTION: int = 7 * 86400
+METRICS_WINDOW: int = 500             # recent jobs kept for wait/run percentiles
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted to a queue that is at capacity."""
+
+
+class JobFailed(Exception):
+    """Raised by a job's Future when it failed in another process."""
+
+
+class ClaimedJob:
+    """A job leased to this process for execution."""
+
+    def __init__(self, job_id: int, kind: str, key: str, payload: dict[str, Any],
+                 attempts: int, max_attempts: int, wait: float) -> None:
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.wait = wait
+
+
+# ============================================================================
+# In-Memory Store
+# ============================================================================
+class MemoryJobStore:
+    """Process-local job storage on a priority heap."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._jobs: dict[int, dict[str, Any]] = {}
+        self._active: dict[tuple[str, str], int] = {}
+        self._heap: list[tuple[int, int, int]] = []
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+
+    def enqueue(self, kind: str, key: str, payload: dict[str, Any], priority: int,
+                max_attempts: int) -> tuple[int, bool]:
+        with self._lock:
+            job_id = self._active.get((kind, key))
+            if job_id is not None:
+                job = self._jobs[job_id]
+                if job['status'] == 'pending' and priority < job['priority']:
+                    job['priority'] = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), job_id))
+                return job_id, False
+            job_id = next(self._ids)
+            now = time.monotonic()
+            self._jobs[job_id] = {
+                'kind': kind, 'key': key, 'payload': payload, 'priority': priority,
+                'status': 'pending', 'attempts': 0, 'max_attempts': max_attempts,
+                'run_after': now, 'created': now,
+            }
+            self._active[(kind, key)] = job_id
+            heapq.heappush(self._heap, (priority, next(self._seq), job_id))
+            return job_id, True
+
+    def claim(self, owner: str, lease_seconds: float) -> ClaimedJob | None:
+        with self._lock:
+            now = time.monotonic()
+            deferred = []
+            claimed = None
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                priority, _, job_id = entry
+                job = self._jobs.get(job_id)
+                # Skip stale heap entries left behind by promotion or completion
+                if job is None or job['status'] != 'pending' or priority != job['priority']:
+                    continue
+                if job['run_after'] > now:
+                    deferred.append(entry)
+                    continue
+                job['status'] = 'running'
+                job['attempts'] += 1
+                claimed = ClaimedJob(job_id, job['kind'], job['key'], job['payload'],
+                                     job['attempts'], job['max_attempts'], now - job['run_after'])
+                break
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+            return claimed
+
+    def complete(self, job_id: int, owner: str, result: Any) -> None:
+        self._finish(job_id)
+
+    def fail(self, job_id: int, owner: str, error: str, retry_in: float | None) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if retry_in is None:
+                self._finish_locked(job_id)
+                return
+            job['status'] = 'pending'
+            job['run_after'] = time.monotonic() + retry_in
+            heapq.heappush(self._heap, (job['priority'], next(self._seq), job_id))
+
+    def _finish(self, job_id: int) -> None:
+        with self._lock:
+            self._finish_locked(job_id)
+
+    def _finish_locked(self, job_id: int) -> None:
+        job = self._jobs.pop(job_id, None)
+        if job is not None:
+            self._active.pop((job['kind'], job['key']), None)
+
+    def renew(self, job_ids: list[int], owner: str, lease_seconds: float) -> None:
+        pass  # leases never expire within a single process
+
+    def status(self, job_id: int) -> tuple[str, Any, str | None] | None:
+        return None  # results are only ever delivered through local futures
+
+    def is_active(self, kind: str, key: str) -> bool:
+        return (kind, key) in self._active
+
+    def active_kinds(self, key: str) -> set[str]:
+        with self._lock:
+            return {k for (k, job_key) in self._active if job_key == key}
+
+    def counts(self) -> dict[str, Any]:
+        with self._lock:
+            by_priority: dict[int, int] = {}
+            by_kind: dict[str, int] = {}
+            running = 0
+            for job in self._jobs.values():
+                if job['status'] == 'running':
+                    running += 1
+                else:
+                    by_priority[job['priority']] = by_priority.get(job['priority'], 0) + 1
+                    by_kind[job['kind']] = by_kind.get(job['kind'], 0) + 1
+            return {'depth': sum(by_priority.values()), 'depthByPriority': by_priority,
+                    'depthByKind': by_kind, 'runningTotal': running}
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] == 'pending')
+
+    def snapshot(self, limit: int = 20) -> dict[str, list[dict[str, Any]]]:
+        with self._lock:
+            rows = [{'id': job_id, 'kind': j['kind'], 'key': j['key'], 'status': j['status'],
+                     'priority': j['priority'], 'attempts': j['attempts']}
+                    for job_id, j in list(self._jobs.items())[:limit]]
+        return {'active': rows, 'recentFailures': []}
+
+    def prune(self) -> None:
+        pass
+
+
+# ============================================================================
+# Database Store
+# ============================================================================
+class DbJobStore:
+    """Durable job storage in the `jobs` table, safe across processes."""
+
+    def __init__(self, db_engine=engine, postgres: bool = IS_POSTGRES) -> None:
+        self._engine = db_engine
+        self._postgres = postgres
+
+    def enqueue(self, kind: str, key: str, payload: dict[str, Any], priority: int,
+                max_attempts: int) -> tuple[int, bool]:
+        for _ in range(3):
+            now = _utc_now()
+            try:
+                with self._engine.begin() as conn:
+                    result = conn.execute(insert(JobRecord.__table__).values(
+                        kind=kind, key=key, payload=json.dumps(payload), priority=priority,
+                        status='pending', attempts=0, max_attempts=max_attempts,
+                        run_after=now, created_at=now, updated_at=now,
+                    ))
+                    return result.inserted_primary_key[0], True
+            except IntegrityError:
+                pass  # an active (kind, key) job already exists
+            with self._engine.begin() as conn:
+                row = conn.execute(_sql(
+                    "SELECT id FROM jobs WHERE kind = :kind AND key = :key "
+                    "AND status IN ('pending', 'running')"
+                ), {'kind': kind, 'key': key}).fetchone()
+                if row is None:
+                    continue  # it finished in between; try inserting again
+                conn.execute(_sql(
+                    "UPDATE jobs SET priority = :priority, updated_at = :now "
+                    "WHERE id = :id AND status = 'pending' AND priority > :priority"
+                ), {'priority': priority, 'now': _utc_now(), 'id': row.id})
+                return row.id, False
+        raise RuntimeError(f"could not enqueue job {kind}:{key}")
+
+    def claim(self, owner: str, lease_seconds: float) -> ClaimedJob | None:
+        now = _utc_now()
+        # Runnable: pending and due, or running with an expired lease (crashed worker)
+        pick = (
+            "SELECT id FROM jobs "
+            "WHERE (status = 'pending' AND run_after <= :now) "
+            "   OR (status = 'running' AND lease_expires_at < :now AND attempts < max_attempts) "
+            "ORDER BY priority, id LIMIT 1"
+        )
+        if self._postgres:
+            pick += " FOR UPDATE SKIP LOCKED"
+        # On SQLite the whole UPDATE ... WHERE id = (subquery) takes the database write
+        # lock, so the pick-and-mark is atomic without SKIP LOCKED.
+        sql = _sql(
+            "UPDATE jobs SET status = 'running', lease_owner = :owner, lease_expires_at = :lease, "
+            "attempts = attempts + 1, updated_at = :now "
+            f"WHERE id = ({pick}) "
+            "RETURNING id, kind, key, payload, attempts, max_attempts, run_after"
+        ).columns(run_after=DateTime)
+        with self._engine.begin() as conn:
+            row = conn.execute(sql, {
+                'owner': owner, 'now': now, 'lease': now + timedelta(seconds=lease_seconds),
+            }).fetchone()
+        if row is None:
+            return None
+        return ClaimedJob(row.id, row.kind, row.key, json.loads(row.payload or '{}'),
+                          row.attempts, row.max_attempts, max(0.0, (now - row.run_after).total_seconds()))
+
+    def complete(self, job_id: int, owner: str, result: Any) -> None:
+        with self._engine.begin() as conn:
+            conn.execute(_sql(
+                "UPDATE jobs SET status = 'done', result = :result, lease_owner = NULL, "
+                "lease_expires_at = NULL, updated_at = :now "
+                "WHERE id = :id AND lease_owner = :owner AND status = 'running'"
+            ), {'result': _to_json(result), 'now': _utc_now(), 'id': job_id, 'owner': owner})
+
+    def fail(self, job_id: int, owner: str, error: str, retry_in: float | None) -> None:
+        now = _utc_now()
+        with self._engine.begin() as conn:
+            if retry_in is None:
+                conn.execute(_sql(
+                    "UPDATE jobs SET status = 'failed', last_error = :error, lease_owner = NULL, "
+                    "lease_expires_at = NULL, updated_at = :now "
+                    "WHERE id = :id AND lease_owner = :owner AND status = 'running'"
+                ), {'error': error, 'now': now, 'id': job_id, 'owner': owner})
+            else:
+                conn.execute(_sql(
+                    "UPDATE jobs SET status = 'pending', last_error = :error, run_after = :run_after, "
+                    "lease_owner = NULL, lease_expires_at = NULL, updated_at = :now "
+                    "WHERE id = :id AND lease_owner = :owner AND status = 'running'"
+                ), {'error': error, 'now': now, 'run_after': now + timedelta(seconds=retry_in),
+                    'id': job_id, 'owner': owner})
+
+    def renew(self, job_ids: list[int], owner: str, lease_seconds: float) -> None:
+        if not job_ids:
+            return
+        now = _utc_now()
+        with self._engine.begin() as conn:
+            conn.execute(_sql(
+                "UPDATE jobs SET lease_expires_at = :lease, updated_at = :now "
+                "WHERE id = :id AND lease_owner = :owner AND status = 'running'"
+            ), [{'lease': now + timedelta(seconds=lease_seconds), 'now': now, 'id': job_id, 'owner': owner}
+                for job_id in job_ids])
+
+    def status(self, job_id: int) -> tuple[str, Any, str | None] | None:
+        with self._engine.connect() as conn:
+            row = conn.execute(_sql(
+                "SELECT status, result, last_error FROM jobs WHERE id = :id"
+            ), {'id': job_id}).fetchone()
+        if row is None:
+            return None
+        return row.status, json.loads(row.result) if row.result else None, row.last_error
+
+    def is_active(self, kind: str, key: str) -> bool:
+        return kind in self.active_kinds(key)
+
+    def active_kinds(self, key: str) -> set[str]:
+        with self._engine.connect() as conn:
+            rows = conn.execute(_sql(
+                "SELECT kind FROM jobs WHERE key = :key AND status IN ('pending', 'running')"
+            ), {'key': key}).fetchall()
+        return {row.kind for row in rows}
+
+    def pending_count(self) -> int:
+        with self._engine.connect() as conn:
+            return conn.execute(_sql("SELECT COUNT(*) FROM jobs WHERE status = 'pending'")).scalar() or 0
+
+    def counts(self) -> dict[str, Any]:
+        with self._engine.connect() as conn:
+            rows = conn.execute(_sql(
+                "SELECT status, priority, kind, COUNT(*) AS n FROM jobs "
+                "WHERE status IN ('pending', 'running', 'failed') GROUP BY status, priority, kind"
+            )).fetchall()
+        by_priority: dict[int, int] = {}
+        by_kind: dict[str, int] = {}
+        running = failed = 0
+        for row in rows:
+            if row.status == 'pending':
+                by_priority[row.priority] = by_priority.get(row.priority, 0) + row.n
+                by_kind[row.kind] = by_kind.get(row.kind, 0) + row.n
+            elif row.status == 'running':
+                running += row.n
+            else:
+                failed += row.n
+        return {'depth': sum(by_priority.values()), 'depthByPriority': by_priority,
+                'depthByKind': by_kind, 'runningTotal': running, 'failedTotal': failed}
+
+    def snapshot(self, limit: int = 20) -> dict[str, list[dict[str, Any]]]:
+        """Pending/running rows (in claim order) and the most recent failures."""
+        cols = "id, kind, key, status, priority, attempts, lease_owner, lease_expires_at, last_error"
+        with self._engine.connect() as conn:
+            active = conn.execute(_sql(
+                f"SELECT {cols} FROM jobs WHERE status IN ('pending', 'running') "
+                "ORDER BY status DESC, priority, id LIMIT :limit"
+            ), {'limit': limit}).fetchall()
+            failed = conn.execute(_sql(
+                f"SELECT {cols} FROM jobs WHERE status = 'failed' ORDER BY updated_at DESC LIMIT :limit"
+            ), {'limit': limit}).fetchall()
+
+        def as_dict(row):
+            d = dict(row._mapping)
+            if d.get('lease_expires_at') is not None:
+                d['lease_expires_at'] = str(d['lease_expires_at'])
+            return d
+        return {'active': [as_dict(r) for r in active], 'recentFailures': [as_dict(r) for r in failed]}
+
+    def prune(self) -> None:
+        """Drop old finished rows; fail running jobs whose lease expired on the last attempt."""
+        now = _utc_now()
+        with self._engine.begin() as conn:
+            conn.execute(_sql(
+                "UPDATE jobs SET status = 'failed', last_error = COALESCE(last_error, 'lease expired'), "
+                "lease_owner = NULL, updated_at = :now "
+                "WHERE status = 'running' AND lease_expires_at < :now AND attempts >= max_attempts"
+            ), {'now': now})
+            conn.execute(_sql(
+                "DELETE FROM jobs WHERE (status = 'done' AND updated_at < :done_cutoff) "
+                "OR (status = 'failed' AND updated_at < :failed_cutoff)"
+            ), {'done_cutoff': now - timedelta(seconds=JOB_DONE_RETENTION),
+                'failed_cutoff': now - timedelta(seconds=JOB_FAILED_RETENTION)})
+
+
+_DATETIME_PARAMS = ('now', 'lease', 'run_after', 'done_cutoff', 'failed_cutoff')
+
+
+def _sql(statement: str):
+    """text() with datetime parameters typed, so SQLite stores/compares them like ORM columns."""
+    return text(statement).bindparams(
+        *(bindparam(name, type_=DateTime) for name in _DATETIME_PARAMS if f':{name}' in statement)
+    )
+
+
+def _to_json(value: Any) -> str | None:
+    try:
+        return json.dumps(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ============================================================================
+# Job Queue
+# ============================================================================
+class JobQueue:
+    """Fixed worker pool over a job store with deduplication, priorities and retries."""
+
+    def __init__(
+        self,
+        store: MemoryJobStore | DbJobStore | None = None,
+        workers: int = JOB_WORKERS,
+        max_size: int = JOB_QUEUE_MAX,
+        reserved: int | None = JOB_QUEUE_RESERVED,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_base: float = JOB_RETRY_BASE,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        poll_interval: float = JOB_POLL_INTERVAL,
+    ) -> None:
+        self.store = store if store is not None else MemoryJobStore()
+        self._workers = max(1, workers)
+        self._max_size = max_size
+        self._reserved = max_size // 5 if reserved is None else min(max(0, reserved), max_size)
+        self._max_attempts = max(1, max_attempts)
+        self._retry_base = retry_base
+        self._lease_seconds = lease_seconds
+        self._poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: dict[str, Callable[..., Any]] = {}
+        self._on_finish: dict[str, Callable[..., Any]] = {}
+        self._futures: dict[int, Future] = {}
+        self._local_running: set[int] = set()
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+        self._running = 0
+        self._counters = {'submitted': 0, 'deduplicated': 0, 'completed': 0, 'failed': 0,
+                          'retried': 0, 'rejected': 0}
+        self._waits: deque[float] = deque(maxlen=METRICS_WINDOW)
+        self._runs: deque[float] = deque(maxlen=METRICS_WINDOW)
+        self._max_wait = 0.0
+        self._last_prune = 0.0
+
+    def register(self, kind: str, handler: Callable[..., Any],
+                 on_finish: Callable[..., Any] | None = None) -> None:
+        """
+        Register the function run for a job kind; called as handler(**payload).
+
+        `on_finish(**payload)` runs after the job is recorded as done or
+        permanently failed (i.e. once it no longer counts as active) and
+        before its Future resolves.
+        """
+        self._handlers[kind] = handler
+        if on_finish is not None:
+            self._on_finish[kind] = on_finish
+
+    # ------------------------------------------------------------------
+    # Submission
+    # ------------------------------------------------------------------
+    def submit(
+        self,
+        kind: str,
+        key: str,
+        payload: dict[str, Any] | None = None,
+        priority: int = PRIORITY_MAINTENANCE,
+        max_attempts: int | None = None,
+    ) -> Future:
+        """
+        Queue a job and return a Future for its result.
+
+        If the same (kind, key) is already pending or running (in any process
+        sharing the store), no new job is created and the returned Future
+        tracks the existing one; a pending duplicate submitted at a higher
+        priority (lower number) is promoted.
+
+        Interactive jobs may fill the queue up to `max_size`; lower priorities
+        are refused once only the `reserved` slots are left.
+        """
+        if kind not in self._handlers:
+            raise KeyError(f"no handler registered for job kind {kind!r}")
+        limit = self._max_size if priority <= PRIORITY_INTERACTIVE else self._max_size - self._reserved
+        if not self.store.is_active(kind, key) and self.store.pending_count() >= limit:
+            with self._cond:
+                self._counters['rejected'] += 1
+            raise QueueFull(f"job queue full ({limit} pending at priority {priority})")
+        job_id, created = self.store.enqueue(kind, key, payload or {}, priority, max_attempts or self._max_attempts)
+        with self._cond:
+            self._counters['submitted' if created else 'deduplicated'] += 1
+            future = self._futures.get(job_id)
+            if future is None:
+                future = self._futures[job_id] = Future()
+            self._ensure_started()
+            self._cond.notify()
+            return future
+
+    def is_active(self, kind: str, key: str) -> bool:
+        """True while a (kind, key) job is pending or running."""
+        return self.store.is_active(kind, key)
+
+    def active_kinds(self, key: str) -> set[str]:
+        """Kinds of all pending/running jobs for a key (e.g. an imdb_id)."""
+        return self.store.active_kinds(key)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Start the worker threads (also happens lazily on first submit)."""
+        with self._cond:
+            self._stopping = False
+            self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        self._threads = [t for t in self._threads if t.is_alive()]
+        if self._threads:
+            return
+        for i in range(self._workers):
+            t = threading.Thread(target=self._worker_loop, name=f'job-worker-{i}', daemon=True)
+            self._threads.append(t)
+            t.start()
+        t = threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True)
+        self._threads.append(t)
+        t.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Stop workers after their current job. Pending jobs stay in the store
+        (a durable store runs them after restart); local futures are cancelled.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads = list(self._threads)
+        for t in threads:
+            t.join(timeout)
+        with self._cond:
+            self._threads = []
+            for job_id, future in list(self._futures.items()):
+                if job_id not in self._local_running:
+                    future.cancel()
+                    del self._futures[job_id]
+
+    def _next_job(self) -> ClaimedJob | None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return None
+            try:
+                job = self.store.claim(self.owner, self._lease_seconds)
+            except Exception as e:
+                logger.warning("Job claim failed: %s", e)
+                job = None
+            if job is not None:
+                with self._cond:
+                    self._running += 1
+                    self._local_running.add(job.id)
+                    self._waits.append(job.wait)
+                    self._max_wait = max(self._max_wait, job.wait)
+                return job
+            self._resolve_remote()
+            with self._cond:
+                if self._stopping:
+                    return None
+                self._cond.wait(self._poll_interval)
+
+    def _worker_loop(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            started = time.monotonic()
+            try:
+                result = self._handlers[job.kind](**job.payload)
+            except Exception as e:
+                logger.error("Job failed: kind=%s, key=%s, attempt=%d/%d, err=%s\n%s",
+                             job.kind, job.key, job.attempts, job.max_attempts, e, traceback.format_exc())
+                retry = job.attempts < job.max_attempts
+                retry_in = self._retry_base * (2 ** (job.attempts - 1)) if retry else None
+                self._record(job, started, 'retried' if retry else 'failed')
+                self._safe(self.store.fail, job.id, self.owner, f"{type(e).__name__}: {e}", retry_in)
+                if not retry:
+                    self._finished(job)
+                    self._resolve(job.id, exception=e)
+            else:
+                self._record(job, started, 'completed')
+                self._safe(self.store.complete, job.id, self.owner, result)
+                self._finished(job)
+                self._resolve(job.id, result=result)
+
+    def _record(self, job: ClaimedJob, started: float, outcome: str) -> None:
+        with self._cond:
+            self._running -= 1
+            self._local_running.discard(job.id)
+            self._runs.append(time.monotonic() - started)
+            self._counters[outcome] += 1
+
+    def _finished(self, job: ClaimedJob) -> None:
+        on_finish = self._on_finish.get(job.kind)
+        if on_finish is not None:
+            self._safe(on_finish, **job.payload)
+
+    def _resolve(self, job_id: int, result: Any = None, exception: BaseException | None = None) -> None:
+        with self._cond:
+            future = self._futures.pop(job_id, None)
+        if future is None or future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def _resolve_remote(self) -> None:
+        """Settle futures for jobs that another process ran to completion."""
+        with self._cond:
+            waiting = [job_id for job_id in self._futures if job_id not in self._local_running]
+        for job_id in waiting:
+            state = self._safe(self.store.status, job_id)
+            if not state:
+                continue
+            status, result, error = state
+            if status == 'done':
+                self._resolve(job_id, result=result)
+            elif status == 'failed':
+                self._resolve(job_id, exception=JobFailed(error or 'job failed'))
+
+    def _heartbeat_loop(self) -> None:
+        interval = max(0.05, self._lease_seconds / 3)
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                self._cond.wait(interval)
+                if self._stopping:
+                    return
+                running = list(self._local_running)
+            self._safe(self.store.renew, running, self.owner, self._lease_seconds)
+            if time.monotonic() - self._last_prune > 3600:
+                self._last_prune = time.monotonic()
+                self._safe(self.store.prune)
+
+    @staticmethod
+    def _safe(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logger.warning("Job store call %s failed: %s", getattr(fn, '__name__', fn), e)
+            return None
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+    def metrics(self, include_jobs: bool = False) -> dict[str, Any]:
+        """Queue depth, in-flight count, counters and wait/run time stats (seconds)."""
+        counts = self.store.counts()
+        with self._cond:
+            waits = sorted(self._waits)
+            runs = sorted(self._runs)
+            data = {
+                **counts,
+                'running': self._running,
+                'workers': self._workers,
+                'maxSize': self._max_size,
+                'reserved': self._reserved,
+                'owner': self.owner,
+                **self._counters,
+                'wait': {**_summary(waits), 'max': round(self._max_wait, 4)},
+                'run': _summary(runs),
+            }
+        if include_jobs:
+            data['jobs'] = self.store.snapshot()
+        return data
+
+
+def _summary(sorted_values: list[float]) -> dict[str, float]:
+    if not sorted_values:
+        return {'avg': 0.0, 'p95': 0.0}
+    p95 = sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * 0.95))]
+    return {'avg': round(sum(sorted_values) / len(sorted_values), 4), 'p95': round(p95, 4)}
+
+
+job_queue = JobQueue(store=DbJobStore())
@@ -0,0 +1,102 @@
+"""
+Incrementally maintained "most viewed shows" ranking for `/popular`.
+
+View counts are loaded from the `shows` table once per reload interval
+(plus this process's unflushed deltas from the view counter) and then kept
+current by `record()` on every tracked view. The top-N list is adjusted in
+place, so serving `/popular` never sorts the `shows` table. Views recorded
+by other processes show up at the next reload.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+
+POPULAR_SIZE: int = 12
+POPULAR_RELOAD_SECONDS: float = float(os.getenv('POPULAR_RELOAD_SECONDS', 300))
+
+
+# ============================================================================
+# Ranking
+# ============================================================================
+class PopularRanking:
+    """View counts per show id with a top-N list maintained on each increment."""
+
+    def __init__(self, size: int = POPULAR_SIZE, reload_seconds: float = POPULAR_RELOAD_SECONDS) -> None:
+        self._size = size
+        self._reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._counts: dict[int, int] = {}
+        self._top: list[int] = []
+        self._loaded_at: float | None = None
+        self.version = 0  # bumped whenever the top list changes
+
+    def load(self, counts: dict[int, int]) -> None:
+        """Replace all counts (e.g. from the database) and rebuild the top list."""
+        with self._lock:
+            self._counts = {show_id: n for show_id, n in counts.items() if n > 0}
+            top = sorted(self._counts, key=self._sort_key)[:self._size]
+            if top != self._top:
+                self._top = top
+                self.version += 1
+            self._loaded_at = time.monotonic()
+
+    def reload_from_db(self, conn, pending: dict[int, int] | None = None) -> None:
+        """Load stored view counts, plus unflushed deltas, from a connection."""
+        rows = conn.execute(text("SELECT id, view_count FROM shows WHERE view_count > 0")).fetchall()
+        counts = {row.id: row.view_count for row in rows}
+        for show_id, delta in (pending or {}).items():
+            counts[show_id] = counts.get(show_id, 0) + delta
+        self.load(counts)
+
+    def needs_reload(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self._reload_seconds
+
+    def record(self, show_id: int, n: int = 1) -> None:
+        """Add views and move the show within (or into) the top list."""
+        with self._lock:
+            count = self._counts.get(show_id, 0) + n
+            self._counts[show_id] = count
+            top = self._top
+            if show_id in top:
+                start = i = top.index(show_id)
+                # Counts only grow: bubble towards the front
+                while i > 0 and self._sort_key(top[i - 1]) > self._sort_key(show_id):
+                    top[i - 1], top[i] = top[i], top[i - 1]
+                    i -= 1
+                if i != start:
+                    self.version += 1
+            elif len(top) < self._size or self._sort_key(show_id) < self._sort_key(top[-1]):
+                top.append(show_id)
+                top.sort(key=self._sort_key)
+                del top[self._size:]
+                self.version += 1
+
+    def invalidate(self) -> None:
+        """Mark anything rendered from the list as stale (e.g. a poster was backfilled)."""
+        with self._lock:
+            self.version += 1
+
+    def forget(self, show_id: int) -> None:
+        """Drop a show (e.g. deleted); the next reload refills the list."""
+        with self._lock:
+            self._counts.pop(show_id, None)
+            if show_id in self._top:
+                self._top.remove(show_id)
+                self.version += 1
+
+    def top(self) -> list[tuple[int, int]]:
+        """(show_id, view_count) pairs, most viewed first."""
+        with self._lock:
+            return [(show_id, self._counts[show_id]) for show_id in self._top]
+
+    def _sort_key(self, show_id: int) -> tuple[int, int]:
+        # Most views first; ties broken by id for a stable order
+        return (-self._counts.get(show_id, 0), show_id)
+
+
+popular_ranking = PopularRanking()
@@ -0,0 +1,88 @@
+"""
+Token-bucket rate limiting for upstream HTTP traffic.
+
+Each upstream (OMDb, IMDb) gets its own bucket so a slow response from one
+host never delays calls to another. Callers reserve a slot under a short
+lock and then sleep *outside* it, so the network round trip itself is never
+serialized: concurrent requests run in parallel up to each bucket's budget.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+
+# ============================================================================
+# Token Bucket
+# ============================================================================
+class TokenBucket:
+    """Thread-safe token bucket with a refill rate (tokens/second) and burst size."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """Initialize a full bucket."""
+        self._lock = threading.Lock()
+        self.configure(rate, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def configure(self, rate: float, burst: int = 1) -> None:
+        """Change refill rate and burst size at runtime."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        with self._lock:
+            self.rate = float(rate)
+            self.burst = max(1, int(burst))
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Reserve tokens and return how long the caller must wait before using them.
+
+        The balance may go negative: each reservation queues behind the ones
+        before it, so waiters are released in order at exactly `rate`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until the tokens are available; returns the time spent waiting."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# ============================================================================
+# Per-Host Registry
+# ============================================================================
+class HostRateLimiter:
+    """Registry of named token buckets, one per upstream host."""
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, host: str, rate: float, burst: int = 1) -> TokenBucket:
+        """Create or reconfigure the bucket for a host."""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(rate, burst)
+                self._buckets[host] = bucket
+            else:
+                bucket.configure(rate, burst)
+            return bucket
+
+    def bucket(self, host: str) -> TokenBucket:
+        """Return the bucket for a host (KeyError if not configured)."""
+        return self._buckets[host]
+
+    def acquire(self, host: str, tokens: float = 1.0) -> float:
+        """Block until the host's budget allows another request."""
+        return self.bucket(host).acquire(tokens)
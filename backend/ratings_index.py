@@ -0,0 +1,217 @@
+"""
+Memory-mapped ratings index built from IMDb's `title.ratings.tsv` dump.
+
+    python ratings_index.py title.ratings.tsv.gz [-o ratings.idx]
+
+The file is a small header followed by three fixed-width arrays of equal
+length: sorted numeric tconsts (`uint32`, "tt0903747" -> 903747), ratings
+(`float32`) and vote counts (`uint32`). `RatingsIndex` maps it read-only and
+binary-searches the key array in place, so a lookup costs O(log n) and reads
+only the pages it touches; the OS page cache shares the mapping between
+worker processes. About 1.5M titles take ~18 MB.
+
+With `RATINGS_INDEX_PATH` set, `fetch_rating_from_imdb` and the
+missing-rating refreshes answer from the index before going upstream. Rebuild
+the index with each new dump; it is swapped in atomically.
+"""
+from __future__ import annotations
+
+import argparse
+import bisect
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from typing import Any
+
+from tsv_import import iter_tsv
+
+
+RATINGS_INDEX_PATH: str = os.getenv('RATINGS_INDEX_PATH', '')
+RATINGS_INDEX_CHECK_SECONDS: float = 30.0   # how often to look for a rebuilt file
+
+_MAGIC = b'RIDX'
+_VERSION = 1
+_HEADER = struct.Struct('<4sBBxxQ')   # magic, version, byte order (0 little / 1 big), count
+_BYTE_ORDER = 0 if sys.byteorder == 'little' else 1
+
+
+logger = logging.getLogger(__name__)
+
+
+def tconst_key(imdb_id: str | None) -> int | None:
+    """Numeric part of a title id ("tt0903747" -> 903747), or None if it is not one."""
+    if not imdb_id or not imdb_id.startswith('tt'):
+        return None
+    digits = imdb_id[2:]
+    if not digits.isdigit():
+        return None
+    key = int(digits)
+    return key if key < 2 ** 32 else None
+
+
+# ============================================================================
+# Build
+# ============================================================================
+def build_index(tsv_path: str, out_path: str) -> int:
+    """Write an index for a `title.ratings.tsv[.gz]` dump; returns the number of titles."""
+    keys, ratings, votes = array('I'), array('f'), array('I')
+    for row in iter_tsv(tsv_path):
+        key = tconst_key(row.get('tconst'))
+        if key is None or row.get('averageRating') is None:
+            continue
+        try:
+            rating = float(row['averageRating'])
+            count = int(row.get('numVotes') or 0)
+        except ValueError:
+            continue
+        keys.append(key)
+        ratings.append(rating)
+        votes.append(min(count, 2 ** 32 - 1))
+
+    # The dump is sorted by tconst text, which is not numeric order once ids grow a digit
+    if any(keys[i] > keys[i + 1] for i in range(len(keys) - 1)):
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        keys = array('I', (keys[i] for i in order))
+        ratings = array('f', (ratings[i] for i in order))
+        votes = array('I', (votes[i] for i in order))
+
+    directory = os.path.dirname(os.path.abspath(out_path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, _BYTE_ORDER, len(keys)))
+            keys.tofile(f)
+            ratings.tofile(f)
+            votes.tofile(f)
+        os.replace(tmp, out_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(keys)
+
+
+# ============================================================================
+# Lookup
+# ============================================================================
+class RatingsIndex:
+    """Read-only view over an index file; safe to share between threads."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byte_order, count = _HEADER.unpack_from(self._mm)
+        if magic != _MAGIC or version != _VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a ratings index (version {_VERSION})")
+        if byte_order != _BYTE_ORDER:
+            self._mm.close()
+            raise ValueError(f"{path} was built on a machine with a different byte order")
+        view = memoryview(self._mm)
+        offset = _HEADER.size
+        width = 4 * count
+        self._keys = view[offset:offset + width].cast('I')
+        self._ratings = view[offset + width:offset + 2 * width].cast('f')
+        self._votes = view[offset + 2 * width:offset + 3 * width].cast('I')
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, imdb_id: str | None) -> tuple[float, int] | None:
+        """(rating, votes) for a title, or None if the dump has no rating for it."""
+        key = tconst_key(imdb_id)
+        if key is None:
+            return None
+        i = bisect.bisect_left(self._keys, key)
+        if i == self._count or self._keys[i] != key:
+            return None
+        # float32 holds 8.1 as 8.0999999; ratings have one decimal
+        return round(self._ratings[i], 1), self._votes[i]
+
+    def close(self) -> None:
+        for view in (self._keys, self._ratings, self._votes):
+            view.release()
+        self._mm.close()
+
+
+class _IndexHolder:
+    """Opens `RATINGS_INDEX_PATH` on first use and reopens it when the file is replaced."""
+
+    def __init__(self, path: str = RATINGS_INDEX_PATH, check_seconds: float = RATINGS_INDEX_CHECK_SECONDS) -> None:
+        self.path = path
+        self._check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._index: RatingsIndex | None = None
+        self._mtime: float | None = None
+        self._checked_at: float | None = None
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def _current(self) -> RatingsIndex | None:
+        if not self.path:
+            return None
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self._check_seconds:
+            return self._index
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            self._index = None
+            self._mtime = None
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        # The old mapping is left to the GC: other threads may still be reading it
+                        self._index = RatingsIndex(self.path)
+                        logger.info("Loaded ratings index %s (%d titles)", self.path, len(self._index))
+                    except (OSError, ValueError) as e:
+                        logger.warning("Ratings index unavailable: %s", e)
+                        self._index = None
+                    self._mtime = mtime
+        return self._index
+
+    def lookup(self, imdb_id: str | None) -> tuple[float, int] | None:
+        index = self._current()
+        if index is None:
+            return None
+        found = index.get(imdb_id)
+        with self._stats_lock:
+            self._stats['hits' if found is not None else 'misses'] += 1
+        return found
+
+    def stats(self) -> dict[str, Any]:
+        index = self._index
+        with self._stats_lock:
+            counts = dict(self._stats)
+        return {**counts, 'path': self.path or None, 'titles': len(index) if index is not None else 0}
+
+
+ratings_index = _IndexHolder()
+
+
+def lookup_rating(imdb_id: str | None) -> tuple[float, int] | None:
+    """(rating, votes) from the configured index, or None (no index or unknown title)."""
+    return ratings_index.lookup(imdb_id)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='Build a memory-mapped ratings index from title.ratings.tsv[.gz].')
+    parser.add_argument('tsv', help='path to title.ratings.tsv.gz')
+    parser.add_argument('-o', '--output', default=RATINGS_INDEX_PATH or 'ratings.idx')
+    args = parser.parse_args(argv)
+    count = build_index(args.tsv, args.output)
+    print(f"wrote {count} ratings to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Stale-while-revalidate reads over `TTLCache` / `TieredCache`.
+
+When a cached entry has expired but is still within the cache's
+`max_stale`, callers get the stale value immediately and one background
+thread per key runs the refresh; the next readers see the new value once it
+lands. Only a miss (nothing cached, or older than `max_stale`) makes the
+caller wait for upstream, so upstream latency no longer shows up on every
+cache turnover.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Hashable
+
+
+MAX_BACKGROUND_REFRESHES: int = 8
+
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Revalidator
+# ============================================================================
+class Revalidator:
+    """Serves stale cache entries and refreshes each key at most once at a time."""
+
+    def __init__(self, max_refreshes: int = MAX_BACKGROUND_REFRESHES) -> None:
+        self._max_refreshes = max_refreshes
+        self._lock = threading.Lock()
+        self._refreshing: set[tuple[int, Hashable]] = set()
+        self._stats = {'fresh': 0, 'stale': 0, 'misses': 0, 'refreshes': 0, 'refreshErrors': 0, 'skipped': 0}
+
+    def get(self, cache: Any, key: Hashable, refresh: Callable[[], Any], require_value: bool = True) -> Any:
+        """
+        Cached value for `key`, refreshing in the background if it is stale.
+
+        `refresh()` fetches the value and stores it in `cache` itself (as the
+        existing fetch helpers do); its result is returned on a miss.
+        """
+        entry = cache.get_entry(key)
+        if entry is not None:
+            value, stale = entry
+            if value or not require_value:
+                if stale:
+                    self._count('stale')
+                    self.schedule(cache, key, refresh)
+                else:
+                    self._count('fresh')
+                return value
+        self._count('misses')
+        return refresh()
+
+    def schedule(self, cache: Any, key: Hashable, refresh: Callable[[], Any]) -> bool:
+        """Start a background refresh unless one is already running for this key."""
+        token = (id(cache), key)
+        with self._lock:
+            if token in self._refreshing:
+                return False
+            if len(self._refreshing) >= self._max_refreshes:
+                # Keep serving stale; a later read retries once a slot frees up
+                self._stats['skipped'] += 1
+                return False
+            self._refreshing.add(token)
+            self._stats['refreshes'] += 1
+        threading.Thread(target=self._run, args=(token, refresh), name='swr-refresh', daemon=True).start()
+        return True
+
+    def _run(self, token: tuple[int, Hashable], refresh: Callable[[], Any]) -> None:
+        try:
+            refresh()
+        except Exception as e:
+            self._count('refreshErrors')
+            logger.warning("Background refresh of %r failed: %s", token[1], e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(token)
+
+    def refreshing(self) -> int:
+        """Number of background refreshes currently running."""
+        with self._lock:
+            return len(self._refreshing)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, 'refreshing': len(self._refreshing)}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
@@ -0,0 +1,223 @@
+"""
+Local autocomplete index over stored show titles and the featured list.
+
+Titles are normalised (accents and punctuation removed, lower case) and
+indexed two ways:
+
+- prefixes: sorted lists of whole titles and of (word, show) pairs searched
+  with `bisect`, so "break ba" finds "Breaking Bad" in O(log n) plus the
+  matches;
+- trigrams: used only when prefixes find too little, so typos ("brekaing")
+  still match.
+
+Results are ranked exact title, then title prefix, then word prefix, ties
+broken by views; trigram similarity is only consulted when nothing matches
+by prefix. The index is built at startup,
+updated as shows are ingested, and catches up with rows inserted by other
+processes (`id > last seen id`) at most every `SEARCH_INDEX_SYNC_SECONDS`.
+`/search` answers page 1 from it when a title matches by prefix; fuzzy
+(trigram-only) matches are merged after OMDb's results instead, since a
+close-looking stored title says nothing about titles that are not stored.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Any
+
+from database import session, Show
+from featured_shows import FEATURED_SHOW_IDS
+
+
+SEARCH_INDEX_SYNC_SECONDS: float = float(os.getenv('SEARCH_INDEX_SYNC_SECONDS', 30))
+MAX_PREFIX_CANDIDATES: int = 300    # bounds work for one/two-letter queries
+MIN_TRIGRAM_SIMILARITY: float = 0.5   # share of the query's trigrams found in the title
+
+
+def normalize_title(text: str) -> str:
+    """Lower-case, accent-free, punctuation-free form used for matching."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', stripped.lower()).split())
+
+
+def _trigrams(normalized: str) -> set[str]:
+    padded = f'  {normalized} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Entry:
+    __slots__ = ('imdb_id', 'title', 'year', 'normalized', 'words', 'grams', 'views')
+
+    def __init__(self, imdb_id: str, title: str, year: str | None, views: int) -> None:
+        self.imdb_id = imdb_id
+        self.title = title
+        self.year = year
+        self.normalized = normalize_title(title)
+        self.words = self.normalized.split()
+        self.grams = _trigrams(self.normalized)
+        self.views = views
+
+
+# ============================================================================
+# Index
+# ============================================================================
+class TitleIndex:
+    """In-memory prefix + trigram index of show titles, safe for concurrent use."""
+
+    def __init__(self, sync_seconds: float = SEARCH_INDEX_SYNC_SECONDS) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._titles: list[tuple[str, str]] = []         # sorted (normalized title, imdb_id)
+        self._words: list[tuple[str, str]] = []          # sorted (word, imdb_id)
+        self._grams: dict[str, set[str]] = {}            # trigram -> imdb_ids
+        self._sync_seconds = sync_seconds
+        self._max_show_id = 0
+        self._synced_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, imdb_id: str, title: str | None, year: str | None = None, views: int = 0) -> None:
+        """Insert or update one show."""
+        if not imdb_id or not title:
+            return
+        entry = _Entry(imdb_id, title, year, views)
+        with self._lock:
+            old = self._entries.get(imdb_id)
+            if old is not None:
+                if old.normalized == entry.normalized:
+                    old.title, old.year, old.views = title, year or old.year, max(views, old.views)
+                    return
+                self._unlink(old)
+            self._entries[imdb_id] = entry
+            bisect.insort(self._titles, (entry.normalized, imdb_id))
+            for word in set(entry.words):
+                bisect.insort(self._words, (word, imdb_id))
+            for gram in entry.grams:
+                self._grams.setdefault(gram, set()).add(imdb_id)
+
+    def _unlink(self, entry: _Entry) -> None:
+        # Caller holds the lock
+        self._remove_sorted(self._titles, (entry.normalized, entry.imdb_id))
+        for word in set(entry.words):
+            self._remove_sorted(self._words, (word, entry.imdb_id))
+        for gram in entry.grams:
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(entry.imdb_id)
+                if not ids:
+                    del self._grams[gram]
+
+    @staticmethod
+    def _remove_sorted(items: list[tuple[str, str]], item: tuple[str, str]) -> None:
+        i = bisect.bisect_left(items, item)
+        if i < len(items) and items[i] == item:
+            del items[i]
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    def build(self, db_session=session) -> int:
+        """(Re)load every stored show plus the featured list; returns the index size."""
+        for info in FEATURED_SHOW_IDS:
+            self.add(info['imdbID'], info['title'], info.get('year'))
+        self._max_show_id = 0
+        self.sync(db_session)
+        return len(self)
+
+    def sync(self, db_session=session) -> int:
+        """Add shows stored since the last load (e.g. by other processes); returns how many."""
+        rows = db_session.query(
+            Show.id, Show.imdb_id, Show.title, Show.year, Show.view_count
+        ).filter(Show.id > self._max_show_id).order_by(Show.id).all()
+        for row in rows:
+            self.add(row.imdb_id, row.title, row.year, row.view_count or 0)
+        if rows:
+            self._max_show_id = rows[-1].id
+        self._synced_at = time.monotonic()
+        return len(rows)
+
+    def sync_if_due(self, db_session=session) -> None:
+        if self._synced_at is None or time.monotonic() - self._synced_at >= self._sync_seconds:
+            self.sync(db_session)
+
+    # ------------------------------------------------------------------
+    # Querying
+    # ------------------------------------------------------------------
+    def search(self, query: str, limit: int = 10, fuzzy: bool = True) -> list[dict[str, Any]]:
+        """Best matches as `/search` result dicts (title, year, imdbID, type); `fuzzy=False` skips trigrams."""
+        normalized = normalize_title(query)
+        if not normalized:
+            return []
+        terms = normalized.split()
+        with self._lock:
+            best = self._title_prefix_matches(normalized, limit)
+            if len(best) < limit:
+                seen = set(best)
+                words = [i for i in self._word_prefix_matches(terms) if i not in seen]
+                best += heapq.nsmallest(limit - len(best), words, key=self._popularity)
+            if fuzzy and not best and len(normalized) >= 3:
+                scored = self._trigram_candidates(normalized)
+                best = [i for i, _ in heapq.nsmallest(
+                    limit, scored, key=lambda item: (-item[1], self._popularity(item[0])))]
+            return [
+                {'title': e.title, 'year': e.year, 'imdbID': e.imdb_id, 'type': 'series'}
+                for e in (self._entries[i] for i in best)
+            ]
+
+    def _popularity(self, imdb_id: str) -> tuple[int, str]:
+        entry = self._entries[imdb_id]
+        return (-entry.views, entry.title)
+
+    def _title_prefix_matches(self, normalized: str, limit: int) -> list[str]:
+        # Exact title first, then titles starting with the query, most viewed first
+        lo = bisect.bisect_left(self._titles, (normalized, ''))
+        exact, prefixed = [], []
+        for title, imdb_id in self._titles[lo:lo + MAX_PREFIX_CANDIDATES]:
+            if not title.startswith(normalized):
+                break
+            (exact if title == normalized else prefixed).append(imdb_id)
+        return (sorted(exact, key=self._popularity)
+                + heapq.nsmallest(max(0, limit - len(exact)), prefixed, key=self._popularity))[:limit]
+
+    def _word_prefix_matches(self, terms: list[str]) -> list[str]:
+        # Scan the narrowest term's range; the other terms are checked per entry
+        best: list[str] | None = None
+        for term in terms:
+            lo = bisect.bisect_left(self._words, (term, ''))
+            ids = []
+            for word, imdb_id in self._words[lo:lo + MAX_PREFIX_CANDIDATES]:
+                if not word.startswith(term):
+                    break
+                ids.append(imdb_id)
+            if best is None or len(ids) < len(best):
+                best = ids
+        if len(terms) == 1:
+            return list(dict.fromkeys(best or ()))
+        return [i for i in dict.fromkeys(best or ())
+                if all(any(w.startswith(t) for w in self._entries[i].words) for t in terms)]
+
+    def _trigram_candidates(self, normalized: str) -> list[tuple[str, float]]:
+        grams = _trigrams(normalized)
+        needed = math.ceil(len(grams) * MIN_TRIGRAM_SIMILARITY)
+        # A title sharing `needed` grams must contain one of the rarest len - needed + 1 of them,
+        # so only those posting lists are scanned
+        rarest = sorted(grams, key=lambda g: len(self._grams.get(g, ())))[:len(grams) - needed + 1]
+        candidates = set().union(*(self._grams.get(g, ()) for g in rarest))
+        results = []
+        for imdb_id in candidates:
+            # Containment rather than Jaccard: a misspelt prefix should still match a long title
+            shared = len(grams & self._entries[imdb_id].grams)
+            if shared >= needed:
+                results.append((imdb_id, shared / len(grams)))
+        return results
+
+
+search_index = TitleIndex()
@@ -3,77 +3,234 @@ from __future__ import annotations
 import logging
 import os
 import re
-import json
 import time
-from typing import Any
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Iterable, Iterator
+from urllib.parse import urlsplit
 
 import httpx
 from bs4 import BeautifulSoup
 
 from utils import safe_json, TTLCache, get_nested
+from cache_backends import TieredCache, make_backend
+from http_cache import http_cache
+from revalidate import Revalidator
+from ratings_index import lookup_rating
+from rate_limit import HostRateLimiter
+from singleflight import SingleFlight
 from imdb_helpers import (
     IMDB_HEADERS,
     throttled_get,
+    extract_next_data,
+    extract_ld_json,
+    make_soup,
     parse_imdb_season_json,
     parse_imdb_season_dom,
     parse_imdb_season_heuristic,
 )
 
 
+OMDB_BASE_URL: str = os.getenv('OMDB_BASE_URL', 'http://www.omdbapi.com/')
+IMDB_CHART_URL: str = 'https://www.imdb.com/chart/tvmeter/'
 OMDB_MIN_INTERVAL: float = 0.25   # 250ms throttle for OMDB API
 IMDB_MIN_INTERVAL: float = 0.5    # 500ms throttle for IMDB scraping
+OMDB_RATE: float = float(os.getenv('OMDB_RATE', 1 / OMDB_MIN_INTERVAL))   # requests/second
+OMDB_BURST: int = int(os.getenv('OMDB_BURST', 4))
+IMDB_RATE: float = float(os.getenv('IMDB_RATE', 1 / IMDB_MIN_INTERVAL))   # requests/second
+IMDB_BURST: int = int(os.getenv('IMDB_BURST', 2))
 IMDB_SEASON_TTL: int = 300        # 5 minutes cache for season data
 SEARCH_TTL: int = 60              # 1 minute cache for search results
 TRENDING_TTL: int = 86400         # 24 hours cache for trending shows
+# How long past their TTL entries may still be served while a background refresh runs
+IMDB_SEASON_MAX_STALE: int = int(os.getenv('IMDB_SEASON_MAX_STALE', 3600))
+SEARCH_MAX_STALE: int = int(os.getenv('SEARCH_MAX_STALE', 600))
+TRENDING_MAX_STALE: int = int(os.getenv('TRENDING_MAX_STALE', 86400))
 RATING_HIT_TTL: int = 86400       # 24h cache for successful rating lookups
 RATING_MISS_TTL: int = 3600       # 1h cache for failed rating lookups
+OMDB_TITLE_TTL: int = int(os.getenv('OMDB_TITLE_TTL', 86400))   # found OMDb title records
+SEASON_CACHE_MAX: int = int(os.getenv('SEASON_CACHE_MAX', 2000))          # (show, season) entries
+SEASON_CACHE_MAX_BYTES: int = int(os.getenv('SEASON_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+SEARCH_CACHE_MAX: int = int(os.getenv('SEARCH_CACHE_MAX', 1000))          # distinct queries
+RATING_CACHE_MAX: int = int(os.getenv('RATING_CACHE_MAX', 20000))         # shows
+OMDB_TITLE_CACHE_MAX: int = int(os.getenv('OMDB_TITLE_CACHE_MAX', 5000))  # ('i', id) / ('t', title) keys
+HTTP_TIMEOUT: float = float(os.getenv('HTTP_TIMEOUT', 10))
+HTTP_CONNECT_TIMEOUT: float = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_MAX_CONNECTIONS: int = int(os.getenv('HTTP_MAX_CONNECTIONS', 10))      # per host
+HTTP_MAX_KEEPALIVE: int = int(os.getenv('HTTP_MAX_KEEPALIVE', 5))          # per host
+HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 30))
+HTTP2_ENABLED: bool = os.getenv('HTTP2') == '1'
+OMDB_SEASON_WORKERS: int = int(os.getenv('OMDB_SEASON_WORKERS', 4))
+IMDB_RATING_WORKERS: int = int(os.getenv('IMDB_RATING_WORKERS', 2))
 
 
 logger = logging.getLogger(__name__)
 
 
-_imdb_season_cache = TTLCache(IMDB_SEASON_TTL)
-_search_cache = TTLCache(SEARCH_TTL)
-_trending_cache = TTLCache(TRENDING_TTL)
-_rating_cache = TTLCache(RATING_HIT_TTL)
+# Process-local L1 caches, backed by a shared store when CACHE_BACKEND is set
+_imdb_season_cache = TieredCache(
+    TTLCache(IMDB_SEASON_TTL, max_entries=SEASON_CACHE_MAX, max_bytes=SEASON_CACHE_MAX_BYTES,
+             max_stale=IMDB_SEASON_MAX_STALE),
+    make_backend('imdb_season'))
+_search_cache = TieredCache(TTLCache(SEARCH_TTL, max_entries=SEARCH_CACHE_MAX, max_stale=SEARCH_MAX_STALE),
+                            make_backend('search'))
+_trending_cache = TTLCache(TRENDING_TTL, max_entries=1, max_stale=TRENDING_MAX_STALE)
+_rating_cache = TieredCache(TTLCache(RATING_HIT_TTL, max_entries=RATING_CACHE_MAX), make_backend('rating'))
+_omdb_title_cache = TieredCache(TTLCache(OMDB_TITLE_TTL, max_entries=OMDB_TITLE_CACHE_MAX), make_backend('omdb_title'))
+season_flight = SingleFlight()   # one in-flight IMDb fetch per (imdb_id, season)
+revalidator = Revalidator()       # serves stale trending/search/season entries while refreshing
+
+rate_limiter = HostRateLimiter()
+rate_limiter.configure('omdb', OMDB_RATE, OMDB_BURST)
+rate_limiter.configure('imdb', IMDB_RATE, IMDB_BURST)
+
+
+# ============================================================================
+# Pooled HTTP Clients
+# ============================================================================
+class HttpClientManager:
+    """
+    Shared `httpx.Client` per upstream host.
+
+    Each host gets its own connection pool with keep-alive, so repeated
+    OMDb/IMDb calls reuse TCP+TLS connections instead of reconnecting.
+    Clients are created lazily and closed together on shutdown. After
+    `close()` every request raises until `open()` is called again, so a
+    background thread that outlives shutdown cannot leak new pools.
+    """
+
+    def __init__(
+        self,
+        timeout: float = HTTP_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_ENABLED,
+    ) -> None:
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        if http2 and importlib.util.find_spec('h2') is None:
+            logger.warning("HTTP2=1 but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        self._http2 = http2
+        self._clients: dict[str, httpx.Client] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def open(self) -> None:
+        """Allow clients to be created again (called on app startup)."""
+        with self._lock:
+            self._closed = False
+
+    def client_for(self, url: str) -> httpx.Client:
+        """Return the pooled client for the URL's host, creating it on first use."""
+        host = urlsplit(url).netloc
+        client = self._clients.get(host)
+        if client is not None and not self._closed:
+            return client
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("HTTP client manager is closed")
+            client = self._clients.get(host)
+            if client is None:
+                client = httpx.Client(timeout=self._timeout, limits=self._limits, http2=self._http2)
+                self._clients[host] = client
+            return client
+
+    def get(
+        self,
+        url: str,
+        timeout: float | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        """GET through the host's pooled client."""
+        kwargs: dict[str, Any] = {'headers': headers}
+        if timeout is not None:
+            kwargs['timeout'] = httpx.Timeout(timeout, connect=min(timeout, self._timeout.connect))
+        return self.client_for(url).get(url, **kwargs)
+
+    def close(self) -> None:
+        """Close every pooled client and refuse new requests until `open()`."""
+        with self._lock:
+            self._closed = True
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                logger.warning("Error closing HTTP client: %s", e)
+
+
+http_clients = HttpClientManager()
 
 
 # ============================================================================
 # Throttled HTTP Helpers
 # ============================================================================
 def throttled_omdb_get(url: str, timeout: int = 10) -> httpx.Response:
-    """Throttled GET request for OMDB API."""
-    return throttled_get(url, OMDB_MIN_INTERVAL, timeout=timeout)
+    """Throttled GET request for OMDB API; fresh disk-cached responses skip the throttle."""
+    return http_cache.get('omdb', url, lambda extra: throttled_get(
+        url, rate_limiter.bucket('omdb'), timeout=timeout, headers=extra or None, client=http_clients))
 
 
 def throttled_imdb_get(url: str, timeout: int = 10) -> httpx.Response:
-    """Throttled GET request for IMDB HTML pages."""
-    return throttled_get(url, IMDB_MIN_INTERVAL, timeout=timeout, headers=IMDB_HEADERS)
+    """Throttled GET request for IMDB HTML pages; fresh disk-cached responses skip the throttle."""
+    return http_cache.get('imdb', url, lambda extra: throttled_get(
+        url, rate_limiter.bucket('imdb'), timeout=timeout, headers={**IMDB_HEADERS, **extra}, client=http_clients))
+
+
+# ============================================================================
+# OMDb Title Lookups
+# ============================================================================
+def fetch_omdb_title(imdb_id: str | None = None, title: str | None = None, timeout: int = 10) -> tuple[int, dict | None]:
+    """
+    OMDb title record by IMDb ID or exact title, through the title cache.
+
+    Returns (status, data): (200, record) for a found title, cached or not;
+    otherwise the upstream status and parsed body (None if unparseable),
+    which are not cached. Network errors propagate as `httpx.RequestError`.
+    """
+    key = ('i', imdb_id) if imdb_id else ('t', (title or '').strip().lower())
+    cached = _omdb_title_cache.get(key)
+    if cached:
+        return 200, cached
+
+    api_key = os.getenv('OMDB_API_KEY')
+    query = f'i={imdb_id}' if imdb_id else f't={title}'
+    resp = throttled_omdb_get(f'{OMDB_BASE_URL}?apikey={api_key}&{query}', timeout=timeout)
+    data = safe_json(resp) if resp.status_code == 200 else None
+    if isinstance(data, dict) and data.get('Response') == 'True':
+        _omdb_title_cache.set(key, data)
+        if not imdb_id and data.get('imdbID'):
+            # A title lookup also answers later lookups by ID
+            _omdb_title_cache.set(('i', data['imdbID']), data)
+    return resp.status_code, data
 
 
 # ============================================================================
 # Trending Shows
 # ============================================================================
-def _parse_trending_from_json(soup: BeautifulSoup) -> list[dict[str, Any]]:
+def _parse_trending_from_json(html: str) -> list[dict[str, Any]]:
     """
     Parse trending shows from IMDB's __NEXT_DATA__ JSON.
 
     Args:
-        soup: BeautifulSoup object of the page.
+        html: Raw page HTML; the script payload is sliced out without a DOM.
 
     Returns:
         List of show dictionaries, or empty list if parsing fails.
     """
     shows: list[dict[str, Any]] = []
 
-    next_data_script = soup.find('script', id='__NEXT_DATA__')
-    if not next_data_script or not next_data_script.string:
-        return shows
-
-    try:
-        data = json.loads(next_data_script.string.strip())
-    except json.JSONDecodeError as e:
-        logger.warning("Failed to parse __NEXT_DATA__ JSON: %s", e)
+    data = extract_next_data(html)
+    if not isinstance(data, dict):
         return shows
 
     # Try common paths for chart data
@@ -198,17 +355,16 @@ def get_trending_shows() -> list[dict[str, Any]]:
     """
     Scrape IMDB's most popular TV shows chart.
 
-    Returns cached data if available, otherwise fetches fresh data.
+    Returns cached data if available (stale data while it is refreshed in
+    the background), otherwise fetches fresh data.
     """
-    # Check cache
-    cached = _trending_cache.get('trending', require_value=True)
-    if cached:
-        return cached
+    return revalidator.get(_trending_cache, 'trending', _fetch_trending_shows)
 
-    url = 'https://www.imdb.com/chart/tvmeter/'
 
+def _fetch_trending_shows() -> list[dict[str, Any]]:
+    """Scrape and parse the chart; fills the trending cache on success."""
     try:
-        resp = httpx.get(url, timeout=15, headers=IMDB_HEADERS)
+        resp = throttled_imdb_get(IMDB_CHART_URL, timeout=15)
     except httpx.RequestError as e:
         logger.warning("Network error fetching trending shows: %s", e)
         return []
@@ -217,14 +373,12 @@ def get_trending_shows() -> list[dict[str, Any]]:
         logger.warning("Trending shows request failed with status %d", resp.status_code)
         return []
 
-    soup = BeautifulSoup(resp.text, 'html.parser')
-
     # Try JSON parsing
-    shows = _parse_trending_from_json(soup)
+    shows = _parse_trending_from_json(resp.text)
 
     # Fallback to DOM parsing
     if not shows:
-        shows = _parse_trending_from_dom(soup)
+        shows = _parse_trending_from_dom(make_soup(resp.text))
 
     # Cache results
     if shows:
@@ -246,15 +400,18 @@ def parse_imdb_season(imdb_id: str, season: int) -> list[dict[str, Any]]:
     Returns list of episode dicts with keys:
         season, episode, title, rating, votes, air_date, imdb_episode_id
 
-    Skips specials and non-numeric episodes.
+    Skips specials and non-numeric episodes. Concurrent calls for the same
+    (imdb_id, season) share one fetch; a stale cached season is returned
+    while it is refreshed in the background.
     """
     cache_key = (imdb_id, season)
+    return revalidator.get(_imdb_season_cache, cache_key,
+                           lambda: season_flight.do(cache_key, _fetch_imdb_season, imdb_id, season)[0])
 
-    # Check cache
-    cached = _imdb_season_cache.get(cache_key, require_value=True)
-    if cached:
-        return cached
 
+def _fetch_imdb_season(imdb_id: str, season: int) -> list[dict[str, Any]]:
+    """Fetch and parse one season page; fills the season cache on success."""
+    cache_key = (imdb_id, season)
     url = f"https://www.imdb.com/title/{imdb_id}/episodes/?season={season}"
 
     try:
@@ -271,15 +428,15 @@ def parse_imdb_season(imdb_id: str, season: int) -> list[dict[str, Any]]:
         return []
 
     html = resp.text
-    soup = BeautifulSoup(html, 'html.parser')
     items: list[dict[str, Any]] = []
 
-    # Try JSON parsing
-    if parse_imdb_season_json(soup, imdb_id, season, items):
+    # Try JSON parsing (script payload sliced from the raw HTML, no DOM)
+    if parse_imdb_season_json(extract_next_data(html), imdb_id, season, items):
         _imdb_season_cache.set(cache_key, items)
         return items
 
     # Fallback to DOM parsing
+    soup = make_soup(html)
     parse_imdb_season_dom(soup, season, items)
 
     # Heuristic fallback
@@ -326,7 +483,7 @@ def discover_imdb_max_season(imdb_id: str) -> int | None:
     if resp.status_code != 200:
         return None
 
-    soup = BeautifulSoup(resp.text, 'html.parser')
+    soup = make_soup(resp.text)
     max_season: int | None = None
 
     # Parse season dropdown options
@@ -349,9 +506,15 @@ def fetch_rating_from_imdb(imdb_id: str) -> str | None:
     """
     Fetch rating for an episode/show by scraping IMDB.
 
-    Uses multiple fallback strategies: JSON-LD, regex, meta tags, heuristic spans.
+    Answered from the local ratings index when it has the title; otherwise
+    uses multiple fallback strategies: JSON-LD, regex, meta tags, heuristic spans.
     Includes caching and retry logic with exponential backoff.
     """
+    # Local ratings index (built from the dataset dump), when configured
+    indexed = lookup_rating(imdb_id)
+    if indexed is not None:
+        return str(indexed[0])
+
     caching_enabled = os.getenv('ENABLE_SCRAPE_CACHE') == '1'
 
     # Check cache
@@ -367,7 +530,7 @@ def fetch_rating_from_imdb(imdb_id: str) -> str | None:
 
     for attempt, delay in enumerate(backoff_delays, start=1):
         try:
-            resp = httpx.get(url, headers=IMDB_HEADERS, timeout=10)
+            resp = throttled_imdb_get(url, timeout=10)
         except httpx.RequestError:
             logger.warning("Network error (attempt %d) for %s", attempt, imdb_id)
             time.sleep(delay)
@@ -382,10 +545,9 @@ def fetch_rating_from_imdb(imdb_id: str) -> str | None:
             continue
 
         html = resp.text
-        soup = BeautifulSoup(html, 'html.parser')
 
         # Strategy 1: JSON-LD structured data
-        result = _extract_rating_from_json_ld(soup, imdb_id)
+        result = _extract_rating_from_json_ld(html, imdb_id)
         if result:
             break
 
@@ -394,6 +556,9 @@ def fetch_rating_from_imdb(imdb_id: str) -> str | None:
         if result:
             break
 
+        # Only the remaining strategies need a DOM
+        soup = make_soup(html)
+
         # Strategy 3: Meta tag fallback
         result = _extract_rating_from_meta(soup, imdb_id)
         if result:
@@ -415,14 +580,9 @@ def fetch_rating_from_imdb(imdb_id: str) -> str | None:
     return result
 
 
-def _extract_rating_from_json_ld(soup: BeautifulSoup, imdb_id: str) -> str | None:
+def _extract_rating_from_json_ld(html: str, imdb_id: str) -> str | None:
     """Extract rating from JSON-LD structured data."""
-    for tag in soup.find_all('script', type='application/ld+json'):
-        try:
-            data = json.loads(tag.string.strip())
-        except (json.JSONDecodeError, AttributeError):
-            continue
-
+    for data in extract_ld_json(html):
         candidates = data if isinstance(data, list) else [data]
         for obj in candidates:
             if not isinstance(obj, dict):
@@ -475,7 +635,7 @@ def fetch_season_from_omdb(
     season_number: int
 ) -> dict[str, Any] | None:
     """Fetch season data from OMDB API."""
-    url = f'http://www.omdbapi.com/?apikey={api_key}&i={imdb_id}&season={season_number}'
+    url = f'{OMDB_BASE_URL}?apikey={api_key}&i={imdb_id}&season={season_number}'
     resp = throttled_omdb_get(url)
 
     if resp.status_code != 200:
@@ -485,4 +645,51 @@ def fetch_season_from_omdb(
     if data is None or data.get('Response') != 'True':
         return None
 
-    return data
\ No newline at end of file
+    return data
+
+
+def iter_seasons_from_omdb(
+    api_key: str,
+    imdb_id: str,
+    season_numbers: Iterable[int],
+    max_workers: int | None = None,
+) -> Iterator[tuple[int, dict[str, Any] | None]]:
+    """
+    Fetch several seasons concurrently, yielding (season, data) as each lands.
+
+    Results arrive in completion order, not season order. The pool is bounded
+    by `max_workers` (default OMDB_SEASON_WORKERS) and every request still
+    takes a token from the OMDb bucket, so the upstream rate limit holds.
+    A season OMDb reports as missing is yielded as None; a request that
+    raises (network error) cancels the remaining fetches and re-raises, so
+    callers never mistake a transient failure for an empty season.
+    """
+    seasons = list(season_numbers)
+    if not seasons:
+        return
+    workers = max(1, min(max_workers or OMDB_SEASON_WORKERS, len(seasons)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='omdb-season') as pool:
+        futures = {pool.submit(fetch_season_from_omdb, api_key, imdb_id, n): n for n in seasons}
+        for future in as_completed(futures):
+            season = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                logger.warning("Season fetch error: imdb_id=%s, season=%d, err=%s", imdb_id, season, e)
+                for pending in futures:
+                    pending.cancel()
+                raise
+            yield season, data
+
+
+def fetch_ratings_from_imdb(
+    imdb_ids: Iterable[str],
+    max_workers: int | None = None,
+) -> dict[str, str | None]:
+    """Scrape ratings for several titles concurrently (bounded, IMDb-throttled)."""
+    ids = [i for i in dict.fromkeys(imdb_ids) if i]
+    if not ids:
+        return {}
+    workers = max(1, min(max_workers or IMDB_RATING_WORKERS, len(ids)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='imdb-rating') as pool:
+        return dict(zip(ids, pool.map(fetch_rating_from_imdb, ids)))
@@ -1,6 +1,7 @@
 from .show_ingest import fetch_and_store_show, fast_fetch_and_store_show
 from .show_refresh import process_missing_refresh, process_show_refresh, process_metadata_refresh
-from .show_enrich import _enrichment_in_progress
+from .show_stream import stream_show
+from . import show_jobs  # registers background job handlers
 
 __all__ = [
     'fetch_and_store_show',
@@ -8,5 +9,5 @@ __all__ = [
     'process_missing_refresh',
     'process_show_refresh',
     'process_metadata_refresh',
-    '_enrichment_in_progress'
+    'stream_show'
 ]
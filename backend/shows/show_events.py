@@ -0,0 +1,132 @@
+import queue
+import time
+from itertools import groupby
+
+from database import Session, Show, Episode
+from events import show_events, format_sse
+from jobs import job_queue
+from .show_helpers import _build_show_payload, _serialize_episode
+
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_SECONDS = 300  # clients reconnect (or stop) after this; bounds leaked subscribers
+SSE_POLL_SECONDS = 2   # DB check for work done by job workers in other processes
+
+
+def publish_season_delta(imdb_id, season, episodes, source):
+    """Publish the episodes of one season that changed (or were added) during a job."""
+    if not episodes or not show_events.has_subscribers(imdb_id):
+        return
+    show_events.publish(imdb_id, {
+        'type': 'season', 'source': source, 'season': season,
+        'episodes': [_serialize_episode(ep) for ep in sorted(episodes, key=lambda e: e.episode)],
+    })
+
+
+def _complete_event(db_session, imdb_id, source):
+    """The show's summary flags (everything /getShow returns except episodes)."""
+    event = {'type': 'complete', 'source': source}
+    show = db_session.query(Show).filter_by(imdb_id=imdb_id).first()
+    if show:
+        episodes = db_session.query(Episode).filter_by(show_id=show.id).order_by(Episode.season, Episode.episode).all()
+        payload, etag_val = _build_show_payload(show, episodes, job_queue.active_kinds(imdb_id))
+        payload.pop('episodes')
+        event.update(payload, etag=etag_val)
+    return event
+
+
+def publish_complete(db_session, imdb_id, source):
+    """Publish the show's summary flags once a job is done."""
+    if not show_events.has_subscribers(imdb_id):
+        return
+    show_events.publish(imdb_id, _complete_event(db_session, imdb_id, source))
+
+
+def _stored_season_events(db_session, imdb_id):
+    """Every stored season as a 'season' event (for changes made by another process)."""
+    show = db_session.query(Show).filter_by(imdb_id=imdb_id).first()
+    if not show:
+        return []
+    episodes = db_session.query(Episode).filter_by(show_id=show.id).order_by(Episode.season, Episode.episode).all()
+    return [
+        {'type': 'season', 'source': 'poll', 'season': season,
+         'episodes': [_serialize_episode(ep) for ep in eps]}
+        for season, eps in groupby(episodes, key=lambda e: e.season)
+    ]
+
+
+def _poll_state(imdb_id):
+    with Session() as db_session:
+        version = db_session.query(Show.data_version).filter_by(imdb_id=imdb_id).scalar()
+    return version, job_queue.active_kinds(imdb_id)
+
+
+def _poll_events(imdb_id, version, active):
+    """
+    Events this process's bus missed: all seasons if the show's data_version
+    moved, 'complete' if one of the jobs seen running has finished.
+    """
+    new_version, new_active = _poll_state(imdb_id)
+    events = []
+    if new_version != version or active - new_active:
+        with Session() as db_session:
+            if new_version != version:
+                events += _stored_season_events(db_session, imdb_id)
+            if active - new_active:
+                events.append(_complete_event(db_session, imdb_id, source='poll'))
+    return events, new_version, new_active
+
+
+def stream_show_events(imdb_id, keepalive=SSE_KEEPALIVE_SECONDS, max_seconds=SSE_MAX_SECONDS,
+                       poll_seconds=SSE_POLL_SECONDS):
+    """
+    Yield Server-Sent Events for a show: a 'status' snapshot first (is any
+    background work running?), then 'season' deltas and 'complete' events as
+    jobs publish them. Comment lines keep idle connections alive.
+
+    Jobs are claimed by whichever server process is free, and the event bus
+    only reaches subscribers in the publishing process. So the stream also
+    polls the show's data_version and job status every `poll_seconds`; if it
+    sees changes or a finished job that no published event covered, it sends
+    the stored seasons and a 'complete' itself.
+    """
+    q = show_events.subscribe(imdb_id)
+    try:
+        version, active = _poll_state(imdb_id)
+        yield format_sse({
+            'type': 'status',
+            'enrichmentInProgress': 'enrich_show' in active,
+            'missingRefreshInProgress': 'missing_refresh' in active,
+        })
+        now = time.monotonic()
+        deadline = now + max_seconds
+        next_poll = now + poll_seconds
+        last_sent = now
+        delivered = False   # a published event arrived since the last poll
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            try:
+                event = q.get(timeout=max(0, min(deadline, next_poll, last_sent + keepalive) - now))
+                yield format_sse(event)
+                delivered = True
+                last_sent = time.monotonic()
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if now >= next_poll:
+                next_poll = now + poll_seconds
+                if delivered:
+                    # This process ran the job and published; just catch up with its state
+                    version, active = _poll_state(imdb_id)
+                    delivered = False
+                else:
+                    events, version, active = _poll_events(imdb_id, version, active)
+                    for event in events:
+                        yield format_sse(event)
+                        last_sent = time.monotonic()
+            if time.monotonic() - last_sent >= keepalive:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+    finally:
+        show_events.unsubscribe(imdb_id, q)
@@ -1,4 +1,7 @@
+import bisect
 import datetime
+import json
+import os
 from fastapi import Response
 from fastapi.responses import JSONResponse
 from datetime import UTC
@@ -7,13 +10,17 @@ from database import (
     session,
     Episode,
     SeasonHash,
-    get_or_create_season_hash,
     compute_season_signature,
     Show,
-    is_episode_stale,
-    is_show_metadata_stale
+    is_show_metadata_stale,
+    EPISODE_STALE_DAYS
 )
-from utils import parse_float
+from jobs import job_queue
+from utils import parse_float, VersionedCache
+from view_counter import view_counter
+from popular import popular_ranking
+from search_index import search_index
+from ratings_index import lookup_rating
 
 
 def _parse_votes(votes_str):
@@ -26,6 +33,17 @@ def _now_utc_naive():
     return datetime.datetime.now(UTC).replace(tzinfo=None)
 
 
+def _apply_indexed_rating(ep):
+    """Fill a stored episode's rating from the local ratings index; False if it has none."""
+    indexed = lookup_rating(ep.imdb_id)
+    if indexed is None:
+        return False
+    ep.rating, ep.votes = indexed
+    ep.missing = False
+    ep.last_checked = _now_utc_naive()
+    return True
+
+
 def _update_show_metadata_from_omdb(show, sdata):
     show.title = sdata.get('Title', show.title)
     try:
@@ -34,6 +52,7 @@ def _update_show_metadata_from_omdb(show, sdata):
         new_total = show.total_seasons
     show.genres = sdata.get('Genre', show.genres)
     show.year = sdata.get('Year', show.year)
+    show.plot = sdata.get('Plot', show.plot)
     show.imdb_rating = parse_float(sdata.get('imdbRating')) or show.imdb_rating
     votes = _parse_votes(sdata.get('imdbVotes'))
     if votes is not None:
@@ -43,6 +62,7 @@ def _update_show_metadata_from_omdb(show, sdata):
         show.poster = poster
     if new_total > show.total_seasons:
         show.total_seasons = new_total
+    search_index.add(show.imdb_id, show.title, show.year)
 
 
 def _build_episode_from_omdb(show_id, season_num, ep_data, rating, votes, provisional=False, absent=False, air_date=None):
@@ -82,10 +102,7 @@ def _build_placeholder_episode(show_id, season, meta, imdb_id):
 def _recompute_season_signature(db_session, show_id, season_num):
     season_eps = db_session.query(Episode).filter_by(show_id=show_id, season=season_num).all()
     sig = compute_season_signature(season_eps)
-    if db_session is session:
-        sh = get_or_create_season_hash(show_id, season_num)
-    else:
-        sh = db_session.query(SeasonHash).filter_by(show_id=show_id, season=season_num).first()
+    sh = db_session.query(SeasonHash).filter_by(show_id=show_id, season=season_num).first()
     if not sh:
         sh = SeasonHash(show_id=show_id, season=season_num, signature='', last_computed=_now_utc_naive())
         db_session.add(sh)
@@ -94,8 +111,104 @@ def _recompute_season_signature(db_session, show_id, season_num):
     return sig
 
 
-def get_show_data(imdb_id, if_none_match=None, enrichment_set=None, missing_refresh_set=None):
+def _serialize_episode(ep):
+    return {
+        'season': ep.season, 'episode': ep.episode, 'title': ep.title, 'rating': ep.rating,
+        'imdb_id': ep.imdb_id, 'votes': ep.votes,
+        'lastChecked': ep.last_checked.isoformat() if ep.last_checked else None,
+        'missing': ep.missing, 'absent': getattr(ep, 'absent', None),
+        'provisional': getattr(ep, 'provisional', None),
+        'airDate': ep.air_date.isoformat() if getattr(ep, 'air_date', None) else None,
+    }
+
+
+def _serialize_show_meta(show):
+    return {
+        'title': show.title, 'imdbID': show.imdb_id, 'totalSeasons': show.total_seasons,
+        'genres': show.genres, 'year': show.year, 'imdbRating': show.imdb_rating,
+        'imdbVotes': show.imdb_votes,
+        'lastFullRefresh': show.last_full_refresh.isoformat() if show.last_full_refresh else None,
+    }
+
+
+# Per-show episode summaries, valid while show.data_version is unchanged
+SHOW_PAYLOAD_CACHE_SIZE = int(os.getenv('SHOW_PAYLOAD_CACHE_SIZE', 256))
+show_payload_cache = VersionedCache(SHOW_PAYLOAD_CACHE_SIZE)
+
+# Same encoding as JSONResponse, so spliced bytes match what it would produce
+_JSON_KWARGS = {'ensure_ascii': False, 'allow_nan': False, 'separators': (',', ':')}
+
+
+class _EpisodeSummary:
+    """Everything a show payload needs from the episodes table, computed once per data version."""
+
+    def __init__(self, episodes):
+        self.count = len(episodes)
+        self.incomplete = any(ep.rating is None for ep in episodes)
+        # Only count episodes as absent/provisional if they DON'T have a rating yet
+        # Episodes with ratings shouldn't trigger enrichment indicators even if flags are stale
+        self.absent_count = sum(1 for ep in episodes if getattr(ep, 'absent', False) and ep.rating is None)
+        self.provisional_count = sum(1 for ep in episodes if getattr(ep, 'provisional', False) and ep.rating is None)
+        # Staleness depends on the clock, so keep what is_episode_stale needs rather than the count
+        self.always_stale = sum(1 for ep in episodes if ep.rating is None or not ep.last_checked)
+        self.checked_times = sorted(ep.last_checked for ep in episodes if ep.rating is not None and ep.last_checked)
+        self.episodes_json = json.dumps([_serialize_episode(ep) for ep in episodes], **_JSON_KWARGS).encode('utf-8')
+
+    def stale_count(self):
+        cutoff = _now_utc_naive() - datetime.timedelta(days=EPISODE_STALE_DAYS)
+        return self.always_stale + bisect.bisect_left(self.checked_times, cutoff)
+
+
+def _show_etag(show):
+    """ETag from the show row alone (a Show or a row with the same column names)."""
+    return f"{show.data_version or 0}:{show.episode_count or 0}:{show.total_seasons}:{show.absent_count or 0}"
+
+
+def _show_summary_payload(show, summary, active_jobs=()):
+    """Return (payload without episodes, etag); `active_jobs` are pending/running job kinds."""
+    etag_val = _show_etag(show)
+    payload = {
+        **_serialize_show_meta(show),
+        'incomplete': summary.incomplete, 'metadataStale': is_show_metadata_stale(show),
+        'episodesStaleCount': summary.stale_count(),
+        'partialData': (summary.provisional_count > 0 or summary.absent_count > 0 or 'enrich_show' in active_jobs or 'missing_refresh' in active_jobs),
+        'missingRefreshInProgress': ('missing_refresh' in active_jobs),
+        'absentEpisodesCount': summary.absent_count,
+        'provisionalEpisodesCount': summary.provisional_count
+    }
+    return payload, etag_val
+
+
+def _build_show_payload(show, episodes, active_jobs=()):
+    """Return (payload, etag) for a show and its ordered episodes; `active_jobs` are pending/running job kinds."""
+    payload, etag_val = _show_summary_payload(show, _EpisodeSummary(episodes), active_jobs)
+    payload['episodes'] = [_serialize_episode(ep) for ep in episodes]
+    return payload, etag_val
+
+
+def _cached_episode_summary(show):
+    """Episode summary for a show, rebuilt only after a write bumps show.data_version."""
+    # last_updated too: ids and versions restart if a show is deleted and ingested again
+    version = (show.data_version, show.last_updated)
+    summary = show_payload_cache.get(show.id, version)
+    if summary is None:
+        episodes = session.query(Episode).filter_by(show_id=show.id).order_by(Episode.season, Episode.episode).all()
+        summary = _EpisodeSummary(episodes)
+        show_payload_cache.set(show.id, version, summary)
+    return summary
+
+
+def get_show_data(imdb_id, if_none_match=None):
     """Fetch show data from DB and format it for the API response."""
+    # Revalidation only needs the ETag columns of one row (unique index on imdb_id)
+    row = session.query(
+        Show.data_version, Show.episode_count, Show.total_seasons, Show.absent_count
+    ).filter_by(imdb_id=imdb_id).first()
+    if not row:
+        return JSONResponse({'error': 'Show not found in DB'}, status_code=404)
+    if if_none_match is not None and if_none_match == _show_etag(row):
+        return Response(status_code=304, headers={'ETag': if_none_match})
+
     show = session.query(Show).filter_by(imdb_id=imdb_id).first()
     if not show:
         return JSONResponse({'error': 'Show not found in DB'}, status_code=404)
@@ -105,43 +218,22 @@ def get_show_data(imdb_id, if_none_match=None, enrichment_set=None, missing_refr
     except Exception:
         pass  # Handle detached instance error if occurs
 
-    episodes = session.query(Episode).filter_by(show_id=show.id).order_by(Episode.season, Episode.episode).all()
-    incomplete = any(ep.rating is None for ep in episodes)
-    metadata_stale = is_show_metadata_stale(show)
-    episodes_stale_count = sum(1 for ep in episodes if is_episode_stale(ep))
-    # Only count episodes as absent/provisional if they DON'T have a rating yet
-    # Episodes with ratings shouldn't trigger enrichment indicators even if flags are stale
-    absent_count = sum(1 for ep in episodes if getattr(ep, 'absent', False) and ep.rating is None)
-    provisional_count = sum(1 for ep in episodes if getattr(ep, 'provisional', False) and ep.rating is None)
-    enrichment_set = enrichment_set or set()
-    missing_refresh_set = missing_refresh_set or set()
-
-    etag_val = f"{int(show.last_updated.timestamp()) if show.last_updated else 0}:{len(episodes)}:{show.total_seasons}:{absent_count}"
+    summary = _cached_episode_summary(show)
+    payload, etag_val = _show_summary_payload(show, summary, job_queue.active_kinds(imdb_id))
     if if_none_match == etag_val:
         return Response(status_code=304, headers={'ETag': etag_val})
 
-    payload = {
-        'title': show.title, 'imdbID': show.imdb_id, 'totalSeasons': show.total_seasons,
-        'genres': show.genres, 'year': show.year, 'imdbRating': show.imdb_rating,
-        'imdbVotes': show.imdb_votes,
-        'lastFullRefresh': show.last_full_refresh.isoformat() if show.last_full_refresh else None,
-        'incomplete': incomplete, 'metadataStale': metadata_stale,
-        'episodesStaleCount': episodes_stale_count,
-        'partialData': (provisional_count > 0 or absent_count > 0 or (imdb_id in enrichment_set) or (imdb_id in missing_refresh_set)),
-        'missingRefreshInProgress': (imdb_id in missing_refresh_set),
-        'episodes': [{
-            'season': ep.season, 'episode': ep.episode, 'title': ep.title, 'rating': ep.rating,
-            'imdb_id': ep.imdb_id, 'votes': ep.votes,
-            'lastChecked': ep.last_checked.isoformat() if ep.last_checked else None,
-            'missing': ep.missing, 'absent': getattr(ep, 'absent', None),
-            'provisional': getattr(ep, 'provisional', None),
-            'airDate': ep.air_date.isoformat() if getattr(ep, 'air_date', None) else None,
-        } for ep in episodes],
-        'absentEpisodesCount': absent_count,
-        'provisionalEpisodesCount': provisional_count
-    }
-
-    return JSONResponse(
-        content=payload,
+    # Splice the cached episodes array into the (small) summary object without re-encoding it
+    body = json.dumps(payload, **_JSON_KWARGS).encode('utf-8')
+    body = body[:-1] + b',"episodes":' + summary.episodes_json + b'}'
+    return Response(
+        content=body,
+        media_type='application/json',
         headers={'ETag': etag_val, 'Cache-Control': 'public, max-age=5'}
     )
+
+
+def _increment_view_count(show_id):
+    """Count a view; buffered and written in batches by view_counter."""
+    view_counter.incr(show_id)
+    popular_ranking.record(show_id)
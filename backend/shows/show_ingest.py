@@ -1,25 +1,124 @@
 import os
-import threading
+from itertools import groupby
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 
-from database import session, Show
+from database import session, Show, Episode, touch_show_data
 import services
+from jobs import job_queue, PRIORITY_INTERACTIVE, QueueFull
+from singleflight import SingleFlight
+from popular import popular_ranking
+from search_index import search_index
 from utils import parse_float, safe_json
-from .show_helpers import _parse_votes, _now_utc_naive, _build_episode_from_omdb, _recompute_season_signature, get_show_data
-from .show_enrich import _imdb_enrich_show, _enrichment_in_progress, _enrichment_lock
+from .show_helpers import (
+    _parse_votes,
+    _now_utc_naive,
+    _build_episode_from_omdb,
+    _recompute_season_signature,
+    _serialize_episode,
+    _serialize_show_meta,
+    get_show_data,
+    _increment_view_count
+)
+from .show_writer import EpisodeWriter
 
 
-def fetch_and_store_show(imdb_id, track_view=False):
+def _emit_show(on_event, show):
+    if on_event:
+        on_event({'type': 'show', **_serialize_show_meta(show)})
+
+
+def _emit_season(on_event, season_num, episodes):
+    """Report a season's episodes (built, not yet written: the show's rows are written in one batch)."""
+    if on_event:
+        on_event({
+            'type': 'season', 'season': season_num,
+            'episodes': [_serialize_episode(ep) for ep in sorted(episodes, key=lambda e: e.episode)],
+        })
+
+
+# Concurrent requests for the same new show share one ingest (see /debug/singleflight)
+ingest_flight = SingleFlight()
+
+
+def _insert_show(show):
+    """Add and flush a new Show; False if another process stored the same imdb_id first."""
+    session.add(show)
+    try:
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        print(f"[ingest] lost insert race imdb_id={show.imdb_id}, serving stored copy")
+        return False
+    return True
+
+
+def _store_new_show(show, season_eps):
+    """
+    Insert a fetched show and all of its episodes in one short transaction.
+
+    Called only after every upstream request for the show has finished, so no
+    write transaction (on SQLite, the database write lock) is held across the
+    network phase. False if another process stored the same imdb_id first.
+    """
+    if not _insert_show(show):
+        return False
+    writer = EpisodeWriter(show.id)
+    for eps in season_eps.values():
+        for episode in eps:
+            writer.add(episode)
+    writer.write(session)
+    for season_num in sorted(season_eps):
+        _recompute_season_signature(session, show.id, season_num)
+    touch_show_data(session, show)
+    session.commit()
+    return True
+
+
+def _serve_stored_show(imdb_id, track_view, on_event):
+    """Answer a caller whose ingest was done by someone else: count the view, replay events."""
+    show = session.query(Show).filter_by(imdb_id=imdb_id).first()
+    if show is None:
+        return JSONResponse({'error': 'Show not found in DB'}, status_code=404)
+    if track_view:
+        _increment_view_count(show.id)
+    if on_event:
+        _emit_show(on_event, show)
+        episodes = session.query(Episode).filter_by(show_id=show.id).order_by(Episode.season, Episode.episode).all()
+        for season_num, eps in groupby(episodes, key=lambda e: e.season):
+            _emit_season(on_event, season_num, list(eps))
+    return get_show_data(imdb_id)
+
+
+def _single_flight_ingest(ingest, imdb_id, track_view, on_event):
+    resp, shared = ingest_flight.do(imdb_id, ingest, imdb_id, track_view=track_view, on_event=on_event)
+    if not shared or resp.status_code != 200:
+        return resp
+    return _serve_stored_show(imdb_id, track_view, on_event)
+
+
+def fetch_and_store_show(imdb_id, track_view=False, on_event=None):
     """
     Standard path to fetch a show from OMDb, scrape IMDb for missing ratings,
     and store everything in the database.
+
+    `on_event`, if given, is called with a 'show' event once metadata is known
+    and a 'season' event as each season's episodes are fetched. Both come
+    before the show is written: it is stored in one transaction at the end,
+    before this function returns.
+
+    Concurrent calls for the same imdb_id run a single ingest; the other
+    callers wait for it and are then served from the DB.
     """
     # Gate: if FAST_INGEST enabled use new path
     if os.getenv('FAST_INGEST') == '1':
-        return fast_fetch_and_store_show(imdb_id, track_view=track_view)
+        return fast_fetch_and_store_show(imdb_id, track_view=track_view, on_event=on_event)
+    return _single_flight_ingest(_fetch_and_store_show, imdb_id, track_view, on_event)
 
+
+def _fetch_and_store_show(imdb_id, track_view=False, on_event=None):
     apiKey = os.getenv('OMDB_API_KEY')
-    url = f'http://www.omdbapi.com/?apikey={apiKey}&i={imdb_id}'
+    url = f'{services.OMDB_BASE_URL}?apikey={apiKey}&i={imdb_id}'
     response = services.throttled_omdb_get(url)
     if response.status_code != 200:
         return JSONResponse({'error': 'Failed to fetch show data'}, status_code=500)
@@ -39,38 +138,55 @@ def fetch_and_store_show(imdb_id, track_view=False):
             imdb_rating=parse_float(data.get('imdbRating')),
             imdb_votes=_parse_votes(data.get('imdbVotes')),
             poster=data.get('Poster'),
+            plot=data.get('Plot'),
             last_full_refresh=_now_utc_naive(),
             view_count=1 if track_view else 0
         )
-        session.add(show)
-        session.commit()
-
-        # fetch data for each season
-        for season_num in range(1, show.total_seasons + 1):
-            season_data = services.fetch_season_from_omdb(apiKey, imdb_id, season_num)
-            if season_data:
-                for ep_data in season_data.get('Episodes', []):
+        _emit_show(on_event, show)
+
+        # fetch seasons concurrently (and scrape missing ratings), then store everything at once
+        seasons = range(1, show.total_seasons + 1)
+        fetched = {}
+        try:
+            for season_num, season_data in services.iter_seasons_from_omdb(apiKey, imdb_id, seasons):
+                if not season_data:
+                    continue
+                eps = season_data.get('Episodes', [])
+                scraped = services.fetch_ratings_from_imdb(
+                    ep['imdbID'] for ep in eps if parse_float(ep.get('imdbRating')) is None and ep.get('imdbID')
+                )
+                season_eps = []
+                for ep_data in eps:
                     rating = parse_float(ep_data.get('imdbRating'))
                     if rating is None:
-                        scraped = services.fetch_rating_from_imdb(ep_data['imdbID'])
-                        rating = parse_float(scraped)
+                        rating = parse_float(scraped.get(ep_data.get('imdbID')))
                     votes = _parse_votes(ep_data.get('imdbVotes'))
-                    episode = _build_episode_from_omdb(show.id, season_num, ep_data, rating, votes)
-                    session.add(episode)
-            session.commit()
-            _recompute_season_signature(session, show.id, season_num)
-            session.commit()
+                    # show_id is filled in by EpisodeWriter once the show row exists
+                    season_eps.append(_build_episode_from_omdb(None, season_num, ep_data, rating, votes))
+                fetched[season_num] = season_eps
+                _emit_season(on_event, season_num, season_eps)
+        except Exception as e:
+            print(f"[fetch_show] season fetch failed imdb_id={imdb_id} err={e}")
+            return JSONResponse({'error': 'Upstream failure'}, status_code=502)
 
-        session.commit()
+        if not _store_new_show(show, fetched):
+            return _serve_stored_show(imdb_id, track_view, on_event)
+        search_index.add(show.imdb_id, show.title, show.year)
+        if track_view:
+            popular_ranking.record(show.id)
         return get_show_data(imdb_id)
 
     return JSONResponse({'error': 'Failed to fetch show data'}, status_code=500)
 
 
-def fast_fetch_and_store_show(imdb_id, track_view=False):
-    """Fast ingest path: quickly stores OMDb data and spawns a background thread for IMDb enrichment."""
+def fast_fetch_and_store_show(imdb_id, track_view=False, on_event=None):
+    """Fast ingest path: quickly stores OMDb data and queues a background job for IMDb enrichment."""
+    return _single_flight_ingest(_fast_fetch_and_store_show, imdb_id, track_view, on_event)
+
+
+def _fast_fetch_and_store_show(imdb_id, track_view=False, on_event=None):
     apiKey = os.getenv('OMDB_API_KEY')
-    series_url = f'http://www.omdbapi.com/?apikey={apiKey}&i={imdb_id}'
+    series_url = f'{services.OMDB_BASE_URL}?apikey={apiKey}&i={imdb_id}'
     try:
         resp = services.throttled_omdb_get(series_url, timeout=10)
     except Exception:
@@ -97,15 +213,19 @@ def fast_fetch_and_store_show(imdb_id, track_view=False):
         imdb_rating=parse_float(meta.get('imdbRating')),
         imdb_votes=_parse_votes(meta.get('imdbVotes')),
         poster=meta.get('Poster'),
+        plot=meta.get('Plot'),
         last_full_refresh=_now_utc_naive(),
         view_count=1 if track_view else 0
     )
-    session.add(show)
-    session.commit()
+    _emit_show(on_event, show)
 
-    for season_num in range(1, total_seasons + 1):
-        omdb_data = services.fetch_season_from_omdb(apiKey, imdb_id, season_num)
-        if omdb_data:
+    seasons = range(1, total_seasons + 1)
+    fetched = {}
+    try:
+        for season_num, omdb_data in services.iter_seasons_from_omdb(apiKey, imdb_id, seasons):
+            if not omdb_data:
+                continue
+            season_eps = []
             for ep_data in omdb_data.get('Episodes', []):
                 try:
                     ep_num = int(ep_data.get('Episode', 0))
@@ -113,18 +233,28 @@ def fast_fetch_and_store_show(imdb_id, track_view=False):
                     continue
                 rating = parse_float(ep_data.get('imdbRating'))
                 votes = _parse_votes(ep_data.get('imdbVotes'))
-                episode = _build_episode_from_omdb(show.id, season_num, ep_data, rating, votes, provisional=False, absent=False, air_date=None)
-                session.add(episode)
-        session.commit()
-        _recompute_season_signature(session, show.id, season_num)
-        session.commit()
+                episode = _build_episode_from_omdb(None, season_num, ep_data, rating, votes, provisional=False, absent=False, air_date=None)
+                season_eps.append(episode)
+            fetched[season_num] = season_eps
+            _emit_season(on_event, season_num, season_eps)
+    except Exception as e:
+        print(f"[fast_ingest] season fetch failed imdb_id={imdb_id} err={e}")
+        return JSONResponse({'error': 'Upstream failure'}, status_code=502)
 
-    show.last_updated = _now_utc_naive()
-    session.commit()
+    if not _store_new_show(show, fetched):
+        return _serve_stored_show(imdb_id, track_view, on_event)
+    search_index.add(show.imdb_id, show.title, show.year)
+    if track_view:
+        popular_ranking.record(show.id)
 
-    with _enrichment_lock:
-        _enrichment_in_progress.add(imdb_id)
-    print(f"[fast_ingest] queued enrichment imdb_id={imdb_id} seasons={total_seasons}")
-    threading.Thread(target=_imdb_enrich_show, args=(show.id, imdb_id, total_seasons), daemon=True).start()
+    try:
+        job_queue.submit(
+            'enrich_show', imdb_id,
+            {'show_db_id': show.id, 'imdb_id': imdb_id, 'total_seasons': total_seasons},
+            priority=PRIORITY_INTERACTIVE
+        )
+        print(f"[fast_ingest] queued enrichment imdb_id={imdb_id} seasons={total_seasons}")
+    except QueueFull:
+        print(f"[fast_ingest] job queue full, enrichment skipped imdb_id={imdb_id}")
 
     return get_show_data(imdb_id)
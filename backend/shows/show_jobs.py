@@ -0,0 +1,59 @@
+import functools
+
+from database import session
+from jobs import job_queue
+from .show_enrich import _imdb_enrich_show
+from .show_ingest import fetch_and_store_show
+from .show_refresh import process_missing_refresh, process_poster_backfill
+from .show_events import publish_complete
+from featured import featured_cache
+from featured_shows import FEATURED_SHOW_IDS
+from popular import popular_ranking
+
+_FEATURED_IDS = {info['imdbID'] for info in FEATURED_SHOW_IDS}
+
+
+def _with_session_cleanup(fn):
+    """Job workers are long-lived threads: drop their scoped session after each job."""
+    @functools.wraps(fn)
+    def wrapper(**payload):
+        try:
+            return fn(**payload)
+        finally:
+            session.remove()
+    return wrapper
+
+
+def _publish_complete(source):
+    """on_finish hook: runs once the job row is no longer active, so partialData is final."""
+    def on_finish(imdb_id, **_payload):
+        try:
+            publish_complete(session, imdb_id, source=source)
+        except Exception as e:
+            print(f"[{source}] publish error {imdb_id}: {e}")
+        finally:
+            session.remove()
+    return on_finish
+
+
+def _ingest_show(imdb_id):
+    """Background ingest (e.g. featured prefetch); upstream failures raise so the job is retried."""
+    resp = fetch_and_store_show(imdb_id, track_view=False)
+    if resp.status_code >= 500:
+        raise RuntimeError(f"ingest failed for {imdb_id}: status {resp.status_code}")
+    return {'status': resp.status_code}
+
+
+def _show_listings_changed(imdb_id, **_payload):
+    """on_finish hook: a show's title/poster may have changed, refresh lists that display it."""
+    popular_ranking.invalidate()
+    if imdb_id in _FEATURED_IDS:
+        featured_cache.mark_dirty()
+
+
+job_queue.register('enrich_show', _imdb_enrich_show, on_finish=_publish_complete('enrich'))
+job_queue.register('missing_refresh', _with_session_cleanup(process_missing_refresh),
+                   on_finish=_publish_complete('missing_refresh'))
+job_queue.register('poster_backfill', _with_session_cleanup(process_poster_backfill),
+                   on_finish=_show_listings_changed)
+job_queue.register('ingest_show', _with_session_cleanup(_ingest_show), on_finish=_show_listings_changed)
@@ -1,83 +1,82 @@
 import os
-import threading
 from fastapi.responses import JSONResponse
 
-from database import session, Show, Episode, SeasonHash
+from database import session, Show, Episode, SeasonHash, touch_show_data
 import services
 from utils import parse_float, safe_json
 from .show_helpers import (
     _parse_votes,
     _now_utc_naive,
+    _apply_indexed_rating,
     _update_show_metadata_from_omdb,
     _build_episode_from_omdb,
     _build_placeholder_episode,
     _recompute_season_signature
 )
-
-# Track missing refresh progress (in-memory, non-persistent)
-_missing_refresh_in_progress = set()
-_missing_refresh_lock = threading.Lock()
+from .show_events import publish_season_delta
+from .show_writer import EpisodeWriter
 
 
 def process_missing_refresh(imdb_id):
-    with _missing_refresh_lock:
-        _missing_refresh_in_progress.add(imdb_id)
     apiKey = os.getenv('OMDB_API_KEY')
-    try:
-        show = session.query(Show).filter_by(imdb_id=imdb_id).first()
-        if not show:
-            return JSONResponse({'error': 'Show not found in DB'}, status_code=404)
-        missing_eps = session.query(Episode).filter_by(show_id=show.id, rating=None).all()
-        updated = 0
-        updated_seasons = set()
-        missing_by_season = {}
-        for ep in missing_eps:
-            missing_by_season.setdefault(ep.season, []).append(ep)
-
-        for season, eps in missing_by_season.items():
-            season_data = services.fetch_season_from_omdb(apiKey, imdb_id, season)
-            if not season_data:
+    show = session.query(Show).filter_by(imdb_id=imdb_id).first()
+    if not show:
+        return JSONResponse({'error': 'Show not found in DB'}, status_code=404)
+    missing_eps = session.query(Episode).filter_by(show_id=show.id, rating=None).all()
+    updated = 0
+    updated_seasons = {}
+    missing_by_season = {}
+    for ep in missing_eps:
+        # The local ratings index answers without an upstream round trip
+        if _apply_indexed_rating(ep):
+            updated += 1
+            updated_seasons.setdefault(ep.season, []).append(ep)
+            continue
+        missing_by_season.setdefault(ep.season, []).append(ep)
+
+    for season, eps in missing_by_season.items():
+        season_data = services.fetch_season_from_omdb(apiKey, imdb_id, season)
+        if not season_data:
+            continue
+        season_eps = season_data.get('Episodes', [])
+        omdb_map = {}
+        for ep_data in season_eps:
+            try:
+                ep_num = int(ep_data.get('Episode', 0))
+            except Exception:
                 continue
-            season_eps = season_data.get('Episodes', [])
-            omdb_map = {}
-            for ep_data in season_eps:
-                try:
-                    ep_num = int(ep_data.get('Episode', 0))
-                except Exception:
-                    continue
-                omdb_map[ep_num] = ep_data
-
-            for ep in eps:
-                ep_data = omdb_map.get(ep.episode)
-                if not ep_data:
-                    continue
-                rating = parse_float(ep_data.get('imdbRating'))
-                if rating is None:
-                    scraped = services.fetch_rating_from_imdb(ep_data.get('imdbID'))
-                    rating = parse_float(scraped)
-                if rating is not None:
-                    ep.rating = rating
-                    ep.missing = False
-                    ep.last_checked = _now_utc_naive()
-                    votes = _parse_votes(ep_data.get('imdbVotes'))
-                    if votes is not None:
-                        ep.votes = votes
-                    updated += 1
-                    updated_seasons.add(season)
-                else:
-                    ep.missing = True
-                    ep.last_checked = _now_utc_naive()
+            omdb_map[ep_num] = ep_data
 
-        if updated:
-            session.commit()
-            for season in updated_seasons:
-                _recompute_season_signature(session, show.id, season)
-            show.last_updated = _now_utc_naive()
-            session.commit()
-        return {'updated': updated}
-    finally:
-        with _missing_refresh_lock:
-            _missing_refresh_in_progress.discard(imdb_id)
+        for ep in eps:
+            ep_data = omdb_map.get(ep.episode)
+            if not ep_data:
+                continue
+            rating = parse_float(ep_data.get('imdbRating'))
+            if rating is None:
+                scraped = services.fetch_rating_from_imdb(ep_data.get('imdbID'))
+                rating = parse_float(scraped)
+            if rating is not None:
+                ep.rating = rating
+                ep.missing = False
+                ep.last_checked = _now_utc_naive()
+                votes = _parse_votes(ep_data.get('imdbVotes'))
+                if votes is not None:
+                    ep.votes = votes
+                updated += 1
+                updated_seasons.setdefault(season, []).append(ep)
+            else:
+                ep.missing = True
+                ep.last_checked = _now_utc_naive()
+
+    if updated:
+        session.commit()
+        for season in updated_seasons:
+            _recompute_season_signature(session, show.id, season)
+        touch_show_data(session, show)
+        session.commit()
+        for season, eps in sorted(updated_seasons.items()):
+            publish_season_delta(imdb_id, season, eps, source='missing_refresh')
+    return {'updated': updated}
 
 
 def process_show_refresh(imdb_id):
@@ -87,7 +86,7 @@ def process_show_refresh(imdb_id):
         from .show_ingest import fetch_and_store_show
         return fetch_and_store_show(imdb_id, track_view=False)
 
-    series_url = f'http://www.omdbapi.com/?apikey={apiKey}&i={imdb_id}'
+    series_url = f'{services.OMDB_BASE_URL}?apikey={apiKey}&i={imdb_id}'
     series_resp = services.throttled_omdb_get(series_url)
     sdata = safe_json(series_resp) if series_resp.status_code == 200 else None
 
@@ -102,6 +101,8 @@ def process_show_refresh(imdb_id):
     total = show.total_seasons
     updated = 0
     fetched_any = False
+    # Seasons still commit one by one: each is separated by OMDb/IMDb fetches
+    writer = EpisodeWriter(show.id)
     for season in range(1, total + 1):
         season_data = services.fetch_season_from_omdb(apiKey, imdb_id, season)
         if not season_data:
@@ -128,9 +129,9 @@ def process_show_refresh(imdb_id):
                     meta = next((m for m in imdb_eps if m['episode'] == ep_num), None)
                     if not meta:
                         continue
-                    placeholder = _build_placeholder_episode(show.id, season, meta, imdb_id)
-                    session.add(placeholder)
+                    writer.add(_build_placeholder_episode(show.id, season, meta, imdb_id))
                 if new_missing:
+                    writer.write(session)
                     session.commit()
                     _recompute_season_signature(session, show.id, season)
                     updated += 1
@@ -163,11 +164,11 @@ def process_show_refresh(imdb_id):
                     if (real_ep_id := ep_data.get('imdbID')) and real_ep_id.startswith('tt'):
                         ep.imdb_id = real_ep_id
             else:
-                episode = _build_episode_from_omdb(show.id, season, ep_data, rating, votes, provisional=False, absent=False)
-                session.add(episode)
+                writer.add(_build_episode_from_omdb(show.id, season, ep_data, rating, votes, provisional=False, absent=False))
                 season_changed = True
 
         if season_changed:
+            writer.write(session)
             session.commit()
             _recompute_season_signature(session, show.id, season)
             updated += 1
@@ -182,15 +183,15 @@ def process_show_refresh(imdb_id):
                     meta = next((m for m in imdb_eps if m['episode'] == ep_num), None)
                     if not meta:
                         continue
-                    placeholder = _build_placeholder_episode(show.id, season, meta, imdb_id)
-                    session.add(placeholder)
+                    writer.add(_build_placeholder_episode(show.id, season, meta, imdb_id))
+                writer.write(session)
                 session.commit()
                 _recompute_season_signature(session, show.id, season)
                 updated += 1
 
     if fetched_any:
         show.last_full_refresh = _now_utc_naive()
-    show.last_updated = _now_utc_naive()
+    touch_show_data(session, show)
     session.commit()
     return {'updated_seasons': updated}
 
@@ -201,7 +202,7 @@ def process_metadata_refresh(imdb_id):
     if not show:
         return JSONResponse({'error': 'Show not found'}, status_code=404)
 
-    series_url = f'http://www.omdbapi.com/?apikey={apiKey}&i={imdb_id}'
+    series_url = f'{services.OMDB_BASE_URL}?apikey={apiKey}&i={imdb_id}'
     series_resp = services.throttled_omdb_get(series_url)
     if series_resp.status_code != 200:
         return JSONResponse({'error': 'Upstream error'}, status_code=502)
@@ -211,6 +212,30 @@ def process_metadata_refresh(imdb_id):
         return JSONResponse({'error': 'No data'}, status_code=502)
 
     _update_show_metadata_from_omdb(show, sdata)
-    show.last_updated = _now_utc_naive()
+    touch_show_data(session, show)
     session.commit()
     return {'status': 'metadata refreshed'}
+
+
+def process_poster_backfill(imdb_id):
+    """Store a poster URL for a show that has none (queued by /popular)."""
+    apiKey = os.getenv('OMDB_API_KEY')
+    show = session.query(Show).filter_by(imdb_id=imdb_id).first()
+    if not show or show.poster:
+        return {'poster': show.poster if show else None}
+
+    url = f'{services.OMDB_BASE_URL}?apikey={apiKey}&i={imdb_id}'
+    resp = services.throttled_omdb_get(url, timeout=5)
+    if resp.status_code != 200:
+        # Raising lets the job queue retry with backoff
+        raise RuntimeError(f"OMDb status {resp.status_code} for {imdb_id}")
+    data = safe_json(resp)
+    if not data or data.get('Response') != 'True':
+        return {'poster': None}
+    # 'N/A' is stored too (as ingest does) so shows without art are not re-queued forever
+    show.poster = data.get('Poster') or 'N/A'
+    if show.plot is None:
+        show.plot = data.get('Plot')
+    session.commit()
+    print(f"[poster_backfill] imdb_id={imdb_id} poster={show.poster}")
+    return {'poster': show.poster}
@@ -0,0 +1,93 @@
+import json
+import queue
+import threading
+import traceback
+from itertools import groupby
+
+from database import session, Show, Episode
+from jobs import job_queue
+from .show_ingest import fetch_and_store_show
+from .show_helpers import _build_show_payload, _serialize_show_meta
+
+_END = object()
+
+
+def _ndjson(event):
+    return json.dumps(event, separators=(',', ':')) + '\n'
+
+
+def _stored_show_events(imdb_id, include_episodes):
+    """Events for a show already in the DB: metadata, one event per season, then 'done'."""
+    show = session.query(Show).filter_by(imdb_id=imdb_id).first()
+    if not show:
+        return [{'type': 'error', 'status': 404, 'error': 'Show not found in DB'}]
+    episodes = session.query(Episode).filter_by(show_id=show.id).order_by(Episode.season, Episode.episode).all()
+    payload, etag_val = _build_show_payload(show, episodes, job_queue.active_kinds(imdb_id))
+    serialized = payload.pop('episodes')
+    events = []
+    if include_episodes:
+        events.append({'type': 'show', **_serialize_show_meta(show)})
+        for season_num, eps in groupby(serialized, key=lambda e: e['season']):
+            events.append({'type': 'season', 'season': season_num, 'episodes': list(eps)})
+    events.append({'type': 'done', 'etag': etag_val, **payload})
+    return events
+
+
+def _error_event(resp):
+    try:
+        message = json.loads(resp.body).get('error')
+    except Exception:
+        message = None
+    return {'type': 'error', 'status': resp.status_code, 'error': message or 'Failed to fetch show data'}
+
+
+def _ingest_worker(imdb_id, track_view, events):
+    try:
+        resp = fetch_and_store_show(imdb_id, track_view=track_view, on_event=events.put)
+        if resp.status_code != 200:
+            events.put(_error_event(resp))
+        else:
+            for event in _stored_show_events(imdb_id, include_episodes=False):
+                events.put(event)
+    except Exception as e:
+        print(f"[stream] ingest error imdb_id={imdb_id} err={e}\n{traceback.format_exc()}")
+        session.rollback()
+        events.put({'type': 'error', 'status': 500, 'error': 'Ingest failed'})
+    finally:
+        session.remove()
+        events.put(_END)
+
+
+def stream_show(imdb_id, track_view=False):
+    """
+    Yield NDJSON lines for a show: a 'show' event with metadata, a 'season'
+    event per season as soon as its episodes are fetched, and a final 'done'
+    event carrying the same summary fields (and ETag) as /getShow.
+
+    For a new show the 'show' and 'season' events come before anything is
+    written (the show is stored in one transaction at the end); the rows are
+    readable through /getShow only once 'done' has been sent. Clients should
+    render from the events, not re-read the show on a 'season' event.
+
+    Unknown shows are ingested on a dedicated thread through the regular
+    ingest functions, so the DB session stays on one thread while the
+    response is drained from whichever thread the server uses. If the
+    client disconnects, ingest still runs to completion.
+    """
+    # All DB reads for a stored show happen before the first yield, i.e. on one thread
+    if session.query(Show.id).filter_by(imdb_id=imdb_id).first():
+        for event in _stored_show_events(imdb_id, include_episodes=True):
+            yield _ndjson(event)
+        return
+
+    events = queue.Queue()
+    threading.Thread(
+        target=_ingest_worker,
+        args=(imdb_id, track_view, events),
+        daemon=True,
+    ).start()
+    while True:
+        event = events.get()
+        if event is _END:
+            return
+        yield _ndjson(event)
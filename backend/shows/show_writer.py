@@ -0,0 +1,60 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import Episode
+
+# Every column but the surrogate id; rows are matched on the unique (show_id, season, episode)
+EPISODE_COLUMNS = [c.name for c in Episode.__table__.columns if c.name != 'id']
+EPISODE_KEY = ('show_id', 'season', 'episode')
+
+
+def _insert_for(db_session):
+    dialect = db_session.get_bind().dialect.name
+    return (postgresql if dialect == 'postgresql' else sqlite).insert(Episode.__table__)
+
+
+class EpisodeWriter:
+    """
+    Collects a show's new and changed episodes and writes them with one
+    `INSERT ... ON CONFLICT (show_id, season, episode) DO UPDATE` executemany.
+
+    Added episodes are plain values (transient `Episode` objects are fine and
+    are never attached to the session); a later add for the same slot replaces
+    the earlier one. `write` does not commit, so callers keep one commit per show.
+    """
+
+    def __init__(self, show_id):
+        self.show_id = show_id
+        self._rows = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, ep):
+        row = {name: getattr(ep, name, None) for name in EPISODE_COLUMNS}
+        row['show_id'] = self.show_id
+        self._rows[(row['season'], row['episode'])] = row
+
+    def write(self, db_session):
+        """Upsert the collected rows; returns how many were sent."""
+        if not self._rows:
+            return 0
+        # Pending ORM changes must reach the table before expire_all below discards them
+        db_session.flush()
+        stmt = _insert_for(db_session)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(EPISODE_KEY),
+            set_={name: stmt.excluded[name] for name in EPISODE_COLUMNS if name not in EPISODE_KEY},
+        )
+        rows = list(self._rows.values())
+        db_session.execute(stmt, rows)
+        # ORM copies loaded earlier in this session no longer match the table
+        db_session.expire_all()
+        self._rows = {}
+        return len(rows)
+
+
+def _copy_episode(ep, **changes):
+    """Detached copy of a stored episode with `changes` applied (for EpisodeWriter and events)."""
+    values = {name: getattr(ep, name) for name in EPISODE_COLUMNS}
+    values.update(changes)
+    return Episode(**values)
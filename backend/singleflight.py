@@ -0,0 +1,84 @@
+"""
+Single-flight call deduplication.
+
+When several threads ask for the same key at once, only the first (the
+leader) runs the function; the others block until it finishes and share its
+result or exception. Used to collapse concurrent ingests of one show and
+concurrent scrapes of one IMDb season into a single upstream fetch.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Hashable
+
+
+# ============================================================================
+# Single Flight
+# ============================================================================
+class _Call:
+    """One in-flight execution and the threads waiting on it."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls by key; counts the calls it saved."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._stats = {'calls': 0, 'executed': 0, 'shared': 0, 'errors': 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> tuple[Any, bool]:
+        """
+        Run `fn(*args, **kwargs)` unless a call for `key` is already running.
+
+        Returns (value, shared): `shared` is True for callers that waited on
+        another thread's execution instead of running `fn` themselves. An
+        exception raised by the leader is re-raised in every waiter.
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats['shared'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats['executed'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            # Forget the key before waking waiters so later callers start a fresh call
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.value, False
+
+    def in_flight(self) -> int:
+        """Number of keys currently executing."""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> dict[str, int]:
+        """Counters: calls, executed (upstream work done), shared (= calls saved), errors."""
+        with self._lock:
+            return {**self._stats, 'inFlight': len(self._calls)}
@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+
+# Point the app at a throwaway SQLite file before database.py is imported
+_DB_DIR = tempfile.mkdtemp(prefix='imdb-heatmap-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.setdefault('OMDB_API_KEY', 'test-key')
+
+CURRENT_DIR = os.path.dirname(__file__)
+ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+for path in (ROOT, CURRENT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import pytest
+
+import services
+from rate_limit import HostRateLimiter
+from stub_server import StubServer
+
+
+@pytest.fixture
+def db():
+    """Fresh schema for each test; yields the scoped session."""
+    import database
+    database.Base.metadata.drop_all(database.engine)
+    database.init_db()
+    database.ensure_columns()
+    database.ensure_indices()
+    yield database.session
+    database.session.rollback()
+    database.session.remove()
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """Fast, isolated rate limiter so tests never touch the global buckets."""
+    fresh = HostRateLimiter()
+    fresh.configure('omdb', rate=1000, burst=50)
+    fresh.configure('imdb', rate=1000, burst=50)
+    monkeypatch.setattr(services, 'rate_limiter', fresh)
+    return fresh
+
+
+@pytest.fixture
+def stub_omdb(monkeypatch, limiter):
+    def start(handler, delay=0.0):
+        srv = StubServer(handler, delay=delay).__enter__()
+        monkeypatch.setattr(services, 'OMDB_BASE_URL', f'{srv.url}/')
+        monkeypatch.setattr(services, 'OMDB_SEASON_WORKERS', 8)
+        servers.append(srv)
+        return srv
+    servers = []
+    yield start
+    for srv in servers:
+        srv.__exit__(None, None, None)
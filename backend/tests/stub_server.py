@@ -0,0 +1,96 @@
+"""Minimal threaded HTTP stub used by tests and benchmarks in place of OMDb/IMDb."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from urllib.parse import urlsplit, parse_qs
+
+
+class _Server(ThreadingHTTPServer):
+    # The default listen backlog (5) drops bursts of concurrent connects
+    request_queue_size = 128
+
+
+class StubServer:
+    """
+    Serve `handler(path, query, headers) -> (status, body, headers)` on 127.0.0.1.
+
+    `delay` adds a fixed latency per request (seconds), either globally or
+    per path via a callable. Use as a context manager.
+    """
+
+    def __init__(self, handler, delay=0.0):
+        self.handler = handler
+        self.delay = delay
+        self.requests = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                with stub._lock:
+                    stub.requests.append((parts.path, query, dict(self.headers)))
+                    stub.connections.add(self.client_address)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    delay = stub.delay(parts.path, query) if callable(stub.delay) else stub.delay
+                    if delay:
+                        time.sleep(delay)
+                    status, body, headers = stub.handler(parts.path, query, dict(self.headers))
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def omdb_show_handler(total_seasons, eps_per_season=3):
+    """Handler answering OMDb title (`i=`) and season (`i=&season=`) lookups."""
+    def handler(path, query, headers):
+        if 'season' not in query:
+            body = {'Response': 'True', 'Title': 'Stub Show', 'totalSeasons': str(total_seasons),
+                    'Genre': 'Drama', 'Year': '2000-2010', 'imdbRating': '8.5', 'imdbVotes': '1,234',
+                    'Poster': 'N/A'}
+        else:
+            season = int(query['season'])
+            body = {'Response': 'True', 'Season': str(season), 'Episodes': [
+                {'Title': f'S{season}E{e}', 'Episode': str(e), 'imdbRating': '7.5',
+                 'imdbID': f'tt9{season:03d}{e:03d}', 'imdbVotes': '100'}
+                for e in range(1, eps_per_season + 1)
+            ]}
+        return 200, json.dumps(body), {'Content-Type': 'application/json'}
+    return handler
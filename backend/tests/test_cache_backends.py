@@ -0,0 +1,118 @@
+import fnmatch
+import multiprocessing
+import time
+
+import pytest
+
+from cache_backends import RedisCacheBackend, SqliteCacheBackend, TieredCache
+from utils import TTLCache
+
+
+class FakeRedis:
+    """Local stand-in for the subset of redis-py the adapter uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        entry = self.data.get(name)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0].encode()
+
+    def set(self, name, value, px=None):
+        self.data[name] = (value, time.time() + px / 1000 if px else float('inf'))
+        return True
+
+    def delete(self, *names):
+        names = [n.decode() if isinstance(n, bytes) else n for n in names]
+        return sum(self.data.pop(n, None) is not None for n in names)
+
+    def scan_iter(self, match='*'):
+        return [n.encode() for n in list(self.data) if fnmatch.fnmatchcase(n, match) and self.get(n) is not None]
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def backend_factory(request, tmp_path):
+    if request.param == 'sqlite':
+        path = str(tmp_path / 'cache.db')
+        return lambda ns='test': SqliteCacheBackend(path, namespace=ns)
+    client = FakeRedis()
+    return lambda ns='test': RedisCacheBackend(client, namespace=ns)
+
+
+def test_backend_roundtrip_and_expiry(backend_factory):
+    backend = backend_factory()
+    backend.set(('tt0000001', 1), [{'episode': 1, 'rating': 8.1}], ttl=60)
+    backend.set('short', ['x'], ttl=0.05)
+    value, remaining = backend.get(('tt0000001', 1))
+    assert value == [{'episode': 1, 'rating': 8.1}] and 0 < remaining <= 60
+    time.sleep(0.1)
+    assert backend.get('short') is None
+    assert backend.keys() == [('tt0000001', 1)]
+    backend.delete(('tt0000001', 1))
+    assert backend.get(('tt0000001', 1)) is None
+
+
+def test_namespaces_are_isolated(backend_factory):
+    seasons, search = backend_factory('seasons'), backend_factory('search')
+    seasons.set('k', 1, ttl=60)
+    search.set('k', 2, ttl=60)
+    search.clear()
+    assert seasons.get('k')[0] == 1 and search.get('k') is None
+
+
+def test_tiered_cache_shares_entries_between_l1s(backend_factory):
+    # Two workers: separate L1s over one shared store
+    a = TieredCache(TTLCache(300), backend_factory())
+    b = TieredCache(TTLCache(300), backend_factory())
+    a.set(('tt0000002', 3), [{'episode': 1}])
+    assert b.get(('tt0000002', 3)) == [{'episode': 1}]
+    assert b.stats()['l2Hits'] == 1
+    # Now in b's L1 too
+    assert b.get(('tt0000002', 3)) == [{'episode': 1}] and b.stats()['l2Hits'] == 1
+    # require_value semantics match TTLCache
+    a.set('miss', [None, False], ttl=60)
+    a.set('empty', [])
+    assert b.get('empty') is None and b.get('empty', require_value=False) == []
+    a.pop(('tt0000002', 3))
+    assert TieredCache(TTLCache(300), backend_factory()).get(('tt0000002', 3)) is None
+
+
+def test_shared_backend_failure_degrades_to_l1():
+    class Broken(SqliteCacheBackend):
+        def __init__(self):
+            pass
+        def get(self, key):
+            raise OSError('disk gone')
+        def set(self, key, value, ttl):
+            raise OSError('disk gone')
+    cache = TieredCache(TTLCache(60), Broken())
+    cache.set('k', 'v')
+    assert cache.get('k') == 'v'
+    assert cache.get('other') is None
+    assert cache.stats()['l2Errors'] == 2
+
+
+def test_sqlite_purge_trims_to_max_rows(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / 'cache.db'), namespace='t', max_rows=3)
+    for i in range(5):
+        backend.set(i, i, ttl=100 + i)
+    backend.set('gone', 1, ttl=0.01)
+    time.sleep(0.05)
+    assert backend.purge() == 3
+    assert sorted(backend.keys()) == [2, 3, 4]
+
+
+def _write_from_child(path):
+    SqliteCacheBackend(path, namespace='seasons').set(('tt0000003', 1), ['from child'], ttl=60)
+
+
+def test_sqlite_backend_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    backend = SqliteCacheBackend(path, namespace='seasons')
+    proc = multiprocessing.get_context('spawn').Process(target=_write_from_child, args=(path,))
+    proc.start()
+    proc.join(30)
+    assert proc.exitcode == 0
+    assert backend.get(('tt0000003', 1))[0] == ['from child']
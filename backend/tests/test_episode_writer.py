@@ -0,0 +1,111 @@
+from sqlalchemy import event, text
+
+import database
+import services
+from database import Episode, SeasonHash, Show
+from shows import show_enrich
+from shows.show_writer import EpisodeWriter
+
+
+def _show(db, seasons=2):
+    show = Show(imdb_id='tt0000001', title='Show', total_seasons=seasons)
+    db.add(show)
+    db.commit()
+    return show
+
+
+def test_upsert_inserts_then_updates_slot(db):
+    show = _show(db)
+    writer = EpisodeWriter(show.id)
+    writer.add(Episode(season=1, episode=1, title='Pilot', rating=None, missing=True))
+    writer.add(Episode(season=1, episode=2, title='Two', rating=7.0))
+    assert writer.write(db) == 2 and len(writer) == 0
+    db.commit()
+    first_id = db.query(Episode).filter_by(season=1, episode=1).one().id
+
+    writer.add(Episode(season=1, episode=1, title='Pilot', rating=8.2, missing=False))
+    writer.write(db)
+    db.commit()
+    ep = db.query(Episode).filter_by(season=1, episode=1).one()
+    assert (ep.id, ep.rating, ep.missing, ep.show_id) == (first_id, 8.2, False, show.id)
+    assert db.query(Episode).count() == 2
+
+
+def test_later_add_replaces_same_slot(db):
+    show = _show(db)
+    writer = EpisodeWriter(show.id)
+    writer.add(Episode(season=1, episode=1, title='Old'))
+    writer.add(Episode(season=1, episode=1, title='New'))
+    assert writer.write(db) == 1
+    db.commit()
+    assert [e.title for e in db.query(Episode)] == ['New']
+
+
+def test_write_flushes_pending_orm_changes(db):
+    show = _show(db)
+    db.add(Episode(show_id=show.id, season=1, episode=1, title='Pilot', rating=7.0))
+    db.commit()
+    db.query(Episode).one().rating = 9.0
+    writer = EpisodeWriter(show.id)
+    writer.add(Episode(season=1, episode=2, title='Two'))
+    writer.write(db)
+    db.commit()
+    assert db.query(Episode).filter_by(episode=1).one().rating == 9.0
+
+
+def test_ensure_indices_removes_duplicate_slots(db, caplog):
+    show = _show(db)
+    rows = [
+        # S1E1: an old placeholder and a newer rated row -> the rated one stays
+        (1, 'Placeholder', None, '2024-01-01 00:00:00'),
+        (1, 'Rated', 8.1, '2023-01-01 00:00:00'),
+        # S1E2: both rated -> the most recently checked stays
+        (2, 'Older', 7.0, '2023-01-01 00:00:00'),
+        (2, 'Newer', 7.2, '2024-06-01 00:00:00'),
+        (2, 'Unchecked', 7.1, None),
+    ]
+    with database.engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_episode_show_season_ep"))
+        for ep, title, rating, checked in rows:
+            conn.execute(text("INSERT INTO episodes (show_id, season, episode, title, rating, last_checked) "
+                              "VALUES (:s, 1, :e, :t, :r, :c)"),
+                         {'s': show.id, 'e': ep, 't': title, 'r': rating, 'c': checked})
+        conn.execute(text("UPDATE shows SET episode_count = 5"))
+    with caplog.at_level('WARNING', logger='database'):
+        database.ensure_indices()
+    assert 'Removed 3 duplicate episode rows' in caplog.text
+    db.expire_all()
+    assert [e.title for e in db.query(Episode).order_by(Episode.episode)] == ['Rated', 'Newer']
+    assert db.query(Show).one().episode_count == 2
+
+
+def test_enrich_writes_show_in_one_commit(db, monkeypatch):
+    show = _show(db)
+    db.add(Episode(show_id=show.id, season=1, episode=1, title='Pilot', rating=None, missing=True))
+    db.add(Episode(show_id=show.id, season=2, episode=1, title='Back', rating=8.0, votes=10))
+    db.commit()
+    version = show.data_version
+
+    pages = {
+        1: [{'episode': 1, 'title': 'Pilot', 'rating': 7.9, 'votes': 100},
+            {'episode': 2, 'title': 'Unaired', 'rating': None, 'votes': None}],
+        2: [{'episode': 1, 'title': 'Back', 'rating': 8.0, 'votes': 10}],
+    }
+    monkeypatch.setattr(services, 'parse_imdb_season', lambda imdb_id, season: pages[season])
+    published = []
+    monkeypatch.setattr(show_enrich, 'publish_season_delta',
+                        lambda imdb_id, season, eps, source: published.append((season, len(eps))))
+    commits = []
+    listener = lambda conn: commits.append(1)
+    event.listen(database.engine, 'commit', listener)
+    try:
+        show_enrich._imdb_enrich_show(show.id, 'tt0000001', 2)
+    finally:
+        event.remove(database.engine, 'commit', listener)
+
+    assert len(commits) == 1 and published == [(1, 2)]
+    db.expire_all()
+    eps = db.query(Episode).filter_by(season=1).order_by(Episode.episode).all()
+    assert [(e.episode, e.rating, e.missing, e.absent) for e in eps] == [(1, 7.9, False, None), (2, None, True, True)]
+    assert db.query(Show).one().data_version == version + 1
+    assert db.query(SeasonHash).filter_by(show_id=show.id, season=1).one().signature
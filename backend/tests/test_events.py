@@ -0,0 +1,127 @@
+import json
+import threading
+
+from stub_server import omdb_show_handler
+
+import services
+from events import ShowEventBus, show_events, format_sse
+from shows import fast_fetch_and_store_show
+from shows.show_events import stream_show_events
+from database import Show, Episode
+from jobs import job_queue, PRIORITY_INTERACTIVE
+
+
+def _drain(q):
+    out = []
+    while not q.empty():
+        out.append(q.get_nowait())
+    return out
+
+
+def _ingest(db, stub_omdb, monkeypatch, imdb_id, seasons=2):
+    monkeypatch.setattr('shows.show_ingest.job_queue.submit', lambda *args, **kwargs: None)
+    stub_omdb(omdb_show_handler(seasons, eps_per_season=2))
+    fast_fetch_and_store_show(imdb_id)
+    return db.query(Show).filter_by(imdb_id=imdb_id).one()
+
+
+def test_bus_fans_out_and_drops_for_full_subscribers():
+    bus = ShowEventBus(queue_size=1)
+    a, b = bus.subscribe('tt1'), bus.subscribe('tt1')
+    assert bus.publish('tt1', {'type': 'x'}) == 2
+    assert bus.publish('tt1', {'type': 'y'}) == 0  # both full, publisher not blocked
+    bus.unsubscribe('tt1', a)
+    bus.unsubscribe('tt1', b)
+    bus.unsubscribe('tt1', b)
+    assert not bus.has_subscribers('tt1')
+    assert bus.publish('tt1', {'type': 'z'}) == 0
+
+
+def test_format_sse_names_event():
+    assert format_sse({'type': 'complete', 'n': 1}) == 'event: complete\ndata: {"type":"complete","n":1}\n\n'
+
+
+def test_stream_show_events_forwards_published_events(db):
+    gen = stream_show_events('tt0000061', keepalive=0.05, max_seconds=2)
+    first = next(gen)
+    assert first.startswith('event: status\n')
+    threading.Timer(0.1, show_events.publish, args=('tt0000061', {'type': 'complete'})).start()
+    chunks = []
+    for chunk in gen:
+        chunks.append(chunk)
+        if chunk.startswith('event: complete'):
+            break
+    assert ': keepalive\n\n' in chunks
+    gen.close()
+    assert not show_events.has_subscribers('tt0000061')
+
+
+
+def test_stream_polls_for_jobs_run_by_other_processes(db, stub_omdb, monkeypatch):
+    show = _ingest(db, stub_omdb, monkeypatch, 'tt0000064')
+    running = {'enrich_show'}
+    monkeypatch.setattr(job_queue, 'active_kinds', lambda imdb_id: set(running))
+    gen = stream_show_events('tt0000064', keepalive=5, max_seconds=5, poll_seconds=0.05)
+    assert json.loads(next(gen).split('data: ')[1])['enrichmentInProgress'] is True
+
+    # Another worker process enriches the show: nothing reaches this process's bus
+    ep = db.query(Episode).filter_by(show_id=show.id, season=2, episode=1).one()
+    ep.rating = 9.9
+    show.data_version += 1
+    db.commit()
+    running.clear()
+
+    events = []
+    for chunk in gen:
+        events.append(json.loads(chunk.split('data: ')[1]))
+        if events[-1]['type'] == 'complete':
+            break
+    gen.close()
+    assert [(e['type'], e.get('season')) for e in events] == [('season', 1), ('season', 2), ('complete', None)]
+    assert events[1]['episodes'][0]['rating'] == 9.9 and events[1]['source'] == 'poll'
+    assert events[2]['source'] == 'poll' and events[2]['etag']
+
+def test_enrichment_publishes_season_deltas_and_completion(db, stub_omdb, monkeypatch):
+    show = _ingest(db, stub_omdb, monkeypatch, 'tt0000062')
+    def fake_parse(imdb_id, season):
+        return [
+            {'season': season, 'episode': 1, 'title': 'S1', 'rating': 9.1, 'votes': 500, 'air_date': None, 'imdb_episode_id': None},
+            {'season': season, 'episode': 2, 'title': 'S2', 'rating': 7.5, 'votes': None, 'air_date': None, 'imdb_episode_id': None},
+            {'season': season, 'episode': 3, 'title': 'New', 'rating': None, 'votes': None, 'air_date': None, 'imdb_episode_id': 'tt7777777'},
+        ]
+    monkeypatch.setattr(services, 'parse_imdb_season', fake_parse)
+    monkeypatch.delattr(job_queue, 'submit')  # undo _ingest's stub: run through the real queue
+    q = show_events.subscribe('tt0000062')
+    try:
+        payload = {'show_db_id': show.id, 'imdb_id': 'tt0000062', 'total_seasons': 2}
+        job_queue.submit('enrich_show', 'tt0000062', payload, priority=PRIORITY_INTERACTIVE).result(10)
+        events = _drain(q)
+    finally:
+        show_events.unsubscribe('tt0000062', q)
+    seasons = [e for e in events if e['type'] == 'season']
+    assert [e['season'] for e in seasons] == [1, 2]
+    # episode 1 changed rating/votes, episode 2 unchanged, episode 3 is a new placeholder
+    assert [(ep['episode'], ep['rating'], ep['absent']) for ep in seasons[0]['episodes']] == [(1, 9.1, False), (3, None, True)]
+    assert events[-1]['type'] == 'complete' and events[-1]['source'] == 'enrich'
+    # Published once the job row is done, so partialData only reflects the absent placeholders
+    assert events[-1]['partialData'] is True and events[-1]['absentEpisodesCount'] == 2
+    assert not job_queue.is_active('enrich_show', 'tt0000062')
+    assert 'episodes' not in events[-1]
+
+
+def test_missing_refresh_publishes_updates(db, stub_omdb, monkeypatch):
+    show = _ingest(db, stub_omdb, monkeypatch, 'tt0000063', seasons=1)
+    ep = db.query(Episode).filter_by(show_id=show.id, episode=2).one()
+    ep.rating = None
+    db.commit()
+    monkeypatch.delattr(job_queue, 'submit')
+    q = show_events.subscribe('tt0000063')
+    try:
+        future = job_queue.submit('missing_refresh', 'tt0000063', {'imdb_id': 'tt0000063'}, priority=PRIORITY_INTERACTIVE)
+        assert future.result(10) == {'updated': 1}
+        events = _drain(q)
+    finally:
+        show_events.unsubscribe('tt0000063', q)
+    assert [e['type'] for e in events] == ['season', 'complete']
+    assert events[0]['episodes'][0]['episode'] == 2 and events[0]['episodes'][0]['rating'] == 7.5
+    assert events[1]['missingRefreshInProgress'] is False
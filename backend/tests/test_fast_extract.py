@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+
+import pytest
+from bs4 import BeautifulSoup
+
+CURRENT_DIR = os.path.dirname(__file__)
+ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import services  # noqa: E402
+from imdb_helpers import (  # noqa: E402
+    extract_ld_json,
+    extract_next_data,
+    parse_imdb_season_dom,
+    parse_imdb_season_json,
+)
+
+FIXTURES = os.path.join(CURRENT_DIR, 'fixtures')
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class DummyResp:
+    def __init__(self, text='', status=200):
+        self.text = text
+        self.status_code = status
+
+
+@pytest.fixture
+def no_soup(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('BeautifulSoup should not be built on the JSON path')
+    monkeypatch.setattr(services, 'make_soup', fail)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    services._imdb_season_cache.clear()
+    services._rating_cache.clear()
+    services._trending_cache.clear()
+    yield
+    services._imdb_season_cache.clear()
+    services._rating_cache.clear()
+    services._trending_cache.clear()
+
+
+def test_extract_next_data_variants():
+    assert extract_next_data('<script id="__NEXT_DATA__" type="application/json">{"a": 1}</script>') == {'a': 1}
+    assert extract_next_data("<SCRIPT type='application/json' id='__NEXT_DATA__'>\n{\"a\": 2}\n</SCRIPT >") == {'a': 2}
+    assert extract_next_data('<script id="__NEXT_DATA__">{broken</script>') is None
+    assert extract_next_data('<script id="__NEXT_DATA__">{"a": 1}') is None   # truncated page
+    assert extract_next_data('<html></html>') is None
+    assert extract_next_data(None) is None
+
+
+def test_extract_ld_json_skips_bad_blocks():
+    html = ('<script type="application/ld+json">{"x": 1}</script>'
+            '<script type="application/ld+json">not json</script>'
+            '<script type="text/javascript">{"y": 2}</script>'
+            '<script type="application/ld+json">[{"z": 3}]</script>')
+    assert extract_ld_json(html) == [{'x': 1}, [{'z': 3}]]
+
+
+def test_season_json_matches_soup(no_soup):
+    html = load('imdb_season.html')
+    fast = []
+    assert parse_imdb_season_json(extract_next_data(html), 'tt0903747', 2, fast)
+
+    # Same payload read through a full DOM, as before
+    soup = BeautifulSoup(html, 'html.parser')
+    via_dom = []
+    parse_imdb_season_json(json.loads(soup.find('script', id='__NEXT_DATA__').string), 'tt0903747', 2, via_dom)
+    assert fast == via_dom and len(fast) == 22
+
+    # The DOM fallback reads the same episodes from the markup
+    dom_items = []
+    parse_imdb_season_dom(soup, 2, dom_items)
+    assert [(e['episode'], e['rating']) for e in dom_items] == [(e['episode'], e['rating']) for e in fast]
+
+
+def test_parse_imdb_season_skips_dom(monkeypatch, no_soup):
+    html = load('imdb_season.html')
+    monkeypatch.setattr(services, 'throttled_imdb_get', lambda url, timeout=12: DummyResp(html))
+    eps = services.parse_imdb_season('tt0903747', 2)
+    assert [e['episode'] for e in eps] == list(range(1, 23))
+    assert all(e['votes'] and e['air_date'] for e in eps)
+
+
+def test_trending_from_raw_html(monkeypatch, no_soup):
+    html = load('imdb_chart.html')
+    monkeypatch.setattr(services, 'throttled_imdb_get', lambda url, timeout=15: DummyResp(html))
+    shows = services._fetch_trending_shows()
+    assert len(shows) == 100
+    assert shows[0]['imdbID'] == 'tt1000000' and shows[0]['title'] == 'Chart Show 1'
+
+
+def test_rating_from_ld_json_skips_dom(monkeypatch, no_soup):
+    html = load('imdb_title.html')
+    monkeypatch.setattr(services.http_clients, 'get', lambda url, headers=None, timeout=10: DummyResp(html))
+    assert services.fetch_rating_from_imdb('tt0903747') == '9.5'
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from sqlalchemy import event
+
+import featured
+from database import engine, Show
+from featured import FeaturedCache, build_featured, prefetch_missing_featured
+from featured_shows import FEATURED_SHOW_IDS
+
+
+def _store_first(db, n, poster='http://poster'):
+    for info in FEATURED_SHOW_IDS[:n]:
+        db.add(Show(imdb_id=info['imdbID'], title=info['title'] + ' (db)', total_seasons=1,
+                    poster=poster, imdb_rating=8.0))
+    db.commit()
+
+
+def test_build_uses_a_single_query(db):
+    _store_first(db, 3)
+    statements = []
+    test_thread = threading.get_ident()
+    def before(conn, cursor, statement, params, context, executemany):
+        if threading.get_ident() == test_thread:  # ignore background job polling
+            statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', before)
+    try:
+        shows = build_featured()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+    assert len(statements) == 1 and ' IN (' in statements[0]
+    assert len(shows) == len(FEATURED_SHOW_IDS)
+    # Shows with DB data (posters) come first
+    assert {s['title'] for s in shows[:3]} == {info['title'] + ' (db)' for info in FEATURED_SHOW_IDS[:3]}
+    assert all(s['poster'] is None for s in shows[3:])
+
+
+def test_requests_never_rebuild_a_warm_cache(db, monkeypatch):
+    cache = FeaturedCache(ttl=0.2, refresh_margin=0.1, dirty_delay=0.05)
+    cache.warm()
+    monkeypatch.setattr(featured, 'build_featured', lambda: (_ for _ in ()).throw(AssertionError('inline build')))
+    assert len(cache.get()) == len(FEATURED_SHOW_IDS)
+
+
+def test_background_refresh_runs_before_expiry(db, monkeypatch):
+    cache = FeaturedCache(ttl=0.4, refresh_margin=0.2, dirty_delay=0.05)
+    cache.warm()
+    cache.start()
+    try:
+        time.sleep(0.35)  # past ttl - margin, before ttl
+        assert cache.builds >= 2
+        _store_first(db, 1)
+        cache.mark_dirty()
+        time.sleep(0.15)
+        assert cache.get()[0]['title'] == FEATURED_SHOW_IDS[0]['title'] + ' (db)'
+    finally:
+        cache.stop()
+
+
+def test_prefetch_queues_missing_shows_and_posters(db, monkeypatch):
+    _store_first(db, 2)
+    db.query(Show).filter_by(imdb_id=FEATURED_SHOW_IDS[1]['imdbID']).update({'poster': None})
+    db.commit()
+    submitted = []
+    monkeypatch.setattr(featured.job_queue, 'submit', lambda kind, key, *a, **kw: submitted.append((kind, key)))
+    assert prefetch_missing_featured() == len(FEATURED_SHOW_IDS) - 1
+    assert ('poster_backfill', FEATURED_SHOW_IDS[1]['imdbID']) in submitted
+    assert ('ingest_show', FEATURED_SHOW_IDS[2]['imdbID']) in submitted
+    assert not any(key == FEATURED_SHOW_IDS[0]['imdbID'] for _, key in submitted)
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+import httpx
+import pytest
+
+import services
+from http_cache import HttpResponseCache, endpoint_class
+from stub_server import StubServer
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = HttpResponseCache(str(tmp_path / 'http'), ttls={'omdb_title': 60, 'omdb_season': 60,
+                                                            'imdb_season': 60, 'imdb_title': 60, 'chart': 60},
+                              enabled=True)
+    monkeypatch.setattr(services, 'http_cache', cache)
+    return cache
+
+
+def test_endpoint_classes():
+    assert endpoint_class('omdb', 'http://x/?apikey=k&i=tt1') == 'omdb_title'
+    assert endpoint_class('omdb', 'http://x/?apikey=k&t=Lost') == 'omdb_title'
+    assert endpoint_class('omdb', 'http://x/?apikey=k&i=tt1&season=2') == 'omdb_season'
+    assert endpoint_class('omdb', 'http://x/?apikey=k&s=lost&type=series&page=1') is None
+    assert endpoint_class('imdb', 'https://www.imdb.com/title/tt0944947/episodes/?season=1') == 'imdb_season'
+    assert endpoint_class('imdb', 'https://www.imdb.com/title/tt0944947/') == 'imdb_title'
+    assert endpoint_class('imdb', 'https://www.imdb.com/chart/tvmeter/') == 'chart'
+
+
+def test_fresh_entries_skip_upstream_and_survive_a_new_process(cache, stub_omdb):
+    srv = stub_omdb(lambda path, q, h: (200, json.dumps({'Response': 'True', 'Title': 'Cached'}),
+                                        {'Content-Type': 'application/json'}))
+    url = f'{services.OMDB_BASE_URL}?apikey=secret&i=tt0000301'
+    assert services.throttled_omdb_get(url).json()['Title'] == 'Cached'
+    # A fresh cache object over the same directory (e.g. after a deploy)
+    restarted = HttpResponseCache(cache.directory, ttls={'omdb_title': 60}, enabled=True)
+    resp = restarted.get('omdb', url, lambda extra: pytest.fail('went upstream'))
+    assert resp.status_code == 200 and resp.json()['Title'] == 'Cached'
+    assert len(srv.requests) == 1
+    # Bodies are compressed and the API key is not persisted
+    files = [os.path.join(r, n) for r, _, names in os.walk(cache.directory) for n in names]
+    assert len(files) == 1
+    assert b'secret' not in open(files[0], 'rb').read()
+
+
+def test_omdb_errors_are_not_cached(cache, stub_omdb):
+    srv = stub_omdb(lambda path, q, h: (200, '{"Response":"False","Error":"Request limit reached!"}', {}))
+    url = f'{services.OMDB_BASE_URL}?apikey=k&i=tt0000302'
+    services.throttled_omdb_get(url)
+    services.throttled_omdb_get(url)
+    assert len(srv.requests) == 2 and cache.stats()['stores'] == 0
+
+
+def test_stale_entries_revalidate_with_validators(cache, limiter, monkeypatch):
+    def handler(path, query, headers):
+        if headers.get('If-None-Match') == '"v1"':
+            return 304, b'', {'ETag': '"v1"'}
+        return 200, '<html>season page</html>', {'Content-Type': 'text/html', 'ETag': '"v1"',
+                                                  'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'}
+    with StubServer(handler) as srv:
+        url = f'{srv.url}/title/tt0000303/episodes/?season=1'
+        assert services.throttled_imdb_get(url).text == '<html>season page</html>'
+        cache._ttls['imdb_season'] = 0.05
+        time.sleep(0.1)
+        resp = services.throttled_imdb_get(url)
+        assert resp.status_code == 200 and resp.text == '<html>season page</html>'
+        assert srv.requests[1][2]['If-None-Match'] == '"v1"'
+        assert srv.requests[1][2]['If-Modified-Since'] == 'Wed, 01 Jan 2025 00:00:00 GMT'
+        # The 304 refreshed the entry: fresh again
+        cache._ttls['imdb_season'] = 60
+        services.throttled_imdb_get(url)
+        assert len(srv.requests) == 2
+    assert cache.stats()['revalidated'] == 1
+
+
+
+def test_trending_chart_is_disk_cached(cache, limiter, monkeypatch):
+    chart = '<html><a href="/title/tt0000304/">1. Chart Show</a></html>'
+    with StubServer(lambda path, q, h: (200, chart, {'Content-Type': 'text/html'})) as srv:
+        monkeypatch.setattr(services, 'IMDB_CHART_URL', f'{srv.url}/chart/tvmeter/')
+        for _ in range(2):
+            services._trending_cache.clear()
+            services._fetch_trending_shows()
+        assert len(srv.requests) == 1
+    assert cache.stats()['hits'] == 1
+    services._trending_cache.clear()
+
+def test_disabled_cache_passes_through(tmp_path):
+    cache = HttpResponseCache(str(tmp_path), enabled=False)
+    calls = []
+    cache.get('omdb', 'http://x/?i=tt1', lambda extra: calls.append(extra) or 'resp')
+    cache.get('omdb', 'http://x/?i=tt1', lambda extra: calls.append(extra) or 'resp')
+    assert calls == [{}, {}] and not os.listdir(tmp_path)
+
+
+def test_prune_drops_oldest_entries(tmp_path):
+    cache = HttpResponseCache(str(tmp_path), ttls={'imdb_title': 60}, enabled=True)
+    urls = [f'https://www.imdb.com/title/tt000000{i}/' for i in range(3)]
+    for i, url in enumerate(urls):
+        cache.get('imdb', url, lambda extra: httpx.Response(200, content=b'x' * 100))
+        os.utime(cache._path(url), (1000 + i, 1000 + i))
+    cache._max_bytes = sum(os.path.getsize(cache._path(url)) for url in urls[1:])
+    assert cache.prune() == 1
+    assert not os.path.exists(cache._path(urls[0])) and os.path.exists(cache._path(urls[2]))
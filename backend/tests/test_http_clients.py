@@ -0,0 +1,56 @@
+import sys, os
+import pytest
+
+CURRENT_DIR = os.path.dirname(__file__)
+ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from services import HttpClientManager
+from stub_server import StubServer
+
+
+def _ok(path, query, headers):
+    return 200, '{"Response":"True"}', {'Content-Type': 'application/json'}
+
+
+def test_requests_reuse_keepalive_connection():
+    manager = HttpClientManager()
+    with StubServer(_ok) as srv:
+        for _ in range(5):
+            assert manager.get(f'{srv.url}/?i=tt0000001').status_code == 200
+        assert len(srv.requests) == 5
+        assert len(srv.connections) == 1
+    manager.close()
+
+
+def test_one_pool_per_host():
+    manager = HttpClientManager()
+    with StubServer(_ok) as a, StubServer(_ok) as b:
+        assert manager.client_for(f'{a.url}/x') is manager.client_for(f'{a.url}/y')
+        assert manager.client_for(f'{a.url}/x') is not manager.client_for(f'{b.url}/x')
+    manager.close()
+
+
+def test_closed_manager_refuses_requests_until_reopened():
+    manager = HttpClientManager()
+    with StubServer(_ok) as srv:
+        first = manager.client_for(srv.url)
+        manager.get(srv.url)
+        manager.close()
+        assert first.is_closed
+        with pytest.raises(RuntimeError):
+            manager.get(srv.url)
+        manager.open()
+        assert manager.get(srv.url).status_code == 200
+        assert manager.client_for(srv.url) is not first
+    manager.close()
+
+
+def test_http2_falls_back_without_h2(monkeypatch):
+    import services
+    monkeypatch.setattr(services.importlib.util, 'find_spec', lambda name: None)
+    manager = HttpClientManager(http2=True)
+    assert manager._http2 is False
@@ -0,0 +1,130 @@
+import json
+import time
+
+import httpx
+import pytest
+
+from stub_server import omdb_show_handler
+
+import services
+from rate_limit import HostRateLimiter
+from database import Show, Episode, SeasonHash
+from shows import fetch_and_store_show, fast_fetch_and_store_show
+
+
+def test_iter_seasons_yields_every_season(stub_omdb):
+    stub_omdb(omdb_show_handler(6))
+    got = dict(services.iter_seasons_from_omdb('k', 'tt0000001', range(1, 7)))
+    assert sorted(got) == [1, 2, 3, 4, 5, 6]
+    assert all(d and len(d['Episodes']) == 3 for d in got.values())
+
+
+def test_iter_seasons_reports_missing_season_as_none(stub_omdb):
+    def handler(path, query, headers):
+        if query.get('season') == '2':
+            return 200, '{"Response":"False","Error":"Series or season not found!"}', {}
+        return omdb_show_handler(3)(path, query, headers)
+    stub_omdb(handler)
+    got = dict(services.iter_seasons_from_omdb('k', 'tt0000001', range(1, 4)))
+    assert got[2] is None and got[1] and got[3]
+
+
+def test_iter_seasons_raises_on_network_error(stub_omdb, monkeypatch):
+    stub_omdb(omdb_show_handler(3))
+    real = services.fetch_season_from_omdb
+    def flaky(api_key, imdb_id, season):
+        if season == 2:
+            raise httpx.ConnectError('boom')
+        return real(api_key, imdb_id, season)
+    monkeypatch.setattr(services, 'fetch_season_from_omdb', flaky)
+    with pytest.raises(httpx.ConnectError):
+        list(services.iter_seasons_from_omdb('k', 'tt0000001', range(1, 4)))
+
+
+def test_fetch_and_store_show_fetches_seasons_concurrently(db, stub_omdb, monkeypatch):
+    monkeypatch.delenv('FAST_INGEST', raising=False)
+    srv = stub_omdb(omdb_show_handler(8), delay=0.1)
+    resp = fetch_and_store_show('tt0000042')
+    assert resp.status_code == 200
+    assert srv.max_in_flight > 1
+    show = db.query(Show).filter_by(imdb_id='tt0000042').one()
+    assert db.query(Episode).filter_by(show_id=show.id).count() == 24
+    assert db.query(SeasonHash).filter_by(show_id=show.id).count() == 8
+
+
+def test_season_network_error_stores_nothing(db, stub_omdb, monkeypatch):
+    monkeypatch.delenv('FAST_INGEST', raising=False)
+    stub_omdb(omdb_show_handler(4))
+    real = services.fetch_season_from_omdb
+    def flaky(api_key, imdb_id, season):
+        if season == 3:
+            raise httpx.ReadTimeout('slow')
+        return real(api_key, imdb_id, season)
+    monkeypatch.setattr(services, 'fetch_season_from_omdb', flaky)
+    resp = fetch_and_store_show('tt0000044')
+    assert resp.status_code == 502
+    assert db.query(Show).filter_by(imdb_id='tt0000044').first() is None
+    assert db.query(Episode).count() == 0
+    assert db.query(SeasonHash).count() == 0
+
+
+
+@pytest.mark.parametrize('ingest', [fetch_and_store_show, fast_fetch_and_store_show])
+def test_no_write_lock_held_during_season_fetches(db, stub_omdb, monkeypatch, ingest):
+    import sqlite3
+    import database
+    monkeypatch.delenv('FAST_INGEST', raising=False)
+    monkeypatch.setattr('shows.show_ingest.job_queue.submit', lambda *args, **kwargs: None)
+    stub_omdb(omdb_show_handler(3))
+    real = services.fetch_season_from_omdb
+    locked = []
+    def probe(api_key, imdb_id, season):
+        # Another writer must be able to take the lock while upstream requests are in flight
+        conn = sqlite3.connect(database.engine.url.database, timeout=0)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.rollback()
+        except sqlite3.OperationalError:
+            locked.append(season)
+        finally:
+            conn.close()
+        return real(api_key, imdb_id, season)
+    monkeypatch.setattr(services, 'fetch_season_from_omdb', probe)
+    assert ingest('tt0000045').status_code == 200
+    assert locked == []
+    assert db.query(Episode).count() == 9
+
+def test_fast_ingest_writes_all_seasons(db, stub_omdb, monkeypatch):
+    monkeypatch.setattr('shows.show_ingest.job_queue.submit', lambda *args, **kwargs: None)
+    stub_omdb(omdb_show_handler(5))
+    resp = fast_fetch_and_store_show('tt0000043')
+    assert resp.status_code == 200
+    payload = json.loads(resp.body)
+    assert len(payload['episodes']) == 15
+    assert [(e['season'], e['episode']) for e in payload['episodes'][:4]] == [(1, 1), (1, 2), (1, 3), (2, 1)]
+
+
+def test_concurrent_rating_scrapes_stay_within_imdb_budget(monkeypatch):
+    limiter = HostRateLimiter()
+    limiter.configure('imdb', rate=10, burst=2)
+    monkeypatch.setattr(services, 'rate_limiter', limiter)
+    stamps = []
+
+    class R:
+        status_code = 200
+        text = '<html><head><meta itemprop="ratingValue" content="6.9"></head></html>'
+
+    def fake_get(url, timeout=None, headers=None):
+        stamps.append(time.monotonic())
+        return R()
+    monkeypatch.setattr(services.http_clients, 'get', fake_get)
+    ids = [f'tt{1000000 + i}' for i in range(12)]
+    ratings = services.fetch_ratings_from_imdb(ids, max_workers=6)
+    assert set(ratings.values()) == {'6.9'}
+    stamps.sort()
+    # 2 burst tokens, then 10 more refilled at 10/s: the 12 scrapes need >= ~1s
+    # however many workers run them
+    assert stamps[-1] - stamps[0] >= 0.95
+    for i in range(2, len(stamps)):
+        # any window of k+2 requests spans at least k/rate seconds
+        assert stamps[i] - stamps[0] >= (i - 1) / 10 - 0.02
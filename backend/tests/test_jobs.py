@@ -0,0 +1,226 @@
+import threading
+import time
+import types
+
+import pytest
+
+from jobs import JobQueue, DbJobStore, QueueFull, PRIORITY_INTERACTIVE, PRIORITY_MAINTENANCE
+from database import engine, Show
+from shows.show_helpers import _build_show_payload
+
+
+def _blocking_queue(workers=1, max_size=100):
+    """Queue whose first job holds the only worker until `gate` is set."""
+    q = JobQueue(workers=workers, max_size=max_size)
+    gate = threading.Event()
+    order = []
+    q.register('block', lambda: gate.wait(5))
+    q.register('record', lambda name: order.append(name) or name)
+    return q, gate, order
+
+
+def test_interactive_jobs_run_before_maintenance():
+    q, gate, order = _blocking_queue()
+    q.submit('block', 'b')
+    time.sleep(0.05)
+    futures = [
+        q.submit('record', 'm1', {'name': 'm1'}, priority=PRIORITY_MAINTENANCE),
+        q.submit('record', 'm2', {'name': 'm2'}, priority=PRIORITY_MAINTENANCE),
+        q.submit('record', 'u1', {'name': 'u1'}, priority=PRIORITY_INTERACTIVE),
+    ]
+    gate.set()
+    assert [f.result(2) for f in futures] == ['m1', 'm2', 'u1']
+    assert order == ['u1', 'm1', 'm2']
+    q.stop()
+
+
+def test_duplicate_key_shares_future_and_is_promoted():
+    q, gate, order = _blocking_queue()
+    q.submit('block', 'b')
+    time.sleep(0.05)
+    first = q.submit('record', 'x', {'name': 'x'}, priority=PRIORITY_MAINTENANCE)
+    other = q.submit('record', 'y', {'name': 'y'}, priority=PRIORITY_MAINTENANCE)
+    again = q.submit('record', 'x', {'name': 'x'}, priority=PRIORITY_INTERACTIVE)
+    assert again is first
+    assert q.is_active('record', 'x')
+    gate.set()
+    first.result(2)
+    other.result(2)
+    assert order == ['x', 'y']
+    m = q.metrics()
+    assert m['deduplicated'] == 1 and m['submitted'] == 3
+    q.stop()
+
+
+def test_queue_rejects_when_full():
+    q, gate, _ = _blocking_queue(max_size=2)
+    q.submit('block', 'b')
+    time.sleep(0.05)
+    q.submit('record', 'a', {'name': 'a'})
+    q.submit('record', 'b', {'name': 'b'})
+    with pytest.raises(QueueFull):
+        q.submit('record', 'c', {'name': 'c'})
+    assert q.metrics()['depth'] == 2 and q.metrics()['rejected'] == 1
+    gate.set()
+    q.stop()
+
+
+
+def test_maintenance_cannot_fill_interactive_slots():
+    q, gate, _ = _blocking_queue(max_size=10)
+    q.submit('block', 'b')
+    time.sleep(0.05)
+    for i in range(8):
+        q.submit('record', f'm{i}', {'name': f'm{i}'}, priority=PRIORITY_MAINTENANCE)
+    with pytest.raises(QueueFull):
+        q.submit('record', 'm8', {'name': 'm8'}, priority=PRIORITY_MAINTENANCE)
+    # The two reserved slots still take user-triggered work
+    futures = [q.submit('record', f'u{i}', {'name': f'u{i}'}, priority=PRIORITY_INTERACTIVE) for i in range(2)]
+    with pytest.raises(QueueFull):
+        q.submit('record', 'u2', {'name': 'u2'}, priority=PRIORITY_INTERACTIVE)
+    assert q.metrics()['reserved'] == 2
+    gate.set()
+    assert [f.result(2) for f in futures] == ['u0', 'u1']
+    q.stop()
+
+def test_worker_pool_is_bounded():
+    q = JobQueue(workers=2)
+    lock = threading.Lock()
+    state = {'now': 0, 'peak': 0}
+
+    def work():
+        with lock:
+            state['now'] += 1
+            state['peak'] = max(state['peak'], state['now'])
+        time.sleep(0.05)
+        with lock:
+            state['now'] -= 1
+    q.register('work', work)
+    futures = [q.submit('work', str(i)) for i in range(8)]
+    for f in futures:
+        f.result(5)
+    assert state['peak'] == 2
+    m = q.metrics()
+    assert m['completed'] == 8 and m['depth'] == 0 and m['running'] == 0
+    assert m['wait']['max'] > 0
+    q.stop()
+
+
+def test_failures_propagate_and_are_counted():
+    q = JobQueue(workers=1, max_attempts=1)
+    def boom():
+        raise ValueError('nope')
+    q.register('boom', boom)
+    with pytest.raises(ValueError):
+        q.submit('boom', 'k').result(2)
+    assert q.metrics()['failed'] == 1
+    assert not q.is_active('boom', 'k')
+    q.stop()
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(KeyError):
+        JobQueue().submit('nope', 'k')
+
+
+def test_failed_jobs_are_retried_with_backoff():
+    q = JobQueue(workers=1, max_attempts=3, retry_base=0.05)
+    calls = []
+    def flaky():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise ValueError('transient')
+        return 'ok'
+    q.register('flaky', flaky)
+    assert q.submit('flaky', 'k').result(5) == 'ok'
+    # Exponential backoff: at least 0.05s, then 0.1s (plus polling latency)
+    assert calls[1] - calls[0] >= 0.05 and calls[2] - calls[1] >= 0.1
+    m = q.metrics()
+    assert m['retried'] == 2 and m['completed'] == 1 and m['failed'] == 0
+    q.stop()
+
+
+# ============================================================================
+# Durable store
+# ============================================================================
+def test_db_store_dedups_active_jobs_and_promotes(db):
+    store = DbJobStore(engine)
+    job_id, created = store.enqueue('record', 'x', {'name': 'x'}, PRIORITY_MAINTENANCE, 3)
+    assert created
+    assert store.enqueue('record', 'x', {'name': 'x'}, PRIORITY_INTERACTIVE, 3) == (job_id, False)
+    assert store.counts()['depthByPriority'] == {PRIORITY_INTERACTIVE: 1}
+    job = store.claim('w1', lease_seconds=30)
+    assert (job.id, job.payload, job.attempts) == (job_id, {'name': 'x'}, 1)
+    assert store.claim('w2', lease_seconds=30) is None
+    store.complete(job_id, 'w1', 'x')
+    assert store.status(job_id) == ('done', 'x', None)
+    # Finished jobs no longer block a new one for the same key
+    assert store.enqueue('record', 'x', {'name': 'x'}, PRIORITY_MAINTENANCE, 3)[1]
+
+
+def test_db_store_reclaims_expired_leases(db):
+    store = DbJobStore(engine)
+    job_id, _ = store.enqueue('record', 'x', {}, PRIORITY_MAINTENANCE, 3)
+    assert store.claim('crashed', lease_seconds=0.05).id == job_id
+    time.sleep(0.1)
+    job = store.claim('w2', lease_seconds=30)
+    assert job.id == job_id and job.attempts == 2
+    store.complete(job_id, 'crashed', 'late')  # the old owner lost its lease: ignored
+    assert store.status(job_id)[0] == 'running'
+    store.complete(job_id, 'w2', 'ok')
+    assert store.status(job_id) == ('done', 'ok', None)
+
+
+def test_db_queues_share_jobs_across_processes(db):
+    """Two queues on one table stand in for two uvicorn workers."""
+    a = JobQueue(store=DbJobStore(engine), workers=1, poll_interval=0.05)
+    b = JobQueue(store=DbJobStore(engine), workers=1, poll_interval=0.05)
+    ran = []
+    gate = threading.Event()
+    for q in (a, b):
+        q.register('record', lambda name, q=q: gate.wait(5) and ran.append((q.owner, name)) or name)
+    fa = a.submit('record', 'x', {'name': 'x'})
+    fb = b.submit('record', 'x', {'name': 'x'})
+    gate.set()
+    assert fa.result(5) == 'x' and fb.result(5) == 'x'
+    assert len(ran) == 1
+    a.stop()
+    b.stop()
+
+
+def test_partial_data_reflects_job_table(db):
+    store = DbJobStore(engine)
+    show = Show(imdb_id='tt0000071', title='T', total_seasons=1)
+    db.add(show)
+    db.commit()
+    assert _build_show_payload(show, [], store.active_kinds('tt0000071'))[0]['partialData'] is False
+    store.enqueue('missing_refresh', 'tt0000071', {'imdb_id': 'tt0000071'}, PRIORITY_INTERACTIVE, 3)
+    payload, _ = _build_show_payload(show, [], store.active_kinds('tt0000071'))
+    assert payload['partialData'] is True and payload['missingRefreshInProgress'] is True
+
+
+def test_maintenance_cycles_resume_after_deferred_shows(db, monkeypatch):
+    import worker
+    ids = []
+    for i in range(5):
+        show = Show(imdb_id=f'tt00007{i:02d}', title=f'Show {i}', total_seasons=1)
+        db.add(show)
+        db.flush()
+        ids.append(show.id)
+    db.commit()
+    cycles = []
+    def submit(kind, key, payload, priority):
+        if len(cycles[-1]) == 3:
+            raise QueueFull('full')
+        cycles[-1].append(payload['show_id'])
+    def sleep(seconds):
+        if len(cycles) == 2:
+            raise KeyboardInterrupt
+        cycles.append([])
+    cycles.append([])
+    monkeypatch.setattr(worker.job_queue, 'submit', submit)
+    # Only the worker's clock: other threads keep the real time.sleep
+    monkeypatch.setattr(worker, 'time', types.SimpleNamespace(sleep=sleep))
+    with pytest.raises(KeyboardInterrupt):
+        worker.maintenance_worker()
+    assert cycles == [ids[:3], ids[3:] + ids[:1]]
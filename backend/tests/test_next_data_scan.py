@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+CURRENT_DIR = os.path.dirname(__file__)
+ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import imdb_helpers  # noqa: E402
+from imdb_helpers import parse_imdb_season_json  # noqa: E402
+
+
+def episode(season, num, rating=8.0):
+    return {'seasonNumber': season, 'episodeNumber': num, 'titleText': {'text': f'E{num}'},
+            'ratingsSummary': {'aggregateRating': rating, 'voteCount': 100 + num}, 'id': f'tt{season:03d}{num:04d}'}
+
+
+def page(body, page_name='/title/[tconst]/episodes', build='b1'):
+    # Episode list somewhere no fixed path reaches, next to decoy lists
+    return {'page': page_name, 'buildId': build, 'props': {'pageProps': {'other': body}}}
+
+
+@pytest.fixture(autouse=True)
+def fresh_paths():
+    imdb_helpers._learned_paths.clear()
+    yield
+    imdb_helpers._learned_paths.clear()
+
+
+def test_scan_picks_list_with_most_season_entries():
+    body = {
+        'related': [episode(1, n) for n in range(1, 4)],
+        'blocks': [{'x': 1}, {'sections': {'list': [episode(2, n) for n in range(1, 9)] + [episode(1, 99)]}}],
+    }
+    items = []
+    assert parse_imdb_season_json(page(body), 'tt1', 2, items)
+    assert [e['episode'] for e in items] == list(range(1, 9))
+    assert imdb_helpers._learned_paths[('/title/[tconst]/episodes', 'b1')] == (
+        'props', 'pageProps', 'other', 'blocks', 1, 'sections', 'list')
+
+
+def test_learned_path_skips_scan(monkeypatch):
+    body = {'deep': {'eps': [episode(3, n) for n in range(1, 6)]}}
+    assert parse_imdb_season_json(page(body), 'tt1', 3, [])
+
+    def fail(*args):
+        raise AssertionError('scan should not run for a learned layout')
+    monkeypatch.setattr(imdb_helpers, '_scan_episode_lists', fail)
+    items = []
+    assert parse_imdb_season_json(page({'deep': {'eps': [episode(4, n) for n in range(1, 3)]}}), 'tt2', 4, items)
+    assert [e['episode'] for e in items] == [1, 2]
+
+
+def test_learned_path_miss_falls_back_to_scan():
+    assert parse_imdb_season_json(page({'a': [episode(1, 1), episode(1, 2)]}), 'tt1', 1, [])
+    # Same layout, data moved: the learned path finds nothing and the scan takes over
+    items = []
+    assert parse_imdb_season_json(page({'b': {'c': [episode(1, 5)]}}), 'tt1', 1, items)
+    assert [e['episode'] for e in items] == [5]
+    assert imdb_helpers._learned_paths[('/title/[tconst]/episodes', 'b1')][-2:] == ('b', 'c')
+
+
+def test_scan_depth_is_bounded():
+    nested = [episode(1, 1)]
+    for _ in range(10):
+        nested = {'n': nested}
+    assert not parse_imdb_season_json(page(nested), 'tt1', 1, [])
+
+
+def test_learned_layouts_are_bounded(monkeypatch):
+    monkeypatch.setattr(imdb_helpers, 'MAX_LEARNED_LAYOUTS', 3)
+    for build in range(5):
+        assert parse_imdb_season_json(page({'x': [episode(1, 1)]}, build=str(build)), 'tt1', 1, [])
+    assert [layout[1] for layout in imdb_helpers._learned_paths] == ['2', '3', '4']
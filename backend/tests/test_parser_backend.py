@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pytest
+
+CURRENT_DIR = os.path.dirname(__file__)
+ROOT = os.path.abspath(os.path.join(CURRENT_DIR, '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import services  # noqa: E402
+from imdb_helpers import (  # noqa: E402
+    available_parsers,
+    make_soup,
+    parse_imdb_season_dom,
+    parse_imdb_season_heuristic,
+    resolve_parser,
+)
+
+FIXTURES = os.path.join(CURRENT_DIR, 'fixtures')
+FAST_PARSERS = [p for p in available_parsers() if p != 'html.parser']
+
+# Small pages in the shapes the DOM fallbacks were written against. Whole
+# documents, as upstream serves: lxml wraps bare fragments in <html><body>,
+# which changes how far the heuristic's parent walk can climb.
+PAGE_SEASON = '''<html><body><div data-testid="episodes-list">
+  <div data-testid="episodes-list-item"><span>S1.E1</span><a href="/title/tt0000101/">Pilot</a>
+    <div data-testid="ratingGroup--container"><span class="ipc-rating-star--rating">8.2</span><span class="voteCount">(1.3K)</span></div>
+    <span>Fri, Apr 3, 2020</span></div>
+  <div data-testid="episodes-list-item"><span>S1.E2</span><a href="/title/tt0000102/">Second &amp; Last</a>
+    <div data-testid="ratingGroup--container"><span class="ipc-rating-star--rating">7.9</span><span class="voteCount">(987)</span></div></div>
+</div></body></html>'''
+PAGE_LABELS = '''<html><body><ul><li><p>S3.E4 <b>Ep</b></p><a href="/title/tt0000304/"> Fourth </a>
+  <div class="ipl-rating-star"><span class="ipl-rating-star__rating">9.0</span><span class="ipl-rating-star__total-votes">(12,345)</span></div></li></ul></body></html>'''
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def extract_all(parser):
+    """Everything the DOM fallbacks read from the corpus, using one parser backend."""
+    out = {}
+    for name, html, season in (
+        ('season', load('imdb_season.html'), 2),
+        ('fragment', PAGE_SEASON, 1),
+        ('labels', PAGE_LABELS, 3),
+    ):
+        soup = make_soup(html, parser)
+        dom, heuristic = [], []
+        parse_imdb_season_dom(soup, season, dom)
+        parse_imdb_season_heuristic(soup, season, heuristic)
+        out[name] = (dom, heuristic)
+    out['chart'] = services._parse_trending_from_dom(make_soup(load('imdb_chart.html'), parser))
+    title = make_soup(load('imdb_title.html'), parser)
+    out['title'] = (services._extract_rating_from_meta(title, 'tt0903747'),
+                    services._extract_rating_from_span(title, 'tt0903747'))
+    return out
+
+
+def test_corpus_extracts_something():
+    out = extract_all('html.parser')
+    assert len(out['season'][0]) == 22 and len(out['season'][1]) == 22
+    assert [e['votes'] for e in out['fragment'][0]] == [1300, 987]
+    assert out['labels'][1][0]['title'] == 'Fourth' and out['labels'][1][0]['votes'] == 12345
+    assert len(out['chart']) == 100
+
+
+@pytest.mark.parametrize('parser', FAST_PARSERS)
+def test_fast_parser_matches_html_parser(parser):
+    assert extract_all(parser) == extract_all('html.parser')
+
+
+def test_resolve_parser_falls_back(monkeypatch):
+    assert resolve_parser('html.parser') == 'html.parser'
+    assert resolve_parser('auto') == available_parsers()[-1]
+    assert resolve_parser('no-such-parser') == 'html.parser'
+    monkeypatch.setattr('importlib.util.find_spec', lambda name, *a: None)
+    assert resolve_parser('lxml') == 'html.parser'
+    assert resolve_parser('auto') == 'html.parser'
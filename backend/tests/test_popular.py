@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+from sqlalchemy import event
+
+import app
+from database import engine, Show
+from popular import PopularRanking
+from shows.show_refresh import process_poster_backfill
+from stub_server import omdb_show_handler
+from view_counter import ViewCounter
+
+
+def test_record_moves_shows_within_the_top_list():
+    ranking = PopularRanking(size=3)
+    ranking.load({1: 5, 2: 4, 3: 3, 4: 1})
+    assert [i for i, _ in ranking.top()] == [1, 2, 3]
+    v = ranking.version
+    ranking.record(3, 3)            # 6 views: moves to the front
+    assert [i for i, _ in ranking.top()] == [3, 1, 2] and ranking.version > v
+    ranking.record(4, 4)            # 5 views: ties with 1, lower id wins
+    assert ranking.top() == [(3, 6), (1, 5), (4, 5)]
+    v = ranking.version
+    ranking.record(3)               # already first: nothing to re-render
+    assert ranking.version == v
+    ranking.record(9)               # new show, not enough views to enter
+    assert [i for i, _ in ranking.top()] == [3, 1, 4]
+
+
+@pytest.fixture
+def popular(db, monkeypatch):
+    ranking = PopularRanking(size=12)
+    counter = ViewCounter(engine)
+    submitted = []
+    monkeypatch.setattr(app, 'popular_ranking', ranking)
+    monkeypatch.setattr(app, 'view_counter', counter)
+    monkeypatch.setattr(app, '_popular_cache', {'version': None, 'data': None, 'timestamp': 0})
+    monkeypatch.setattr(app.job_queue, 'submit', lambda kind, key, *a, **kw: submitted.append((kind, key)))
+    shows = [Show(imdb_id=f'tt00002{i:02d}', title=f'S{i}', total_seasons=1, view_count=i,
+                  poster=None if i == 2 else 'http://poster') for i in range(4)]
+    db.add_all(shows)
+    db.commit()
+    return ranking, counter, submitted, shows
+
+
+def test_popular_answers_from_db_and_queues_missing_posters(popular):
+    ranking, counter, submitted, shows = popular
+    counter.incr(shows[1].id, 5)    # buffered, not yet flushed
+    statements = []
+    test_thread = threading.get_ident()
+    def before(conn, cursor, statement, params, context, executemany):
+        if threading.get_ident() == test_thread:  # ignore background job polling
+            statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', before)
+    try:
+        first = app.get_popular()
+        second = app.get_popular()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+    assert [s['imdbID'] for s in first] == ['tt0000201', 'tt0000203', 'tt0000202']
+    assert first[2]['poster'] is None
+    assert submitted == [('poster_backfill', 'tt0000202')]
+    assert second is first
+    assert not any('ORDER BY' in s for s in statements)
+
+
+def test_views_reorder_without_reload(popular):
+    ranking, counter, submitted, shows = popular
+    app.get_popular()
+    ranking.record(shows[2].id, 10)
+    assert app.get_popular()[0]['imdbID'] == 'tt0000202'
+
+
+def test_poster_backfill_job_stores_poster(db, stub_omdb):
+    stub_omdb(omdb_show_handler(1))
+    db.add(Show(imdb_id='tt0000210', title='No art', total_seasons=1))
+    db.commit()
+    assert process_poster_backfill('tt0000210') == {'poster': 'N/A'}
+    assert db.query(Show).filter_by(imdb_id='tt0000210').one().poster == 'N/A'
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+import ratings_index
+import services
+import worker
+from database import Episode, Show
+from ratings_index import RatingsIndex, build_index, tconst_key
+from shows.show_refresh import process_missing_refresh
+
+DATASETS = os.path.join(os.path.dirname(__file__), 'fixtures', 'datasets')
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    # Fixture dump plus an 8-digit id, which sorts before tt02... as text but after numerically
+    src = tmp_path / 'title.ratings.tsv'
+    with open(os.path.join(DATASETS, 'title.ratings.tsv')) as f:
+        lines = f.readlines()
+    lines.insert(1, 'tt10000001\t5.5\t77\n')
+    lines.append('tt0500001\t\\N\t0\n')
+    src.write_text(''.join(lines))
+    path = tmp_path / 'ratings.idx'
+    assert build_index(str(src), str(path)) == 10
+    return path
+
+
+@pytest.fixture
+def configured(monkeypatch, index_path):
+    holder = ratings_index._IndexHolder(str(index_path), check_seconds=0)
+    monkeypatch.setattr(ratings_index, 'ratings_index', holder)
+    return holder
+
+
+def no_upstream(*args, **kwargs):
+    raise AssertionError('upstream should not be called for indexed titles')
+
+
+def test_tconst_key():
+    assert tconst_key('tt0903747') == 903747
+    assert tconst_key('tt0903747-S1E2') is None and tconst_key('nm0000001') is None and tconst_key(None) is None
+
+
+def test_lookup(index_path):
+    index = RatingsIndex(str(index_path))
+    assert len(index) == 10
+    assert index.get('tt0100002') == (8.1, 12000)
+    assert index.get('tt10000001') == (5.5, 77)
+    assert index.get('tt0400001') == (7.0, 99999)
+    assert index.get('tt0100005') is None and index.get('tt0500001') is None and index.get('tt99999999') is None
+    assert index.get('tt0000000') is None
+    index.close()
+
+
+def test_rejects_other_files(tmp_path):
+    bogus = tmp_path / 'bogus.idx'
+    bogus.write_bytes(b'not an index at all')
+    with pytest.raises(ValueError):
+        RatingsIndex(str(bogus))
+
+
+def test_holder_reloads_rebuilt_file(tmp_path, configured, index_path):
+    assert ratings_index.lookup_rating('tt0100002') == (8.1, 12000)
+    src = tmp_path / 'newer.tsv'
+    src.write_text('tconst\taverageRating\tnumVotes\ntt0100002\t8.3\t15000\n')
+    build_index(str(src), str(index_path))
+    os.utime(index_path, (1, 1))   # mtime granularity: force a visible change
+    assert ratings_index.lookup_rating('tt0100002') == (8.3, 15000)
+    assert ratings_index.lookup_rating('tt0100003') is None
+    assert configured.stats()['titles'] == 1
+
+
+def test_unconfigured_index_is_a_miss(monkeypatch):
+    monkeypatch.setattr(ratings_index, 'ratings_index', ratings_index._IndexHolder(''))
+    assert ratings_index.lookup_rating('tt0100002') is None
+
+
+def test_fetch_rating_uses_index(monkeypatch, configured):
+    monkeypatch.setattr(services.http_clients, 'get', no_upstream)
+    assert services.fetch_rating_from_imdb('tt0100004') == '9.6'
+
+
+def _show_with_missing_episode(db):
+    show = Show(imdb_id='tt0100001', title='Alpha Show', total_seasons=1)
+    db.add(show)
+    db.flush()
+    db.add(Episode(show_id=show.id, season=1, episode=2, title='Second', rating=None, imdb_id='tt0100003',
+                   missing=True))
+    db.commit()
+    return show
+
+
+def test_missing_refresh_uses_index(db, monkeypatch, configured):
+    monkeypatch.setattr(services, 'fetch_season_from_omdb', no_upstream)
+    _show_with_missing_episode(db)
+    assert process_missing_refresh('tt0100001') == {'updated': 1}
+    ep = db.query(Episode).one()
+    assert (ep.rating, ep.votes, ep.missing) == (8.4, 11000, False)
+
+
+def test_maintenance_uses_index(db, monkeypatch, configured):
+    monkeypatch.setattr(services, 'fetch_season_from_omdb', no_upstream)
+    monkeypatch.setattr(services, 'throttled_omdb_get', no_upstream)
+    show = _show_with_missing_episode(db)
+    show.last_full_refresh = show.last_updated = worker.datetime.now(worker.UTC).replace(tzinfo=None)
+    db.commit()
+    version = show.data_version
+    worker.refresh_show_maintenance(show.id)
+    db.expire_all()
+    assert db.query(Episode).one().rating == 8.4
+    assert db.query(Show).one().data_version == version + 1
@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import services
+import utils
+from cache_backends import SqliteCacheBackend, TieredCache
+from revalidate import Revalidator
+from utils import TTLCache
+
+
+def _expire(monkeypatch, seconds):
+    now = time.monotonic() + seconds
+    monkeypatch.setattr(utils.time, 'monotonic', lambda: now)
+
+
+def test_stale_window(monkeypatch):
+    cache = TTLCache(10, max_stale=100)
+    cache.set('k', 'v')
+    assert cache.get_entry('k') == ('v', False)
+    _expire(monkeypatch, 50)
+    assert cache.get('k') is None               # plain reads never see stale data
+    assert cache.get_entry('k') == ('v', True)
+    _expire(monkeypatch, 200)                    # past the hard maximum staleness
+    assert cache.get_entry('k') is None and cache.keys() == []
+
+
+def test_stale_value_is_served_while_one_refresh_runs(monkeypatch):
+    cache = TTLCache(10, max_stale=100)
+    cache.set('k', 'old')
+    _expire(monkeypatch, 50)
+    revalidator = Revalidator()
+    gate = threading.Event()
+    calls = []
+    def refresh():
+        calls.append(1)
+        gate.wait(5)
+        monkeypatch.undo()   # back to real time so the new entry is fresh
+        cache.set('k', 'new')
+        return 'new'
+    with ThreadPoolExecutor(8) as pool:
+        results = [f.result(1) for f in [pool.submit(revalidator.get, cache, 'k', refresh) for _ in range(8)]]
+    assert results == ['old'] * 8 and calls == [1]
+    gate.set()
+    deadline = time.time() + 5
+    while revalidator.refreshing() and time.time() < deadline:
+        time.sleep(0.01)
+    assert revalidator.get(cache, 'k', refresh) == 'new' and calls == [1]
+    assert revalidator.stats()['stale'] == 8 and revalidator.stats()['refreshes'] == 1
+
+
+def test_misses_and_empty_values_wait_for_refresh():
+    cache = TTLCache(10, max_stale=100)
+    revalidator = Revalidator()
+    assert revalidator.get(cache, 'k', lambda: 'fetched') == 'fetched'
+    cache.set('empty', [])
+    assert revalidator.get(cache, 'empty', lambda: ['fetched']) == ['fetched']
+
+
+def test_refresh_errors_keep_the_stale_value(monkeypatch):
+    cache = TTLCache(10, max_stale=100)
+    cache.set('k', 'old')
+    _expire(monkeypatch, 50)
+    revalidator = Revalidator()
+    def boom():
+        raise RuntimeError('upstream down')
+    assert revalidator.get(cache, 'k', boom) == 'old'
+    deadline = time.time() + 5
+    while revalidator.refreshing() and time.time() < deadline:
+        time.sleep(0.01)
+    assert revalidator.stats()['refreshErrors'] == 1
+    assert cache.get_entry('k') == ('old', True)
+
+
+def test_shared_tier_keeps_stale_entries_for_max_stale(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    writer = TieredCache(TTLCache(0.05, max_stale=60), SqliteCacheBackend(path, namespace='s'))
+    reader = TieredCache(TTLCache(0.05, max_stale=60), SqliteCacheBackend(path, namespace='s'))
+    writer.set('k', ['v'])
+    time.sleep(0.1)
+    assert reader.get('k') is None
+    assert reader.get_entry('k') == (['v'], True)
+
+
+def test_stale_season_is_returned_without_waiting(monkeypatch):
+    services._imdb_season_cache.clear()
+    html = '<html><body><div class="ipc-title__text">S1.E1 ∙ Pilot</div></body></html>'
+    started = threading.Event()
+    def slow_get(url, timeout=10):
+        started.set()
+        time.sleep(0.3)
+        return type('Resp', (), {'status_code': 200, 'text': html})()
+    monkeypatch.setattr(services, 'throttled_imdb_get', slow_get)
+    services._imdb_season_cache.set(('tt0000401', 1), [{'title': 'Old'}], ttl=-1)
+    t0 = time.perf_counter()
+    assert services.parse_imdb_season('tt0000401', 1) == [{'title': 'Old'}]
+    assert time.perf_counter() - t0 < 0.2
+    assert started.wait(2)
+    deadline = time.time() + 5
+    while services.revalidator.refreshing() and time.time() < deadline:
+        time.sleep(0.01)
+    refreshed = services.parse_imdb_season('tt0000401', 1)
+    assert refreshed != [{'title': 'Old'}] and refreshed[0]['episode'] == 1
@@ -12,7 +12,7 @@ if ROOT not in sys.path:
 
 import app as backend
 
-# We will monkeypatch httpx.get used inside fetch_rating_from_imdb
+# We will monkeypatch the pooled client's get used inside fetch_rating_from_imdb
 
 class DummyResp:
     def __init__(self, text='', status=200):
@@ -47,7 +47,7 @@ def test_fetch_rating_from_imdb_fallbacks(monkeypatch, html, expected):
     def fake_get(url, headers=None, timeout=10):
         calls['n'] += 1
         return DummyResp(text=html, status=200)
-    monkeypatch.setattr(backend.services.httpx, 'get', fake_get)
+    monkeypatch.setattr(backend.services.http_clients, 'get', fake_get)
     rating = backend.services.fetch_rating_from_imdb('tt9999999')
     assert rating == expected
     assert calls['n'] == 1
@@ -56,7 +56,7 @@ def test_fetch_rating_multiple_attempts(monkeypatch):
     seq = [DummyResp(status=500), DummyResp(status=500), DummyResp(text=HTML_META, status=200)]
     def fake_get(url, headers=None, timeout=10):
         return seq.pop(0)
-    monkeypatch.setattr(backend.services.httpx, 'get', fake_get)
+    monkeypatch.setattr(backend.services.http_clients, 'get', fake_get)
     rating = backend.services.fetch_rating_from_imdb('tt8888888')
     assert rating == '6.9'
 
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+import app
+import services
+from database import Show
+from search_index import TitleIndex, normalize_title
+
+
+def _ids(results):
+    return [r['imdbID'] for r in results]
+
+
+def test_normalize_title():
+    assert normalize_title("  Amélie's  Café: Part II ") == 'amelie s cafe part ii'
+
+
+def test_prefix_matching_and_ranking():
+    index = TitleIndex()
+    index.add('tt1', 'Breaking Bad', '2008')
+    index.add('tt2', 'Bad Sisters', '2022', views=50)
+    index.add('tt3', 'Bad', '2001')
+    index.add('tt4', 'The Good Place', '2016')
+    # Exact, then title prefix (by views), then word prefix
+    assert _ids(index.search('bad')) == ['tt3', 'tt2', 'tt1']
+    # Every term must prefix a word, in any order
+    assert _ids(index.search('break ba')) == ['tt1']
+    assert _ids(index.search('bad break')) == ['tt1']
+    assert index.search('good') == [{'title': 'The Good Place', 'year': '2016', 'imdbID': 'tt4', 'type': 'series'}]
+
+
+def test_typos_fall_back_to_trigrams():
+    index = TitleIndex()
+    index.add('tt1', 'Breaking Bad')
+    index.add('tt2', 'Better Call Saul')
+    assert _ids(index.search('brekaing')) == ['tt1']
+    assert index.search('brekaing', fuzzy=False) == []
+    assert index.search('zzzz') == []
+
+
+def test_retitling_replaces_old_words():
+    index = TitleIndex()
+    index.add('tt1', 'Working Title')
+    index.add('tt1', 'Final Name')
+    assert index.search('working') == [] and _ids(index.search('final')) == ['tt1']
+    assert len(index) == 1
+
+
+def test_build_and_incremental_sync(db):
+    db.add(Show(imdb_id='tt0000601', title='Zyzzyva Chronicles', year='2020', total_seasons=1, view_count=3))
+    db.commit()
+    index = TitleIndex()
+    index.build()
+    assert _ids(index.search('zyzz')) == ['tt0000601']
+    assert _ids(index.search('breaking')) == ['tt0903747']   # featured list
+    # A row stored by another process shows up on the next sync
+    db.add(Show(imdb_id='tt0000602', title='Zyzzyva Returns', total_seasons=1))
+    db.commit()
+    assert index.sync() == 1
+    assert set(_ids(index.search('zyzzyva'))) == {'tt0000601', 'tt0000602'}
+
+
+@pytest.fixture
+def local_index(monkeypatch):
+    index = TitleIndex(sync_seconds=3600)
+    index.add('tt0000610', 'Local Hero Show', '2010')
+    index._synced_at = float('inf')   # no DB sync in these tests
+    monkeypatch.setattr(app, 'search_index', index)
+    services._search_cache.clear()
+    return index
+
+
+def test_search_endpoint_answers_known_titles_locally(local_index, stub_omdb):
+    srv = stub_omdb(lambda path, q, h: pytest.fail('went to OMDb'))
+    assert _ids(app.search_titles('local he', '1')) == ['tt0000610']
+    assert srv.requests == []
+
+
+def test_search_endpoint_falls_back_to_omdb_per_page(local_index, stub_omdb):
+    def handler(path, query, headers):
+        body = {'Response': 'True', 'Search': [
+            {'Title': f"Remote {query['page']}", 'Year': '2000', 'imdbID': f"tt000062{query['page']}", 'Type': 'series'}
+        ]}
+        return 200, json.dumps(body), {'Content-Type': 'application/json'}
+    srv = stub_omdb(handler)
+    assert app.search_titles('remote', '1')[0]['title'] == 'Remote 1'
+    assert app.search_titles('remote', '2')[0]['title'] == 'Remote 2'   # page is part of the cache key
+    assert app.search_titles('Remote', '1')[0]['title'] == 'Remote 1'
+    # Page 2 of a locally known query still comes from OMDb
+    assert app.search_titles('local', '2')[0]['title'] == 'Remote 2'
+    assert len(srv.requests) == 3
+
+
+
+def test_fuzzy_only_matches_still_ask_omdb(local_index, stub_omdb):
+    local_index.add('tt0000640', 'The Bear', '2022')
+    def handler(path, query, headers):
+        if query['s'] != 'the boys':
+            return 200, '{"Response":"False","Error":"Series not found!"}', {'Content-Type': 'application/json'}
+        body = {'Response': 'True', 'Search': [
+            {'Title': 'The Boys', 'Year': '2019–', 'imdbID': 'tt1190634', 'Type': 'series'}
+        ]}
+        return 200, json.dumps(body), {'Content-Type': 'application/json'}
+    srv = stub_omdb(handler)
+    assert _ids(app.search_titles('the boys', '1')) == ['tt1190634', 'tt0000640']
+    # A typo OMDb cannot place is still answered from the index
+    assert _ids(app.search_titles('lcoal hero', '1')) == ['tt0000610']
+    assert len(srv.requests) == 2
+
+def test_ingest_adds_show_to_global_index(db, stub_omdb, monkeypatch):
+    from search_index import search_index
+    from shows import fetch_and_store_show
+    from stub_server import omdb_show_handler
+    monkeypatch.setattr('shows.show_ingest.job_queue.submit', lambda *args, **kwargs: None)
+    stub_omdb(omdb_show_handler(1))
+    fetch_and_store_show('tt0000630')
+    assert 'tt0000630' in _ids(search_index.search('stub show', limit=100))
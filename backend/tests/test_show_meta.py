@@ -0,0 +1,88 @@
+import datetime
+import json
+
+import pytest
+
+import app
+import services
+from database import Show
+from stub_server import omdb_show_handler
+
+
+@pytest.fixture(autouse=True)
+def fresh_title_cache():
+    services._omdb_title_cache.clear()
+    yield
+    services._omdb_title_cache.clear()
+
+
+def _handler_with_plot(path, query, headers):
+    status, body, hdrs = omdb_show_handler(2)(path, query, headers)
+    data = json.loads(body)
+    if 'season' in query:
+        return status, body, hdrs
+    data.update(Plot='A stub plot.', imdbID=query.get('i', 'tt0000509'), Title=query.get('t', data['Title']))
+    return status, json.dumps(data), hdrs
+
+
+def _now():
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+def test_known_show_is_served_from_the_db(db, stub_omdb):
+    srv = stub_omdb(_handler_with_plot)
+    db.add(Show(imdb_id='tt0000501', title='Stored', year='2001', poster='http://p', plot='Stored plot.',
+                total_seasons=4, last_full_refresh=_now()))
+    db.commit()
+    resp = app.get_show_meta('tt0000501')
+    assert json.loads(resp.body) == {'Title': 'Stored', 'Year': '2001', 'Poster': 'http://p',
+                                     'Plot': 'Stored plot.', 'imdbID': 'tt0000501', 'totalSeasons': '4'}
+    assert srv.requests == []
+
+
+def test_legacy_row_without_plot_is_backfilled_once(db, stub_omdb):
+    srv = stub_omdb(_handler_with_plot)
+    db.add(Show(imdb_id='tt0000502', title='Old row', total_seasons=2, last_full_refresh=_now()))
+    db.commit()
+    first = json.loads(app.get_show_meta('tt0000502').body)
+    assert first['Plot'] == 'A stub plot.'
+    db.expire_all()
+    assert db.query(Show).filter_by(imdb_id='tt0000502').one().plot == 'A stub plot.'
+    app.get_show_meta('tt0000502')
+    assert len(srv.requests) == 1
+
+
+def test_stale_or_unknown_shows_use_the_title_cache(db, stub_omdb):
+    srv = stub_omdb(_handler_with_plot)
+    db.add(Show(imdb_id='tt0000503', title='Stale', plot='Old plot', total_seasons=1,
+                last_full_refresh=_now() - datetime.timedelta(days=365)))
+    db.commit()
+    for _ in range(3):
+        assert json.loads(app.get_show_meta('tt0000503').body)['Plot'] == 'A stub plot.'
+        assert json.loads(app.get_show_meta('tt0000504').body)['imdbID'] == 'tt0000504'
+    assert len(srv.requests) == 2
+
+
+def test_show_by_title_is_cached_and_errors_are_not(db, stub_omdb):
+    def handler(path, query, headers):
+        if query.get('t') == 'Missing':
+            return 200, '{"Response":"False","Error":"Series not found!"}', {}
+        return _handler_with_plot(path, query, headers)
+    srv = stub_omdb(handler)
+    assert app.get_show_by_title('Lost')['Title'] == 'Lost'
+    assert app.get_show_by_title(' lost ')['Title'] == 'Lost'
+    assert len(srv.requests) == 1
+    assert app.get_show_by_title('Missing').status_code == 500
+    assert app.get_show_by_title('Missing').status_code == 500
+    assert len(srv.requests) == 3
+    # The title lookup also primed the ID key
+    assert services.fetch_omdb_title(imdb_id='tt0000509') == (200, app.get_show_by_title('Lost'))
+    assert len(srv.requests) == 3
+
+
+def test_ingest_stores_plot(db, stub_omdb, monkeypatch):
+    monkeypatch.setattr('shows.show_ingest.job_queue.submit', lambda *args, **kwargs: None)
+    stub_omdb(_handler_with_plot)
+    from shows import fetch_and_store_show
+    fetch_and_store_show('tt0000505')
+    assert db.query(Show).filter_by(imdb_id='tt0000505').one().plot == 'A stub plot.'
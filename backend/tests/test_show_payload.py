@@ -0,0 +1,117 @@
+import json
+from contextlib import contextmanager
+from datetime import timedelta
+
+from sqlalchemy import event
+
+from view_counter import view_counter
+from database import engine, Show, Episode, is_episode_stale, touch_show_data, EPISODE_STALE_DAYS
+from shows.show_helpers import (
+    get_show_data,
+    show_payload_cache,
+    _build_show_payload,
+    _increment_view_count,
+    _now_utc_naive,
+)
+
+
+@contextmanager
+def _count_episode_queries():
+    seen = []
+    def before(conn, cursor, statement, params, context, executemany):
+        if 'FROM episodes' in statement:
+            seen.append(statement)
+    event.listen(engine, 'before_cursor_execute', before)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+
+
+def _seed(db, imdb_id='tt0000091'):
+    now = _now_utc_naive()
+    show = Show(imdb_id=imdb_id, title='Cached', total_seasons=2, last_full_refresh=now, last_updated=now)
+    db.add(show)
+    db.flush()
+    old = now - timedelta(days=EPISODE_STALE_DAYS + 1)
+    db.add_all([
+        Episode(show_id=show.id, season=1, episode=1, title='A', rating=8.0, last_checked=now),
+        Episode(show_id=show.id, season=1, episode=2, title='B', rating=7.0, last_checked=old),
+        Episode(show_id=show.id, season=2, episode=1, title='Ünïcode', rating=None, absent=True),
+    ])
+    touch_show_data(db, show)
+    db.commit()
+    show_payload_cache.clear()
+    return show
+
+
+def test_cached_payload_matches_full_build(db):
+    show = _seed(db)
+    resp = get_show_data('tt0000091')
+    episodes = db.query(Episode).filter_by(show_id=show.id).order_by(Episode.season, Episode.episode).all()
+    expected, etag = _build_show_payload(show, episodes)
+    assert json.loads(resp.body) == expected
+    assert resp.headers['etag'] == etag
+    assert expected['episodesStaleCount'] == sum(1 for ep in episodes if is_episode_stale(ep)) == 2
+
+
+def test_unchanged_show_skips_episodes_table(db):
+    _seed(db)
+    first = get_show_data('tt0000091')
+    hits = show_payload_cache.stats()['hits']
+    with _count_episode_queries() as seen:
+        second = get_show_data('tt0000091')
+        not_modified = get_show_data('tt0000091', if_none_match=first.headers['etag'])
+    assert seen == []
+    assert second.body == first.body
+    assert not_modified.status_code == 304
+    assert show_payload_cache.stats()['hits'] - hits == 1  # the 304 never reaches the cache
+
+
+def test_touch_show_data_invalidates(db):
+    show = _seed(db)
+    get_show_data('tt0000091')
+    stale = show_payload_cache.stats()['stale']
+    ep = db.query(Episode).filter_by(show_id=show.id, season=2).one()
+    ep.rating, ep.absent = 9.5, False
+    touch_show_data(db, show)
+    db.commit()
+    body = json.loads(get_show_data('tt0000091').body)
+    assert body['episodes'][-1]['rating'] == 9.5 and body['absentEpisodesCount'] == 0
+    assert show_payload_cache.stats()['stale'] - stale == 1
+
+
+def test_view_count_does_not_change_etag(db):
+    show = _seed(db)
+    etag = get_show_data('tt0000091').headers['etag']
+    _increment_view_count(show.id)
+    view_counter.flush()
+    db.refresh(show)
+    assert show.view_count == 1
+    assert get_show_data('tt0000091', if_none_match=etag).status_code == 304
+
+
+def test_etag_counters_follow_writes(db):
+    show = _seed(db)
+    assert (show.episode_count, show.absent_count, show.data_version) == (3, 1, 1)
+    etag = get_show_data('tt0000091').headers['etag']
+    assert etag == '1:3:2:1'
+    db.add(Episode(show_id=show.id, season=2, episode=2, title='C', rating=None, absent=True))
+    touch_show_data(db, show)
+    db.commit()
+    assert (show.episode_count, show.absent_count, show.data_version) == (4, 2, 2)
+    assert get_show_data('tt0000091', if_none_match=etag).status_code == 200
+
+
+def test_not_modified_is_a_single_row_lookup(db):
+    _seed(db)
+    etag = get_show_data('tt0000091').headers['etag']
+    statements = []
+    def before(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', before)
+    try:
+        assert get_show_data('tt0000091', if_none_match=etag).status_code == 304
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+    assert len(statements) == 1 and 'FROM shows' in statements[0]
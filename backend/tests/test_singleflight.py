@@ -0,0 +1,96 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from stub_server import omdb_show_handler
+
+import services
+from singleflight import SingleFlight
+from database import session, Show, Episode
+from shows import fetch_and_store_show, fast_fetch_and_store_show
+from shows.show_ingest import ingest_flight
+from view_counter import view_counter
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    gate = threading.Event()
+    calls = []
+    def work(x):
+        calls.append(x)
+        gate.wait(2)
+        return x * 2
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, 'k', work, 21) for _ in range(4)]
+        time.sleep(0.1)
+        gate.set()
+        results = [f.result(2) for f in futures]
+    assert calls == [21]
+    assert sorted(results) == [(42, False), (42, True), (42, True), (42, True)]
+    assert flight.stats() == {'calls': 4, 'executed': 1, 'shared': 3, 'errors': 0, 'inFlight': 0}
+    # Finished keys are forgotten: the next call runs again
+    assert flight.do('k', work, 1) == (2, False)
+
+
+def test_leader_error_reaches_every_waiter():
+    flight = SingleFlight()
+    gate = threading.Event()
+    def boom():
+        gate.wait(2)
+        raise ValueError('upstream down')
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(flight.do, 'k', boom) for _ in range(3)]
+        time.sleep(0.1)
+        gate.set()
+        for f in futures:
+            with pytest.raises(ValueError):
+                f.result(2)
+    assert flight.stats()['errors'] == 1 and flight.stats()['shared'] == 2
+
+
+def _ingest_concurrently(fn, imdb_id, n):
+    def call():
+        try:
+            resp = fn(imdb_id, track_view=True)
+            return resp.status_code
+        finally:
+            session.remove()
+    with ThreadPoolExecutor(n) as pool:
+        return [f.result(10) for f in [pool.submit(call) for _ in range(n)]]
+
+
+@pytest.mark.parametrize('fast', [False, True])
+def test_concurrent_ingest_of_same_show_fetches_once(db, stub_omdb, monkeypatch, fast):
+    monkeypatch.delenv('FAST_INGEST', raising=False)
+    monkeypatch.setattr('shows.show_ingest.job_queue.submit', lambda *args, **kwargs: None)
+    srv = stub_omdb(omdb_show_handler(3), delay=0.1)
+    before = ingest_flight.stats()
+    statuses = _ingest_concurrently(fast_fetch_and_store_show if fast else fetch_and_store_show, 'tt0000081', 4)
+    assert statuses == [200] * 4
+    title_lookups = [q for _, q, _ in srv.requests if 'season' not in q]
+    assert len(title_lookups) == 1 and len(srv.requests) == 4
+    view_counter.flush()
+    show = db.query(Show).filter_by(imdb_id='tt0000081').one()
+    assert show.view_count == 4
+    assert db.query(Episode).filter_by(show_id=show.id).count() == 9
+    after = ingest_flight.stats()
+    assert after['executed'] - before['executed'] == 1 and after['shared'] - before['shared'] == 3
+
+
+def test_concurrent_season_scrapes_share_one_request(monkeypatch):
+    services._imdb_season_cache.clear()
+    requests = []
+    html = '<html><body><div class="ipc-title__text">S1.E1 ∙ Pilot</div></body></html>'
+    def fake_get(url, timeout=10):
+        requests.append(url)
+        time.sleep(0.1)
+        return type('Resp', (), {'status_code': 200, 'text': html})()
+    monkeypatch.setattr(services, 'throttled_imdb_get', fake_get)
+    before = services.season_flight.stats()['shared']
+    with ThreadPoolExecutor(5) as pool:
+        results = [f.result(5) for f in [pool.submit(services.parse_imdb_season, 'tt0000082', 1) for _ in range(5)]]
+    assert len(requests) == 1
+    assert all(r == results[0] for r in results)
+    assert services.season_flight.stats()['shared'] - before == 4
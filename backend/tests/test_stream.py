@@ -0,0 +1,68 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from stub_server import omdb_show_handler
+
+import app as backend
+from database import Show, Episode
+
+
+def _events(resp):
+    return [json.loads(line) for line in resp.text.splitlines() if line]
+
+
+def test_stream_ingests_unknown_show_season_by_season(db, stub_omdb, monkeypatch):
+    monkeypatch.delenv('FAST_INGEST', raising=False)
+    stub_omdb(omdb_show_handler(3, eps_per_season=2))
+    client = TestClient(backend.app)
+    resp = client.get('/getShowStream', params={'imdbID': 'tt0000051'})
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('application/x-ndjson')
+    events = _events(resp)
+    assert events[0]['type'] == 'show' and events[0]['totalSeasons'] == 3
+    seasons = [e for e in events if e['type'] == 'season']
+    assert sorted(e['season'] for e in seasons) == [1, 2, 3]
+    assert all(len(e['episodes']) == 2 for e in seasons)
+    done = events[-1]
+    assert done['type'] == 'done' and 'episodes' not in done and done['etag']
+    show = db.query(Show).filter_by(imdb_id='tt0000051').one()
+    assert show.view_count == 1
+    assert db.query(Episode).filter_by(show_id=show.id).count() == 6
+
+
+def test_stream_serves_stored_show_from_db(db, stub_omdb, monkeypatch):
+    monkeypatch.delenv('FAST_INGEST', raising=False)
+    srv = stub_omdb(omdb_show_handler(2, eps_per_season=3))
+    client = TestClient(backend.app)
+    client.get('/getShowStream', params={'imdbID': 'tt0000052'})
+    upstream_calls = len(srv.requests)
+    events = _events(client.get('/getShowStream', params={'imdbID': 'tt0000052', 'trackView': '0'}))
+    assert len(srv.requests) == upstream_calls
+    assert [e['type'] for e in events] == ['show', 'season', 'season', 'done']
+    assert [ep['episode'] for ep in events[1]['episodes']] == [1, 2, 3]
+    full = client.get('/getShow', params={'imdbID': 'tt0000052', 'trackView': '0'})
+    assert events[-1]['etag'] == full.headers['ETag']
+
+
+def test_stream_reports_upstream_errors(db, stub_omdb, monkeypatch):
+    monkeypatch.delenv('FAST_INGEST', raising=False)
+    stub_omdb(lambda path, query, headers: (200, '{"Response":"False","Error":"Incorrect IMDb ID."}', {}))
+    events = _events(TestClient(backend.app).get('/getShowStream', params={'imdbID': 'tt0000053'}))
+    assert events == [{'type': 'error', 'status': 500, 'error': 'Failed to fetch show data'}]
+
+
+def test_ingest_events_precede_the_single_write(db, stub_omdb, monkeypatch):
+    from sqlalchemy import text
+    import database
+    from shows import fetch_and_store_show
+    monkeypatch.delenv('FAST_INGEST', raising=False)
+    stub_omdb(omdb_show_handler(2, eps_per_season=2))
+    seen = []
+    def on_event(event):
+        with database.engine.connect() as conn:
+            seen.append((event['type'], conn.execute(text('SELECT COUNT(*) FROM episodes')).scalar()))
+    assert fetch_and_store_show('tt0000054', on_event=on_event).status_code == 200
+    # Season events are previews; the rows land together before the call returns
+    assert seen == [('show', 0), ('season', 0), ('season', 0)]
+    assert db.query(Episode).count() == 4
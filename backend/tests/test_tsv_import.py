@@ -0,0 +1,118 @@
+import gzip
+import os
+import shutil
+
+import pytest
+
+import database
+import tsv_import
+from database import Episode, SeasonHash, Show, compute_season_signature
+
+DATASETS = os.path.join(os.path.dirname(__file__), 'fixtures', 'datasets')
+
+
+@pytest.fixture
+def dumps(tmp_path):
+    """The fixture TSVs gzipped into a scratch dir, as IMDb ships them."""
+    for name in ('title.basics.tsv', 'title.episode.tsv', 'title.ratings.tsv'):
+        with open(os.path.join(DATASETS, name), 'rb') as src, gzip.open(tmp_path / f'{name}.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+    return tmp_path
+
+
+def run(path, **kwargs):
+    kwargs.setdefault('batch_size', 2)
+    return tsv_import.import_datasets(
+        str(path / 'title.basics.tsv.gz'), str(path / 'title.episode.tsv.gz'), str(path / 'title.ratings.tsv.gz'),
+        db_engine=database.engine, **kwargs)
+
+
+def episodes_of(db, imdb_id):
+    show = db.query(Show).filter_by(imdb_id=imdb_id).one()
+    return show, db.query(Episode).filter_by(show_id=show.id).order_by(Episode.season, Episode.episode).all()
+
+
+def test_iter_tsv_keeps_quotes_and_nulls():
+    rows = list(tsv_import.iter_tsv(os.path.join(DATASETS, 'title.basics.tsv')))
+    second = next(r for r in rows if r['tconst'] == 'tt0100003')
+    assert second['primaryTitle'] == 'The "Second" One' and second['endYear'] is None
+
+
+def test_initial_import(db, dumps):
+    stats = run(dumps)
+    assert stats['showsInserted'] == 3 and stats['episodesInserted'] == 6 and stats['showsChanged'] == 3
+
+    show, eps = episodes_of(db, 'tt0100001')
+    assert (show.title, show.year, show.genres, show.total_seasons) == ('Alpha Show', '2008–2010', 'Crime, Drama', 2)
+    assert (show.imdb_rating, show.imdb_votes) == (8.9, 250000)
+    # Duplicate slot S1E1 keeps the lowest tconst; the episode without a season is skipped
+    assert [(e.season, e.episode, e.imdb_id, e.title, e.rating, e.votes) for e in eps] == [
+        (1, 1, 'tt0100002', 'Pilot', 8.1, 12000),
+        (1, 2, 'tt0100003', 'The "Second" One', 8.4, 11000),
+        (2, 1, 'tt0100004', 'Finale', 9.6, 30000),
+    ]
+    assert show.episode_count == 3 and show.data_version == 1 and show.last_full_refresh is None
+    hashes = {h.season: h.signature for h in db.query(SeasonHash).filter_by(show_id=show.id)}
+    assert hashes == {1: compute_season_signature(eps[:2]), 2: compute_season_signature(eps[2:])}
+
+    mini, mini_eps = episodes_of(db, 'tt0200001')
+    assert mini.year == '2016' and mini_eps[1].rating is None and mini_eps[1].missing
+    assert db.query(Show).filter_by(imdb_id='tt0300001').one().year == '2019–'
+    assert db.query(Show).filter_by(imdb_id='tt0400001').first() is None
+
+
+def test_reimport_touches_only_changed_rows(db, dumps, tmp_path_factory):
+    run(dumps)
+    versions = {s.imdb_id: s.data_version for s in db.query(Show)}
+    db.expire_all()
+
+    again = run(dumps)
+    assert again['showsInserted'] == again['showsUpdated'] == 0
+    assert again['episodesInserted'] == again['episodesUpdated'] == again['showsChanged'] == 0
+
+    newer = tmp_path_factory.mktemp('newer')
+    for name in ('title.basics.tsv.gz', 'title.episode.tsv.gz'):
+        shutil.copy(dumps / name, newer / name)
+    with gzip.open(dumps / 'title.ratings.tsv.gz', 'rt') as src, gzip.open(newer / 'title.ratings.tsv.gz', 'wt') as dst:
+        for line in src:
+            dst.write(line.replace('tt0200002\t7.5\t900', 'tt0200002\t7.6\t1200'))
+    stats = run(newer)
+    assert stats['episodesUpdated'] == 1 and stats['showsUpdated'] == 0 and stats['showsChanged'] == 1
+
+    db.expire_all()
+    after = {s.imdb_id: s.data_version for s in db.query(Show)}
+    assert after == {**versions, 'tt0200001': versions['tt0200001'] + 1}
+    _, mini_eps = episodes_of(db, 'tt0200001')
+    assert (mini_eps[0].rating, mini_eps[0].votes) == (7.6, 1200)
+
+
+def test_merges_into_ingested_show(db, dumps):
+    show = Show(imdb_id='tt0100001', title='Alpha Show', total_seasons=1, poster='p.jpg', plot='Plot',
+                imdb_rating=8.8, view_count=5)
+    db.add(show)
+    db.flush()
+    db.add(Episode(show_id=show.id, season=1, episode=1, title='Pilot', rating=None, imdb_id='tt0100001-S1E1',
+                   missing=True, absent=True, provisional=True))
+    db.commit()
+
+    stats = run(dumps, only_existing=True)
+    assert stats['showsInserted'] == 0 and stats['showsUpdated'] == 1
+    assert stats['episodesUpdated'] == 1 and stats['episodesInserted'] == 2
+
+    db.expire_all()
+    show, eps = episodes_of(db, 'tt0100001')
+    assert (show.poster, show.plot, show.view_count, show.total_seasons, show.imdb_rating) == ('p.jpg', 'Plot', 5, 2, 8.9)
+    assert len(eps) == 3 and (eps[0].imdb_id, eps[0].rating, eps[0].missing) == ('tt0100002', 8.1, False)
+    assert db.query(Show).count() == 1
+
+
+def test_min_votes(db, dumps):
+    stats = run(dumps, min_votes=1000)
+    assert stats['showsInserted'] == 2
+    assert db.query(Show).filter_by(imdb_id='tt0300001').first() is None
+
+
+def test_cli(db, dumps, capsys):
+    tsv_import.main(['--dir', str(dumps), '--batch-size', '3'])
+    assert 'showsInserted=3' in capsys.readouterr().out
+    assert db.query(Episode).count() == 6
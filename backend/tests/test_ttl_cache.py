@@ -0,0 +1,91 @@
+import threading
+
+import utils
+from utils import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(utils.time, 'monotonic', clock)
+    return clock
+
+
+def test_get_set_clear_and_require_value():
+    cache = TTLCache(60)
+    cache.set('a', [1])
+    cache.set('empty', [])
+    assert cache.get('a') == [1]
+    assert cache.get('empty') is None
+    assert cache.get('empty', require_value=False) == []
+    cache.clear()
+    assert cache.get('a') is None and len(cache) == 0
+
+
+def test_expiry_per_entry_ttl(monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = TTLCache(10)
+    cache.set('short', 1, ttl=1)
+    cache.set('long', 2)
+    clock.now += 5
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+    # Expired entries are removed on read, not just hidden
+    assert cache.keys() == ['long']
+    assert cache.stats()['expired'] == 1
+
+
+def test_lru_eviction_by_entries():
+    cache = TTLCache(60, max_entries=3)
+    for k in 'abc':
+        cache.set(k, k)
+    cache.get('a')  # 'b' becomes least recently used
+    cache.set('d', 'd')
+    assert sorted(cache.keys()) == ['a', 'c', 'd']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_eviction_by_bytes():
+    cache = TTLCache(60, max_entries=100, max_bytes=250, sizeof=len)
+    cache.set('a', 'x' * 100)
+    cache.set('b', 'x' * 100)
+    cache.set('c', 'x' * 100)
+    assert cache.keys() == ['b', 'c'] and cache.stats()['bytes'] == 200
+    # Replacing a key re-accounts its size
+    cache.set('b', 'x' * 10)
+    assert cache.stats()['bytes'] == 110
+    assert cache.pop('c') == 'x' * 100 and cache.stats()['bytes'] == 10
+
+
+def test_periodic_sweep_drops_untouched_expired_entries(monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = TTLCache(1, sweep_interval=30)
+    for i in range(50):
+        cache.set(i, i)
+    clock.now += 31
+    cache.set('fresh', 1)  # triggers the sweep
+    assert cache.keys() == ['fresh']
+    assert cache.stats()['expired'] == 50
+
+
+def test_concurrent_access_stays_bounded():
+    cache = TTLCache(60, max_entries=64)
+    def worker(n):
+        for i in range(2000):
+            cache.set((n, i % 200), i)
+            cache.get((n, (i * 7) % 200))
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = cache.stats()
+    assert stats['size'] == 64 == len(cache.keys())
+    assert stats['hits'] + stats['misses'] == 8000
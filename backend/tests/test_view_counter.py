@@ -0,0 +1,62 @@
+from sqlalchemy import event
+
+from database import engine, Show
+from view_counter import ViewCounter
+
+
+def _shows(db, n):
+    shows = [Show(imdb_id=f'tt00001{i:02d}', title=f'S{i}', total_seasons=1, view_count=i) for i in range(n)]
+    db.add_all(shows)
+    db.commit()
+    return shows
+
+
+def test_increments_are_buffered_and_flushed_in_one_batch(db):
+    a, b = _shows(db, 2)
+    a_id, b_id = a.id, b.id
+    counter = ViewCounter(engine)
+    statements = []
+    def before(conn, cursor, statement, params, context, executemany):
+        statements.append((statement, executemany))
+    event.listen(engine, 'before_cursor_execute', before)
+    try:
+        for _ in range(5):
+            counter.incr(a_id)
+        counter.incr(b_id, 2)
+        assert statements == []  # recording never touches the database
+        assert counter.flush() == 2
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+    updates = [s for s in statements if s[0].startswith('UPDATE shows')]
+    assert len(updates) == 1 and updates[0][1]  # one executemany
+    db.expire_all()
+    assert (a.view_count, b.view_count) == (5, 3)
+    assert counter.pending() == {} and counter.flush() == 0
+
+
+def test_flushes_from_several_processes_add_up(db):
+    (show,) = _shows(db, 1)
+    last_updated = show.last_updated
+    workers = [ViewCounter(engine) for _ in range(3)]
+    for i, counter in enumerate(workers):
+        counter.incr(show.id, i + 1)
+    for counter in workers:
+        counter.flush()
+    db.expire_all()
+    assert show.view_count == 6
+    assert show.last_updated == last_updated
+
+
+def test_failed_flush_keeps_deltas(db, monkeypatch):
+    (show,) = _shows(db, 1)
+    counter = ViewCounter(engine)
+    counter.incr(show.id, 4)
+    monkeypatch.setattr(counter, '_engine', None)  # any DB call fails
+    assert counter.flush() == 0
+    counter.incr(show.id)
+    assert counter.pending() == {show.id: 5} and counter.stats()['errors'] == 1
+    monkeypatch.setattr(counter, '_engine', engine)
+    counter.stop()  # stop always flushes
+    db.expire_all()
+    assert show.view_count == 5
+
@@ -0,0 +1,420 @@
+"""
+Bulk seeding of `shows` / `episodes` from IMDb's non-commercial TSV datasets.
+
+    python tsv_import.py --dir ~/imdb-datasets [--min-votes 1000] [--only-existing]
+
+Reads `title.basics.tsv.gz`, `title.episode.tsv.gz` and
+`title.ratings.tsv.gz` (plain `.tsv` works too) line by line into temporary
+staging tables in batches of `--batch-size` rows, so memory stays flat however
+large the dumps are. Shows and episodes are then merged with set-based SQL:
+rows whose title, year, genres, rating or votes differ are updated, missing
+rows are inserted, and everything else is left alone, so re-importing a newer
+dump only touches what changed. Shows that changed get their ETag counters,
+`data_version` and season signatures refreshed, exactly as an ingest would.
+
+Imported shows have no poster or plot and no `last_full_refresh`, so the
+usual metadata refresh fills those in from OMDb the first time they are
+viewed.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import logging
+import os
+import time
+from typing import Any, Iterator, TextIO
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, bindparam, text
+
+from database import engine, init_db, ensure_columns, ensure_indices, _utc_now
+
+
+IMPORT_BATCH_SIZE: int = int(os.getenv('IMPORT_BATCH_SIZE', 5000))
+SERIES_TYPES: tuple[str, ...] = ('tvSeries', 'tvMiniSeries')
+DATASET_FILES: dict[str, str] = {
+    'basics': 'title.basics.tsv.gz',
+    'episodes': 'title.episode.tsv.gz',
+    'ratings': 'title.ratings.tsv.gz',
+}
+_NULL = '\\N'
+
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Staging tables (temporary: private to the import connection)
+# ============================================================================
+_staging = MetaData()
+
+stage_titles = Table(
+    'stage_titles', _staging,
+    Column('tconst', String, primary_key=True),
+    Column('kind', String),
+    Column('title', String),
+    Column('year', String),
+    Column('genres', String),
+    prefixes=['TEMPORARY'],
+)
+stage_episodes = Table(
+    'stage_episodes', _staging,
+    Column('tconst', String, primary_key=True),
+    Column('parent', String, index=True),
+    Column('season', Integer),
+    Column('episode', Integer),
+    prefixes=['TEMPORARY'],
+)
+stage_ratings = Table(
+    'stage_ratings', _staging,
+    Column('tconst', String, primary_key=True),
+    Column('rating', Float),
+    Column('votes', Integer),
+    prefixes=['TEMPORARY'],
+)
+import_shows = Table(
+    'import_shows', _staging,
+    Column('tconst', String, primary_key=True),
+    Column('show_id', Integer),
+    Column('title', String),
+    Column('year', String),
+    Column('genres', String),
+    Column('rating', Float),
+    Column('votes', Integer),
+    Column('total_seasons', Integer),
+    prefixes=['TEMPORARY'],
+)
+import_episodes = Table(
+    'import_episodes', _staging,
+    Column('show_id', Integer, primary_key=True),
+    Column('season', Integer, primary_key=True),
+    Column('episode', Integer, primary_key=True),
+    Column('imdb_id', String),
+    Column('title', String),
+    Column('rating', Float),
+    Column('votes', Integer),
+    prefixes=['TEMPORARY'],
+)
+import_changed = Table(
+    'import_changed', _staging,
+    Column('show_id', Integer, primary_key=True),
+    prefixes=['TEMPORARY'],
+)
+
+
+# ============================================================================
+# Reading
+# ============================================================================
+def _open_tsv(path: str) -> TextIO:
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def iter_tsv(path: str) -> Iterator[dict[str, str | None]]:
+    """Rows of an IMDb dataset file as dicts; `\\N` becomes None."""
+    # Fields are never quoted (titles may contain bare quotes), so no csv module
+    with _open_tsv(path) as f:
+        header = f.readline().rstrip('\r\n').split('\t')
+        for line in f:
+            values = line.rstrip('\r\n').split('\t')
+            if len(values) != len(header):
+                continue
+            yield {k: (None if v == _NULL else v) for k, v in zip(header, values)}
+
+
+def _int(value: str | None) -> int | None:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _float(value: str | None) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def format_year(kind: str | None, start: str | None, end: str | None) -> str | None:
+    """OMDb-style year range: "2008–2013", "2019–" (running), "2016"."""
+    if not start:
+        return None
+    if end and end != start:
+        return f"{start}–{end}"
+    if kind == 'tvSeries' and not end:
+        return f"{start}–"
+    return start
+
+
+def _basics_rows(path: str) -> Iterator[dict[str, Any]]:
+    keep = set(SERIES_TYPES) | {'tvEpisode'}
+    for row in iter_tsv(path):
+        kind = row.get('titleType')
+        if kind not in keep:
+            continue
+        genres = row.get('genres')
+        yield {
+            'tconst': row['tconst'],
+            'kind': kind,
+            'title': row.get('primaryTitle'),
+            'year': format_year(kind, row.get('startYear'), row.get('endYear')),
+            'genres': genres.replace(',', ', ') if genres else None,
+        }
+
+
+def _episode_rows(path: str) -> Iterator[dict[str, Any]]:
+    for row in iter_tsv(path):
+        season, episode = _int(row.get('seasonNumber')), _int(row.get('episodeNumber'))
+        if season is None or episode is None or not row.get('parentTconst'):
+            continue
+        yield {'tconst': row['tconst'], 'parent': row['parentTconst'], 'season': season, 'episode': episode}
+
+
+def _rating_rows(path: str) -> Iterator[dict[str, Any]]:
+    for row in iter_tsv(path):
+        yield {'tconst': row['tconst'], 'rating': _float(row.get('averageRating')), 'votes': _int(row.get('numVotes'))}
+
+
+def _stage(conn, table: Table, rows: Iterator[dict[str, Any]], batch_size: int) -> int:
+    """Insert `rows` into a staging table in executemany batches; returns the row count."""
+    total = 0
+    batch: list[dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.execute(table.insert(), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+        total += len(batch)
+    return total
+
+
+# ============================================================================
+# Merge
+# ============================================================================
+def _sql(statement: str):
+    """`text()` with `:now` typed as DateTime, so it is stored in SQLAlchemy's format."""
+    stmt = text(statement)
+    if ':now' in statement:
+        stmt = stmt.bindparams(bindparam('now', type_=DateTime()))
+    return stmt
+
+
+def _differs(conn, a: str, b: str) -> str:
+    """Null-safe "a != b" for the connection's dialect."""
+    op = 'IS DISTINCT FROM' if conn.dialect.name == 'postgresql' else 'IS NOT'
+    return f"({a} {op} {b})"
+
+
+def _merge_shows(conn, min_votes: int, only_existing: bool, now) -> tuple[int, int]:
+    """Fill import_shows from staging and upsert `shows`; returns (inserted, updated)."""
+    filters = ['COALESCE(r.votes, 0) >= :min_votes']
+    if only_existing:
+        filters.append('EXISTS (SELECT 1 FROM shows WHERE shows.imdb_id = t.tconst)')
+    conn.execute(_sql(
+        "INSERT INTO import_shows (tconst, title, year, genres, rating, votes, total_seasons) "
+        "SELECT t.tconst, t.title, t.year, t.genres, r.rating, r.votes, MAX(e.season) "
+        "FROM stage_titles t "
+        "JOIN stage_episodes e ON e.parent = t.tconst "
+        "LEFT JOIN stage_ratings r ON r.tconst = t.tconst "
+        f"WHERE t.kind IN :kinds AND {' AND '.join(filters)} "
+        "GROUP BY t.tconst, t.title, t.year, t.genres, r.rating, r.votes"
+    ).bindparams(bindparam('kinds', expanding=True)), {'kinds': list(SERIES_TYPES), 'min_votes': min_votes})
+
+    changed = ' OR '.join([
+        f"(s.title IS NOT NULL AND {_differs(conn, 'shows.title', 's.title')})",
+        f"(s.year IS NOT NULL AND {_differs(conn, 'shows.year', 's.year')})",
+        f"(s.genres IS NOT NULL AND {_differs(conn, 'shows.genres', 's.genres')})",
+        f"(s.rating IS NOT NULL AND {_differs(conn, 'shows.imdb_rating', 's.rating')})",
+        f"(s.votes IS NOT NULL AND {_differs(conn, 'shows.imdb_votes', 's.votes')})",
+        's.total_seasons > COALESCE(shows.total_seasons, 0)',
+    ])
+    conn.execute(_sql(
+        "INSERT INTO import_changed (show_id) "
+        f"SELECT shows.id FROM shows JOIN import_shows s ON s.tconst = shows.imdb_id WHERE {changed}"
+    ))
+    updated = conn.execute(_sql(
+        "UPDATE shows SET "
+        "title = COALESCE(s.title, shows.title), "
+        "year = COALESCE(s.year, shows.year), "
+        "genres = COALESCE(s.genres, shows.genres), "
+        "imdb_rating = COALESCE(s.rating, shows.imdb_rating), "
+        "imdb_votes = COALESCE(s.votes, shows.imdb_votes), "
+        "total_seasons = CASE WHEN s.total_seasons > COALESCE(shows.total_seasons, 0) "
+        "THEN s.total_seasons ELSE shows.total_seasons END "
+        f"FROM import_shows s WHERE s.tconst = shows.imdb_id AND ({changed})"
+    )).rowcount
+    inserted = conn.execute(_sql(
+        "INSERT INTO shows (imdb_id, title, year, genres, imdb_rating, imdb_votes, total_seasons, "
+        "view_count, episode_count, absent_count, data_version, last_updated) "
+        "SELECT s.tconst, s.title, s.year, s.genres, s.rating, s.votes, s.total_seasons, 0, 0, 0, 0, :now "
+        "FROM import_shows s WHERE NOT EXISTS (SELECT 1 FROM shows WHERE shows.imdb_id = s.tconst)"
+    ), {'now': now}).rowcount
+    conn.execute(_sql(
+        "UPDATE import_shows SET show_id = (SELECT id FROM shows WHERE shows.imdb_id = import_shows.tconst)"
+    ))
+    # New shows are marked changed when their episodes are inserted
+    return inserted, updated
+
+
+def _merge_episodes(conn, now) -> tuple[int, int]:
+    """Fill import_episodes from staging and upsert `episodes`; returns (inserted, updated)."""
+    # One row per (show, season, episode): the dumps occasionally list a slot twice
+    conn.execute(_sql(
+        "INSERT INTO import_episodes (show_id, season, episode, imdb_id, title, rating, votes) "
+        "SELECT s.show_id, e.season, e.episode, e.tconst, t.title, r.rating, r.votes "
+        "FROM stage_episodes e "
+        "JOIN import_shows s ON s.tconst = e.parent "
+        "LEFT JOIN stage_titles t ON t.tconst = e.tconst "
+        "LEFT JOIN stage_ratings r ON r.tconst = e.tconst "
+        "WHERE e.tconst = (SELECT MIN(e2.tconst) FROM stage_episodes e2 "
+        "WHERE e2.parent = e.parent AND e2.season = e.season AND e2.episode = e.episode)"
+    ))
+
+    same_slot = 'episodes.show_id = s.show_id AND episodes.season = s.season AND episodes.episode = s.episode'
+    changed = ' OR '.join([
+        f"(s.rating IS NOT NULL AND {_differs(conn, 'episodes.rating', 's.rating')})",
+        f"(s.votes IS NOT NULL AND {_differs(conn, 'episodes.votes', 's.votes')})",
+        f"(s.title IS NOT NULL AND {_differs(conn, 'episodes.title', 's.title')})",
+        _differs(conn, 'episodes.imdb_id', 's.imdb_id'),
+    ])
+    conn.execute(_sql(
+        "INSERT INTO import_changed (show_id) "
+        "SELECT DISTINCT episodes.show_id FROM episodes JOIN import_episodes s "
+        f"ON {same_slot} WHERE ({changed}) "
+        "AND NOT EXISTS (SELECT 1 FROM import_changed c WHERE c.show_id = episodes.show_id)"
+    ))
+    updated = conn.execute(_sql(
+        "UPDATE episodes SET "
+        "rating = COALESCE(s.rating, episodes.rating), "
+        "votes = COALESCE(s.votes, episodes.votes), "
+        "title = COALESCE(s.title, episodes.title), "
+        "imdb_id = s.imdb_id, "
+        "missing = (COALESCE(s.rating, episodes.rating) IS NULL), "
+        "last_checked = :now "
+        f"FROM import_episodes s WHERE {same_slot} AND ({changed})"
+    ), {'now': now}).rowcount
+
+    conn.execute(_sql(
+        "INSERT INTO import_changed (show_id) "
+        "SELECT DISTINCT s.show_id FROM import_episodes s "
+        "WHERE NOT EXISTS (SELECT 1 FROM episodes WHERE " + same_slot + ") "
+        "AND NOT EXISTS (SELECT 1 FROM import_changed c WHERE c.show_id = s.show_id)"
+    ))
+    inserted = conn.execute(_sql(
+        "INSERT INTO episodes (show_id, season, episode, title, rating, imdb_id, votes, "
+        "last_checked, missing, absent, provisional) "
+        "SELECT s.show_id, s.season, s.episode, COALESCE(s.title, 'No Title'), s.rating, s.imdb_id, s.votes, "
+        ":now, (s.rating IS NULL), :no, :no "
+        "FROM import_episodes s WHERE NOT EXISTS (SELECT 1 FROM episodes WHERE " + same_slot + ")"
+    ), {'now': now, 'no': False}).rowcount
+    return inserted, updated
+
+
+def _touch_changed_shows(conn, now, batch_size: int) -> int:
+    """Set-based `touch_show_data` plus season signatures for every changed show."""
+    conn.execute(_sql(
+        "UPDATE shows SET "
+        "episode_count = (SELECT COUNT(*) FROM episodes WHERE episodes.show_id = shows.id), "
+        "absent_count = (SELECT COUNT(*) FROM episodes WHERE episodes.show_id = shows.id "
+        "AND episodes.absent = :yes AND episodes.rating IS NULL), "
+        "data_version = data_version + 1, "
+        "last_updated = :now "
+        "WHERE id IN (SELECT show_id FROM import_changed)"
+    ), {'yes': True, 'now': now})
+
+    show_ids = [row[0] for row in conn.execute(_sql("SELECT show_id FROM import_changed ORDER BY show_id"))]
+    # Same "count:avg" as compute_season_signature: confirmed = neither absent nor provisional
+    signatures = _sql(
+        "SELECT show_id, season, "
+        "SUM(CASE WHEN COALESCE(absent, :no) = :no AND COALESCE(provisional, :no) = :no THEN 1 ELSE 0 END), "
+        "AVG(CASE WHEN COALESCE(absent, :no) = :no AND COALESCE(provisional, :no) = :no THEN rating END) "
+        "FROM episodes WHERE show_id IN :ids GROUP BY show_id, season"
+    ).bindparams(bindparam('ids', expanding=True))
+    clear = _sql("DELETE FROM season_hashes WHERE show_id IN :ids").bindparams(bindparam('ids', expanding=True))
+    insert = _sql(
+        "INSERT INTO season_hashes (show_id, season, signature, last_computed) "
+        "VALUES (:show_id, :season, :signature, :now)"
+    )
+    for i in range(0, len(show_ids), batch_size):
+        ids = show_ids[i:i + batch_size]
+        rows = [
+            {'show_id': show_id, 'season': season, 'signature': f"{count or 0}:{(avg or 0.0):.3f}", 'now': now}
+            for show_id, season, count, avg in conn.execute(signatures, {'ids': ids, 'no': False})
+        ]
+        conn.execute(clear, {'ids': ids})
+        if rows:
+            conn.execute(insert, rows)
+    return len(show_ids)
+
+
+# ============================================================================
+# Import
+# ============================================================================
+def import_datasets(basics_path: str, episodes_path: str, ratings_path: str, db_engine=engine,
+                    batch_size: int = IMPORT_BATCH_SIZE, min_votes: int = 0,
+                    only_existing: bool = False) -> dict[str, int]:
+    """
+    Stage the three dataset files and merge them into `shows` / `episodes`.
+
+    Returns row counts: staged rows per file, shows/episodes inserted and
+    updated, and the number of shows whose data changed.
+    """
+    stats: dict[str, int] = {}
+    now = _utc_now()
+    with db_engine.connect() as conn:
+        # Pooled connections may still hold staging tables from an earlier import
+        for table in reversed(_staging.sorted_tables):
+            conn.execute(_sql(f"DROP TABLE IF EXISTS {table.name}"))
+        _staging.create_all(conn)
+        try:
+            for name, table, rows in (
+                ('ratings', stage_ratings, _rating_rows(ratings_path)),
+                ('episodes', stage_episodes, _episode_rows(episodes_path)),
+                ('basics', stage_titles, _basics_rows(basics_path)),
+            ):
+                t0 = time.perf_counter()
+                stats[f'{name}Staged'] = _stage(conn, table, rows, batch_size)
+                conn.commit()
+                logger.info("Staged %d %s rows in %.1fs", stats[f'{name}Staged'], name, time.perf_counter() - t0)
+
+            stats['showsInserted'], stats['showsUpdated'] = _merge_shows(conn, min_votes, only_existing, now)
+            stats['episodesInserted'], stats['episodesUpdated'] = _merge_episodes(conn, now)
+            stats['showsChanged'] = _touch_changed_shows(conn, now, batch_size)
+            conn.commit()
+        finally:
+            conn.rollback()
+            for table in reversed(_staging.sorted_tables):
+                conn.execute(_sql(f"DROP TABLE IF EXISTS {table.name}"))
+            conn.commit()
+    logger.info("Import finished: %s", stats)
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--dir', default='.', help='directory holding the dataset files')
+    parser.add_argument('--basics', help=f"path to {DATASET_FILES['basics']}")
+    parser.add_argument('--episodes', help=f"path to {DATASET_FILES['episodes']}")
+    parser.add_argument('--ratings', help=f"path to {DATASET_FILES['ratings']}")
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--min-votes', type=int, default=0, help='skip series with fewer votes')
+    parser.add_argument('--only-existing', action='store_true', help='refresh stored shows only')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    paths = {key: getattr(args, key) or os.path.join(args.dir, name) for key, name in DATASET_FILES.items()}
+    init_db()
+    ensure_columns()
+    ensure_indices()
+    stats = import_datasets(paths['basics'], paths['episodes'], paths['ratings'], batch_size=args.batch_size,
+                            min_votes=args.min_votes, only_existing=args.only_existing)
+    print(' '.join(f'{k}={v}' for k, v in stats.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,11 @@ Generic utility functions and classes for the IMDB Heatmap backend.
 from __future__ import annotations
 
 import re
+import sys
+import threading
 import time
-from typing import Any, Hashable
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
 
 
 # ============================================================================
@@ -58,31 +61,224 @@ def get_nested(data: dict[str, Any], path: list[str]) -> Any | None:
 # ============================================================================
 # Caching
 # ============================================================================
+def approx_size(value: Any, _sample: int = 4) -> int:
+    """
+    Rough in-memory size of a cached value, in bytes.
+
+    Containers are walked recursively, but long sequences are extrapolated
+    from their first few items: cached values are lists of similar records.
+    """
+    if isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        head = value[:_sample]
+        items = sum(approx_size(v) for v in head)
+        if len(value) > len(head):
+            items = items * len(value) // len(head)
+        return sys.getsizeof(value) + items
+    if isinstance(value, (set, frozenset)):
+        return sys.getsizeof(value) + sum(approx_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
 class TTLCache:
-    """Simple TTL-based in-memory cache with optional per-entry TTL override."""
+    """
+    Bounded in-memory LRU cache with a default TTL and per-entry overrides.
+
+    At most `max_entries` keys and (if set) `max_bytes` of estimated value
+    size are kept; the least recently used entries are evicted first.
+    Expired entries are dropped when read and by a full sweep at most every
+    `sweep_interval` seconds, run from `set()`, so no background thread is
+    needed. All operations are thread-safe.
 
-    def __init__(self, default_ttl: int) -> None:
-        """Initialize cache with a default TTL."""
-        self._cache: dict[Hashable, tuple[float, Any, int]] = {}
+    With `max_stale`, expired entries are kept that much longer and returned
+    (flagged stale) by `get_entry()`, for stale-while-revalidate callers;
+    `get()` never returns them.
+    """
+
+    def __init__(self, default_ttl: int, max_entries: int = 1024, max_bytes: int | None = None,
+                 sweep_interval: float = 60.0, sizeof: Callable[[Any], int] = approx_size,
+                 max_stale: float = 0.0) -> None:
+        """Initialize cache with a default TTL and size limits."""
+        # key -> (expires_at, value, size); ordered from least to most recently used
+        self._cache: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
         self._default_ttl = default_ttl
+        self._max_entries = max(1, max_entries)
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._bytes = 0
+        self._max_stale = max_stale
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'staleHits': 0, 'expired': 0, 'evictions': 0}
 
     def get(self, key: Hashable, require_value: bool = True) -> Any | None:
         """Retrieve a value from cache if not expired."""
-        entry = self._cache.get(key)
-        if entry is None:
-            return None
-        timestamp, value, ttl = entry
-        if (time.time() - timestamp) >= ttl:
-            return None
-        if require_value and not value:
-            return None
-        return value
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            expires_at, value, _ = entry
+            now = time.monotonic()
+            if now >= expires_at:
+                if now >= expires_at + self._max_stale:
+                    self._remove(key)
+                    self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._cache.move_to_end(key)
+            if require_value and not value:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            return value
+
+    def get_entry(self, key: Hashable) -> tuple[Any, bool] | None:
+        """(value, is_stale) while the entry is fresh or within `max_stale` of expiring, else None."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            expires_at, value, _ = entry
+            now = time.monotonic()
+            if now >= expires_at + self._max_stale:
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._cache.move_to_end(key)
+            stale = now >= expires_at
+            self._stats['staleHits' if stale else 'hits'] += 1
+            return value, stale
 
     def set(self, key: Hashable, value: Any, ttl: int | None = None) -> None:
         """Store a value in cache with optional custom TTL."""
         effective_ttl = ttl if ttl is not None else self._default_ttl
-        self._cache[key] = (time.time(), value, effective_ttl)
+        size = self._sizeof(value) if self._max_bytes is not None else 0
+        now = time.monotonic()
+        with self._lock:
+            if key in self._cache:
+                self._remove(key)
+            self._cache[key] = (now + effective_ttl, value, size)
+            self._bytes += size
+            if now >= self._next_sweep:
+                self._sweep(now)
+            while len(self._cache) > self._max_entries or (
+                    self._max_bytes is not None and self._bytes > self._max_bytes and len(self._cache) > 1):
+                evicted, _ = next(iter(self._cache.items()))
+                self._remove(evicted)
+                self._stats['evictions'] += 1
+
+    @property
+    def default_ttl(self) -> int:
+        return self._default_ttl
+
+    @property
+    def max_stale(self) -> float:
+        return self._max_stale
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove `key` and return its value (expired or not), or `default`."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[1]
+
+    def keys(self) -> list[Hashable]:
+        """Snapshot of the stored keys, least recently used first."""
+        with self._lock:
+            return list(self._cache)
+
+    def sweep(self) -> int:
+        """Drop every entry past its expiry (plus `max_stale`) now; returns how many were removed."""
+        with self._lock:
+            return self._sweep(time.monotonic())
 
     def clear(self) -> None:
         """Clear all cached entries."""
-        self._cache.clear()
\ No newline at end of file
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss/expiry/eviction counters plus current size."""
+        with self._lock:
+            return {**self._stats, 'size': len(self._cache), 'bytes': self._bytes}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _remove(self, key: Hashable) -> None:
+        # Caller holds the lock
+        self._bytes -= self._cache.pop(key)[2]
+
+    def _sweep(self, now: float) -> int:
+        # Caller holds the lock
+        expired = [k for k, (expires_at, _, _) in self._cache.items() if now >= expires_at + self._max_stale]
+        for k in expired:
+            self._remove(k)
+        self._stats['expired'] += len(expired)
+        self._next_sweep = now + self._sweep_interval
+        return len(expired)
+
+
+class VersionedCache:
+    """
+    Bounded LRU cache whose entries are only valid for a matching version.
+
+    Callers pass the current version (e.g. a row's `last_updated`) on every
+    read; a stale entry is treated as a miss, so any writer that bumps the
+    version invalidates the entry without calling into the cache.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        """Initialize an empty cache holding at most `max_entries` keys."""
+        self._entries: OrderedDict[Hashable, tuple[Hashable, Any]] = OrderedDict()
+        self._max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    def get(self, key: Hashable, version: Hashable) -> Any | None:
+        """Return the value stored for `key` at `version`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry[0] != version:
+                del self._entries[key]
+                self._stats['stale'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key: Hashable, version: Hashable, value: Any) -> None:
+        """Store a value for `key` at `version`, evicting the least recently used key."""
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the entry for `key`, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Clear all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss/stale counters and current size."""
+        with self._lock:
+            return {**self._stats, 'size': len(self._entries)}
@@ -0,0 +1,116 @@
+"""
+Write-behind buffer for show view counts.
+
+Tracked views are added to an in-memory delta per show and written in one
+batched UPDATE every `VIEW_FLUSH_INTERVAL` seconds and on shutdown, instead
+of a commit per request. Flushes add deltas (`view_count = view_count + n`),
+so any number of worker processes can buffer and flush independently. A
+process that dies between flushes loses at most one interval of views.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Any
+
+from sqlalchemy import bindparam, func, update
+
+from database import engine, Show
+
+
+VIEW_FLUSH_INTERVAL: float = float(os.getenv('VIEW_FLUSH_INTERVAL', 5))
+
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# View Counter
+# ============================================================================
+class ViewCounter:
+    """Aggregates view increments per show id and flushes them in batches."""
+
+    def __init__(self, db_engine=engine, flush_interval: float = VIEW_FLUSH_INTERVAL) -> None:
+        self._engine = db_engine
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[int, int] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stats = {'recorded': 0, 'flushes': 0, 'rowsWritten': 0, 'errors': 0}
+
+    def incr(self, show_id: int, n: int = 1) -> None:
+        """Record `n` views of a show; no database access."""
+        with self._lock:
+            self._pending[show_id] = self._pending.get(show_id, 0) + n
+            self._stats['recorded'] += n
+
+    def pending(self) -> dict[int, int]:
+        """Snapshot of unflushed deltas by show id."""
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self) -> int:
+        """Write all pending deltas in one transaction; returns the number of rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            stmt = (
+                update(Show)
+                .where(Show.id == bindparam('b_id'))
+                # Setting last_updated to itself keeps its onupdate from firing: a view is not a data change
+                .values(view_count=func.coalesce(Show.view_count, 0) + bindparam('b_delta'), last_updated=Show.last_updated)
+            )
+            # Ordered by id so concurrent flushers (other processes) lock rows in the same order
+            params = [{'b_id': show_id, 'b_delta': delta} for show_id, delta in sorted(batch.items())]
+            try:
+                with self._engine.begin() as conn:
+                    conn.execute(stmt, params)
+            except Exception as e:
+                # Put the deltas back so the next flush retries them
+                with self._lock:
+                    for show_id, delta in batch.items():
+                        self._pending[show_id] = self._pending.get(show_id, 0) + delta
+                    self._stats['errors'] += 1
+                logger.warning("View count flush failed (%d shows kept for retry): %s", len(batch), e)
+                return 0
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['rowsWritten'] += len(batch)
+            return len(batch)
+
+    # ------------------------------------------------------------------
+    # Background flushing
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Start the periodic flush thread (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the flush thread and write whatever is still buffered."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._flush_interval):
+            self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        """Counters plus the number of views still buffered."""
+        with self._lock:
+            return {**self._stats, 'pendingShows': len(self._pending),
+                    'pendingViews': sum(self._pending.values())}
+
+
+view_counter = ViewCounter()
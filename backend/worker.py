@@ -1,71 +1,112 @@
 # worker.py
+import bisect
 import time
 import os
 import threading
 from datetime import datetime, UTC
 
-from database import session, Show, Episode, is_show_metadata_stale, is_episode_stale
+from database import session, Show, Episode, is_show_metadata_stale, is_episode_stale, touch_show_data
 import services
 from utils import safe_json, parse_float
+from jobs import job_queue, PRIORITY_MAINTENANCE, QueueFull
+from shows.show_helpers import _apply_indexed_rating
+
+def refresh_show_maintenance(show_id):
+    """Refresh stale metadata and missing episode ratings for one show."""
+    show = session.query(Show).filter_by(id=show_id).first()
+    if not show:
+        return
+    updated_any = False
+    if is_show_metadata_stale(show):
+        print(f"[maintenance] metadata stale for {show.imdb_id}, refreshing.")
+        api_key = os.getenv('OMDB_API_KEY')
+        series_url = f'{services.OMDB_BASE_URL}?apikey={api_key}&i={show.imdb_id}'
+        series_resp = services.throttled_omdb_get(series_url)
+        if series_resp.status_code == 200:
+            sdata = safe_json(series_resp)
+            if sdata and sdata.get('Response') == 'True':
+                try:
+                    new_total = int(sdata.get('totalSeasons', show.total_seasons))
+                except Exception:
+                    new_total = show.total_seasons
+                if new_total > show.total_seasons:
+                    show.total_seasons = new_total
+                show.title = sdata.get('Title', show.title)
+                show.genres = sdata.get('Genre', show.genres)
+                show.year = sdata.get('Year', show.year)
+                show.plot = sdata.get('Plot', show.plot)
+                show.imdb_rating = parse_float(sdata.get('imdbRating')) or show.imdb_rating
+                if sdata.get('imdbVotes') and sdata.get('imdbVotes').replace(',','').isdigit():
+                    show.imdb_votes = int(sdata.get('imdbVotes').replace(',',''))
+                touch_show_data(session, show)
+                session.commit()
+
+    stale_eps = [ep for ep in session.query(Episode).filter(Episode.show_id==show.id).all() if is_episode_stale(ep)]
+    if stale_eps:
+        print(f"[maintenance] found {len(stale_eps)} stale episodes for {show.imdb_id}, checking missing.")
+        missing_eps = [ep for ep in stale_eps if ep.rating is None]
+        # The local ratings index answers without an upstream round trip
+        upstream_eps = [ep for ep in missing_eps if not _apply_indexed_rating(ep)]
+        if len(upstream_eps) < len(missing_eps):
+            updated_any = True
+        missing_eps = upstream_eps
+        if missing_eps:
+            api_key = os.getenv('OMDB_API_KEY')
+            for ep in missing_eps:
+                season_data = services.fetch_season_from_omdb(api_key, show.imdb_id, ep.season)
+                if not season_data:
+                    continue
+                for ep_data in season_data.get('Episodes', []):
+                    if ep_data.get('Episode') and int(ep_data['Episode']) == ep.episode:
+                        rating = parse_float(ep_data.get('imdbRating'))
+                        if rating is None:
+                            scraped = services.fetch_rating_from_imdb(ep_data.get('imdbID'))
+                            rating = parse_float(scraped)
+                        if rating is not None:
+                            ep.rating = rating
+                            ep.missing = False
+                            ep.last_checked = datetime.now(UTC).replace(tzinfo=None)
+                            updated_any = True
+            session.commit()
+    if updated_any:
+        touch_show_data(session, show)
+        session.commit()
+
+
+def _run_show_maintenance(show_id):
+    try:
+        refresh_show_maintenance(show_id)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.remove()
+
+
+job_queue.register('maintenance', _run_show_maintenance)
+
 
 def maintenance_worker(interval_seconds=21600):  # 6 hours
-    """Periodically refreshes stale metadata and missing episode ratings."""
+    """Periodically queues a low-priority maintenance job per show."""
     print("[maintenance] worker started.")
+    # Each cycle resumes after the last show queued, so shows deferred by a full queue go first next time
+    resume_after = 0
     while True:
         try:
             print("[maintenance] starting refresh cycle.")
-            shows = session.query(Show).all()
-            for show in shows:
-                updated_any = False
-                if is_show_metadata_stale(show):
-                    print(f"[maintenance] metadata stale for {show.imdb_id}, refreshing.")
-                    api_key = os.getenv('OMDB_API_KEY')
-                    series_url = f'http://www.omdbapi.com/?apikey={api_key}&i={show.imdb_id}'
-                    series_resp = services.throttled_omdb_get(series_url)
-                    if series_resp.status_code == 200:
-                        sdata = safe_json(series_resp)
-                        if sdata and sdata.get('Response') == 'True':
-                            try:
-                                new_total = int(sdata.get('totalSeasons', show.total_seasons))
-                            except Exception:
-                                new_total = show.total_seasons
-                            if new_total > show.total_seasons:
-                                show.total_seasons = new_total
-                            show.title = sdata.get('Title', show.title)
-                            show.genres = sdata.get('Genre', show.genres)
-                            show.year = sdata.get('Year', show.year)
-                            show.imdb_rating = parse_float(sdata.get('imdbRating')) or show.imdb_rating
-                            if sdata.get('imdbVotes') and sdata.get('imdbVotes').replace(',','').isdigit():
-                                show.imdb_votes = int(sdata.get('imdbVotes').replace(',',''))
-                            show.last_updated = datetime.now(UTC).replace(tzinfo=None)
-                            session.commit()
-                
-                stale_eps = [ep for ep in session.query(Episode).filter(Episode.show_id==show.id).all() if is_episode_stale(ep)]
-                if stale_eps:
-                    print(f"[maintenance] found {len(stale_eps)} stale episodes for {show.imdb_id}, checking missing.")
-                    missing_eps = [ep for ep in stale_eps if ep.rating is None]
-                    if missing_eps:
-                        api_key = os.getenv('OMDB_API_KEY')
-                        for ep in missing_eps:
-                            season_data = services.fetch_season_from_omdb(api_key, show.imdb_id, ep.season)
-                            if not season_data:
-                                continue
-                            for ep_data in season_data.get('Episodes', []):
-                                if ep_data.get('Episode') and int(ep_data['Episode']) == ep.episode:
-                                    rating = parse_float(ep_data.get('imdbRating'))
-                                    if rating is None:
-                                        scraped = services.fetch_rating_from_imdb(ep_data.get('imdbID'))
-                                        rating = parse_float(scraped)
-                                    if rating is not None:
-                                        ep.rating = rating
-                                        ep.missing = False
-                                        ep.last_checked = datetime.now(UTC).replace(tzinfo=None)
-                                        updated_any = True
-                        session.commit()
-                if updated_any:
-                    show.last_updated = datetime.now(UTC).replace(tzinfo=None)
-                    session.commit()
-            print("[maintenance] refresh cycle complete.")
+            show_ids = [row.id for row in session.query(Show.id).order_by(Show.id).all()]
+            session.remove()
+            start = bisect.bisect_right(show_ids, resume_after)
+            queued = 0
+            for show_id in show_ids[start:] + show_ids[:start]:
+                try:
+                    job_queue.submit('maintenance', str(show_id), {'show_id': show_id}, priority=PRIORITY_MAINTENANCE)
+                    queued += 1
+                    resume_after = show_id
+                except QueueFull:
+                    print("[maintenance] job queue full, deferring remaining shows to next cycle.")
+                    break
+            print(f"[maintenance] queued {queued} shows.")
         except Exception as e:
             print(f"[maintenance] error: {e}")
             session.rollback()
@@ -74,4 +115,4 @@ def maintenance_worker(interval_seconds=21600):  # 6 hours
 def start_background_maintenance():
     if os.getenv('AUTO_REFRESH') == '1':
         t = threading.Thread(target=maintenance_worker, daemon=True)
-        t.start()
\ No newline at end of file
+        t.start()
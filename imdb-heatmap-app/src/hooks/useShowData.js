@@ -2,6 +2,39 @@
 import { useState, useEffect, useRef } from 'react'
 import { apiUrl } from '../config/api'
 
+/**
+ * Read a newline-delimited JSON response, calling onEvent for each line as it arrives.
+ * @param {Response} res - Fetch response
+ * @param {function} onEvent - Called with each parsed event object
+ */
+async function readNdjson(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline).trim();
+            buffer = buffer.slice(newline + 1);
+            if (line) onEvent(JSON.parse(line));
+        }
+    }
+    if (buffer.trim()) onEvent(JSON.parse(buffer));
+}
+
+/**
+ * Insert one season's episodes, keeping the list ordered by season then episode.
+ */
+function mergeSeason(episodes, seasonEpisodes) {
+    if (!seasonEpisodes.length) return episodes;
+    const season = seasonEpisodes[0].season;
+    return [...episodes.filter(ep => ep.season !== season), ...seasonEpisodes]
+        .sort((a, b) => a.season - b.season || a.episode - b.episode);
+}
+
 /**
  * Custom hook for fetching, polling, and refreshing TV show data.
  * @param {string|null} imdbId - The IMDb ID of the show
@@ -14,6 +47,7 @@ export function useShowData(imdbId) {
     const [loadingEpisodes, setLoadingEpisodes] = useState(false)
     const [isRefreshPending, setIsRefreshPending] = useState(false)
     const [error, setError] = useState(null)
+    const [pushFailed, setPushFailed] = useState(false)
     const episodesAbortRef = useRef(null)
     const pollStopRef = useRef(false)
     const etagRef = useRef(null)
@@ -48,41 +82,55 @@ export function useShowData(imdbId) {
         setBaseMeta(null);
         setLoadingMeta(true);
         setLoadingEpisodes(true); // Both loading states start immediately
+        setPushFailed(false);
         etagRef.current = null;
 
         const controller = new AbortController();
         episodesAbortRef.current = controller;
 
-        // Parallel fetch: both API calls run simultaneously
-        Promise.all([
-            fetch(apiUrl('/getShowMeta', { imdbID: imdbId }), { signal: controller.signal }),
-            fetch(apiUrl('/getShow', { imdbID: imdbId, trackView: 1 }), { signal: controller.signal })
-        ])
-            .then(async ([metaRes, dataRes]) => {
-                const [meta, full] = await Promise.all([metaRes.json(), dataRes.json()]);
-
+        // Metadata and the episode stream run in parallel
+        fetch(apiUrl('/getShowMeta', { imdbID: imdbId }), { signal: controller.signal })
+            .then(r => r.json())
+            .then(meta => {
                 if (controller.signal.aborted) return;
-
-                // Process metadata
                 setLoadingMeta(false);
                 if (meta && !meta.error) {
                     setBaseMeta(prev => ({ ...prev, ...meta }));
                 } else {
                     setError(meta?.error || 'Metadata fetch failed');
                 }
-
-                // Process episode data
-                setLoadingEpisodes(false);
-                if (full && !full.error) {
-                    setData(full);
-                } else if (!meta?.error) {
-                    // Only set error if meta didn't already fail
-                    setError(full?.error || 'Fetch failed');
-                }
             })
             .catch(e => {
                 if (e.name !== 'AbortError') {
                     setLoadingMeta(false);
+                    setError('Metadata fetch failed');
+                }
+            });
+
+        // Episodes arrive season by season so the heatmap can render early rows
+        fetch(apiUrl('/getShowStream', { imdbID: imdbId, trackView: 1 }), { signal: controller.signal })
+            .then(res => readNdjson(res, event => {
+                if (controller.signal.aborted) return;
+                if (event.type === 'show') {
+                    const show = { ...event };
+                    delete show.type;
+                    setData({ ...show, episodes: [] });
+                } else if (event.type === 'season') {
+                    setLoadingEpisodes(false);
+                    setData(prev => prev && ({ ...prev, episodes: mergeSeason(prev.episodes, event.episodes) }));
+                } else if (event.type === 'done') {
+                    const { etag, ...summary } = event;
+                    delete summary.type;
+                    if (etag) etagRef.current = etag;
+                    setLoadingEpisodes(false);
+                    setData(prev => ({ ...(prev || {}), ...summary, episodes: prev?.episodes || [] }));
+                } else if (event.type === 'error') {
+                    setLoadingEpisodes(false);
+                    setError(event.error || 'Fetch failed');
+                }
+            }))
+            .catch(e => {
+                if (e.name !== 'AbortError') {
                     setLoadingEpisodes(false);
                     setError('Fetch failed');
                 }
@@ -91,10 +139,67 @@ export function useShowData(imdbId) {
         return () => { controller.abort(); };
     }, [imdbId])
 
-    // Polling for partial data updates
     const partialData = data?.partialData;
     const missingRefreshInProgress = data?.missingRefreshInProgress;
-    const shouldPoll = !!(partialData || data?.incomplete || missingRefreshInProgress || isRefreshPending);
+    const usePush = typeof EventSource !== 'undefined' && !pushFailed;
+    const wantsPush = !!(partialData || missingRefreshInProgress);
+
+    // Push updates: background jobs publish per-season deltas and a completion event
+    useEffect(() => {
+        if (!data?.imdbID || !usePush || !wantsPush) return;
+        const imdbID = data.imdbID;
+        const source = new EventSource(apiUrl('/events/show', { imdbID }));
+
+        const refetchOnce = () => {
+            fetch(apiUrl('/getShow', { imdbID, trackView: 0 }), {
+                headers: etagRef.current ? { 'If-None-Match': etagRef.current } : {}
+            })
+                .then(async r => {
+                    if (r.status === 304) return null;
+                    const newEtag = r.headers.get('ETag');
+                    if (newEtag) etagRef.current = newEtag;
+                    return r.json();
+                })
+                .then(full => { if (full && !full.error) setData(full); })
+                .catch(() => {/* ignore */ });
+        };
+
+        source.addEventListener('status', e => {
+            const status = JSON.parse(e.data);
+            if (!status.enrichmentInProgress && !status.missingRefreshInProgress) {
+                // Nothing running: work may have finished before we subscribed
+                source.close();
+                refetchOnce();
+            }
+        });
+        source.addEventListener('season', e => {
+            const delta = JSON.parse(e.data);
+            setData(prev => {
+                if (!prev || prev.imdbID !== imdbID) return prev;
+                const byKey = new Map(prev.episodes.map(ep => [`${ep.season}-${ep.episode}`, ep]));
+                delta.episodes.forEach(ep => byKey.set(`${ep.season}-${ep.episode}`, ep));
+                const episodes = [...byKey.values()].sort((a, b) => a.season - b.season || a.episode - b.episode);
+                return { ...prev, episodes };
+            });
+        });
+        source.addEventListener('complete', e => {
+            const summary = JSON.parse(e.data);
+            delete summary.type;
+            delete summary.source;
+            if (summary.etag) etagRef.current = summary.etag;
+            delete summary.etag;
+            setData(prev => (prev && prev.imdbID === imdbID) ? { ...prev, ...summary } : prev);
+            if (!summary.missingRefreshInProgress) source.close();
+        });
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) setPushFailed(true);
+        };
+
+        return () => { source.close(); };
+    }, [data?.imdbID, usePush, wantsPush])
+
+    // Polling fallback when push updates are unavailable
+    const shouldPoll = !usePush && !!(partialData || data?.incomplete || missingRefreshInProgress || isRefreshPending);
 
     useEffect(() => {
         if (!data?.imdbID || !shouldPoll) { pollStopRef.current = true; return; }